@@ -2,23 +2,88 @@
 数据抓取控制中心
 统一管理所有爬虫的启动、停止和配置
 """
-import yaml
+import asyncio
 import sys
 import time
 import argparse
+import importlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Tuple
+from utils.config import load_config
 from utils.logger import setup_logger
-from utils.redis_client import RedisClient
+from utils.redis_client import RedisClient, create_pool
 from utils.data_exporter import DataExporter
-from crawlers.reddit_crawler import RedditCrawler
-from crawlers.rss_crawler import RSSCrawler
-from crawlers.newsapi_crawler import NewsAPICrawler
-from crawlers.stocktwits_crawler import StockTwitsCrawler
-from crawlers.alphavantage_crawler import AlphaVantageCrawler  # ✅ 新增
+from utils.http_client import get_session, close_session
 
 logger = setup_logger('control_center')
 
+# 日志分隔线（预先构建，避免每次调用重复拼接）
+_BANNER = "=" * 60
+_BANNER_NL = "\n" + _BANNER
+_BANNER_END = _BANNER + "\n"
+_RULE = "-" * 60
+
+# 爬虫注册表：(名称, 显示名, "模块:类名", 统计字段)，初始化、运行与统计输出均由此驱动
+# 爬虫模块仅在启用时才导入，未启用的爬虫不承担 praw/feedparser 等依赖的导入开销
+CRAWLER_REGISTRY = (
+    ('reddit', 'Reddit', 'crawlers.reddit_crawler:RedditCrawler', ('posts', 'comments', 'errors')),
+    ('newsapi', 'NewsAPI', 'crawlers.newsapi_crawler:NewsAPICrawler', ('articles', 'errors')),
+    ('rss', 'RSS', 'crawlers.rss_crawler:RSSCrawler', ('articles', 'errors')),
+    ('stocktwits', 'StockTwits', 'crawlers.stocktwits_crawler:StockTwitsCrawler', ('messages', 'errors')),
+    ('alphavantage', 'AlphaVantage', 'crawlers.alphavantage_crawler:AlphaVantageCrawler', ('items', 'errors')),
+)
+
+
+def _load_crawler_class(target: str):
+    """按 "模块:类名" 延迟导入爬虫类"""
+    module_name, class_name = target.split(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _build_crawler(target: str, config: dict, redis_client):
+    """导入并实例化爬虫（在线程池中执行）"""
+    return _load_crawler_class(target)(config, redis_client)
+
+
+# 统计计数：按 (来源, 字段) 存放在二维整数表中，合并与汇总只做下标运算
+SOURCES = tuple(entry[0] for entry in CRAWLER_REGISTRY)
+FIELDS = ('posts', 'comments', 'articles', 'messages', 'items', 'errors')
+FIELD_LABELS = {
+    'posts': '帖子', 'comments': '评论', 'articles': '文章',
+    'messages': '消息', 'items': '数据', 'errors': '错误',
+}
+_SOURCE_INDEX = {name: i for i, name in enumerate(SOURCES)}
+_FIELD_INDEX = {name: i for i, name in enumerate(FIELDS)}
+_ERRORS_IDX = _FIELD_INDEX['errors']
+# 每个来源实际使用的字段下标（分发表）
+_SOURCE_FIELDS = {
+    name: tuple(_FIELD_INDEX[f] for f in fields)
+    for name, _, _, fields in CRAWLER_REGISTRY
+}
+
+
+def _make_stats_merger(row: List[int], field_indices: Tuple[int, ...]):
+    """
+    为单个来源生成统计合并函数，只累加该来源实际使用的字段
+
+    Args:
+        row: 该来源在统计表中的行
+        field_indices: 该来源使用的字段下标
+
+    Returns:
+        callable: merge(stats)
+    """
+    pairs = tuple((idx, FIELDS[idx]) for idx in field_indices)
+
+    def merge(stats: Dict):
+        get = stats.get
+        for idx, key in pairs:
+            row[idx] += get(key, 0)
+
+    return merge
+
 
 class CrawlerControlCenter:
     """爬虫控制中心"""
@@ -32,36 +97,43 @@ class CrawlerControlCenter:
         """
         self.config_file = config_file
         self.config = self._load_config()
+        # 预先计算各爬虫的配置段与启用状态，后续只读这两个字典
+        self._section = {name: self.config.get(name) or {} for name in SOURCES}
+        self._enabled = {name: self._compute_enabled(name) for name in SOURCES}
         self.redis_client = None
         self.crawlers = {}
-        self.statistics = {
-            'reddit': {'posts': 0, 'comments': 0, 'errors': 0},
-            'newsapi': {'articles': 0, 'errors': 0},
-            'rss': {'articles': 0, 'errors': 0},
-            'stocktwits': {'messages': 0, 'errors': 0},
-            'alphavantage': {'items': 0, 'errors': 0}  # ✅ 新增
+        self._stats = [[0] * len(FIELDS) for _ in SOURCES]
+        # 每个来源一个专用的统计合并函数，运行时无需按名称分支
+        self._mergers = {
+            name: _make_stats_merger(self._stats[_SOURCE_INDEX[name]], _SOURCE_FIELDS[name])
+            for name in SOURCES
         }
+        self.run_count = 0
+        # 上次打印统计时的计数快照，用于判断本周期是否有新数据
+        self._last_printed_stats = tuple(tuple(row) for row in self._stats)
         
-        logger.info("=" * 60)
+        logger.info(_BANNER)
         logger.info("控制中心初始化")
-        logger.info("=" * 60)
+        logger.info(_BANNER)
         
         # 初始化 Redis 连接
         self._init_redis()
+
+        # 各爬虫共享同一个带连接池的 HTTP Session（keep-alive）
+        self.http_session = get_session()
         
         # 初始化爬虫
         self._init_crawlers()
     
     def _load_config(self) -> dict:
         """
-        加载配置文件
+        加载配置文件（与日志、导出模块共用 utils.config 的缓存，文件修改后自动重新解析）
         
         Returns:
             dict: 配置字典
         """
         try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
+            config = load_config(self.config_file)
             logger.info(f"配置文件加载成功: {self.config_file}")
             return config
         except FileNotFoundError:
@@ -76,6 +148,8 @@ class CrawlerControlCenter:
         """初始化 Redis 连接"""
         try:
             redis_config = self.config.get('redis', {})
+            # 爬虫并发运行，共享同一个有上限的连接池
+            pool = create_pool(**redis_config)
             self.redis_client = RedisClient(
                 host=redis_config.get('host', 'localhost'),
                 port=redis_config.get('port', 6379),
@@ -84,97 +158,74 @@ class CrawlerControlCenter:
                 queue_name=redis_config.get('queue_name', 'financial_data'),
                 storage_config=redis_config.get('storage_optimization', {}),
                 source_quotas=redis_config.get('source_quotas', {}),
+                pool=pool,
             )
             logger.info("✓ Redis 连接成功")
         except Exception as e:
             logger.error(f"✗ Redis 连接失败: {e}")
             sys.exit(1)
     
+    def _compute_enabled(self, section_name: str, default_if_present: bool = False) -> bool:
+        """
+        判断某个爬虫是否启用
+
+        Args:
+            section_name: 配置段名称
+            default_if_present: 配置段存在但未提供 enabled 时的默认值
+
+        Returns:
+            bool: 是否启用
+        """
+        conf = self.config.get(section_name, None)
+        if conf is None:
+            return False
+        if 'enabled' in conf:
+            return bool(conf.get('enabled'))
+        # 如果配置段存在但未提供 enabled：reddit 默认启用，newsapi 默认禁用，其它遵循 default_if_present
+        if section_name == 'reddit':
+            return True
+        if section_name == 'newsapi':
+            return False
+        return default_if_present
+
     def _init_crawlers(self):
         """初始化所有爬虫"""
-        logger.info("\n" + "=" * 60)
+        logger.info(_BANNER_NL)
         logger.info("初始化爬虫模块")
-        logger.info("=" * 60)
-
-        def is_enabled(section_name: str, default_if_present: bool = False) -> bool:
-            conf = self.config.get(section_name, None)
-            if conf is None:
-                return False
-            if 'enabled' in conf:
-                return bool(conf.get('enabled'))
-            # 如果配置段存在但未提供 enabled：reddit 默认启用，newsapi 默认禁用，其它遵循 default_if_present
-            if section_name == 'reddit':
-                return True
-            if section_name == 'newsapi':
-                return False
-            return default_if_present
-        
-        # Reddit
-        if is_enabled('reddit'):
-            try:
-                self.crawlers['reddit'] = RedditCrawler(
-                    self.config.get('reddit', {}),
-                    self.redis_client
-                )
-                logger.info("✓ Reddit 爬虫初始化成功")
-            except Exception as e:
-                logger.error(f"✗ Reddit 爬虫初始化失败: {e}")
-        else:
-            logger.info("○ Reddit 爬虫已禁用")
-        
-        # NewsAPI
-        if is_enabled('newsapi'):
-            try:
-                self.crawlers['newsapi'] = NewsAPICrawler(
-                    self.config.get('newsapi', {}),
-                    self.redis_client
-                )
-                logger.info("✓ NewsAPI 爬虫初始化成功")
-            except Exception as e:
-                logger.error(f"✗ NewsAPI 爬虫初始化失败: {e}")
-        else:
-            logger.info("○ NewsAPI 爬虫已禁用")
-        
-        # RSS
-        if is_enabled('rss', default_if_present=False):
-            try:
-                self.crawlers['rss'] = RSSCrawler(
-                    self.config.get('rss', {}),
-                    self.redis_client
-                )
-                logger.info("✓ RSS 爬虫初始化成功")
-            except Exception as e:
-                logger.error(f"✗ RSS 爬虫初始化失败: {e}")
-        else:
-            logger.info("○ RSS 爬虫已禁用")
-        
-        # StockTwits
-        if is_enabled('stocktwits', default_if_present=False):
-            try:
-                self.crawlers['stocktwits'] = StockTwitsCrawler(
-                    self.config.get('stocktwits', {}),
-                    self.redis_client
-                )
-                logger.info("✓ StockTwits 爬虫初始化成功")
-            except Exception as e:
-                logger.error(f"✗ StockTwits 爬虫初始化失败: {e}")
-        else:
-            logger.info("○ StockTwits 爬虫已禁用")
-        
-        # Alpha Vantage
-        if is_enabled('alphavantage', default_if_present=False):
+        logger.info(_BANNER)
+
+        # (名称, 显示名, 爬虫类路径, 是否启用)
+        specs = [
+            (name, label, target, self._enabled[name])
+            for name, label, target, _ in CRAWLER_REGISTRY
+        ]
+
+        # 爬虫构造可能涉及网络校验（如 API Key 测试），并行初始化以缩短启动时间
+        futures = {}
+        with ThreadPoolExecutor(max_workers=len(specs)) as executor:
+            for name, label, target, enabled in specs:
+                if enabled:
+                    futures[name] = executor.submit(
+                        _build_crawler,
+                        target,
+                        self._section[name],
+                        self.redis_client
+                    )
+
+        # 按固定顺序收集结果，保持日志输出稳定；汇总为一条日志输出
+        lines = []
+        for name, label, _, enabled in specs:
+            if not enabled:
+                lines.append(f"○ {label} 爬虫已禁用")
+                continue
             try:
-                self.crawlers['alphavantage'] = AlphaVantageCrawler(
-                    self.config.get('alphavantage', {}),
-                    self.redis_client
-                )
-                logger.info("✓ Alpha Vantage 爬虫初始化成功")
+                self.crawlers[name] = futures[name].result()
+                lines.append(f"✓ {label} 爬虫初始化成功")
             except Exception as e:
-                logger.error(f"✗ Alpha Vantage 爬虫初始化失败: {e}")
-        else:
-            logger.info("○ Alpha Vantage 爬虫已禁用")
+                logger.error(f"✗ {label} 爬虫初始化失败: {e}")
         
-        logger.info(f"\n已启用爬虫数量: {len(self.crawlers)}/5")
+        lines.append(f"\n已启用爬虫数量: {len(self.crawlers)}/{len(CRAWLER_REGISTRY)}")
+        logger.info("\n".join(lines))
     
     def run_crawler(self, name: str) -> Dict:
         """
@@ -190,50 +241,134 @@ class CrawlerControlCenter:
             logger.warning(f"爬虫 {name} 未启用或不存在")
             return {}
         
-        logger.info("\n" + "=" * 60)
+        logger.info(_BANNER_NL)
         logger.info(f"运行 {name.upper()} 爬虫")
-        logger.info("=" * 60)
+        logger.info(_BANNER)
         
         try:
             stats = self.crawlers[name].crawl()
-            
-            if name == 'reddit':
-                self.statistics['reddit']['posts'] += stats.get('posts', 0)
-                self.statistics['reddit']['comments'] += stats.get('comments', 0)
-                self.statistics['reddit']['errors'] += stats.get('errors', 0)
-            elif name == 'newsapi':
-                self.statistics['newsapi']['articles'] += stats.get('articles', 0)
-                self.statistics['newsapi']['errors'] += stats.get('errors', 0)
-            elif name == 'rss':
-                self.statistics['rss']['articles'] += stats.get('articles', 0)
-                self.statistics['rss']['errors'] += stats.get('errors', 0)
-            elif name == 'stocktwits':
-                self.statistics['stocktwits']['messages'] += stats.get('messages', 0)
-                self.statistics['stocktwits']['errors'] += stats.get('errors', 0)
-            elif name == 'alphavantage':
-                self.statistics['alphavantage']['items'] += stats.get('items', 0)
-                self.statistics['alphavantage']['errors'] += stats.get('errors', 0)
-            
+            self._mergers[name](stats)
             return stats
         except Exception as e:
             logger.error(f"{name} 爬虫运行失败: {e}")
-            self.statistics[name]['errors'] += 1
+            self._stats[_SOURCE_INDEX[name]][_ERRORS_IDX] += 1
             return {'errors': 1}
+
+    async def run_crawler_async(self, name: str) -> Dict:
+        """
+        异步运行单个爬虫（同步 crawl() 在线程池中执行，统计合并在事件循环线程中完成）
+
+        Args:
+            name: 爬虫名称
+
+        Returns:
+            dict: 统计信息
+        """
+        if name not in self.crawlers:
+            logger.warning(f"爬虫 {name} 未启用或不存在")
+            return {}
+
+        logger.info(f"启动 {name.upper()} 爬虫")
+
+        try:
+            stats = await asyncio.to_thread(self.crawlers[name].crawl)
+            self._mergers[name](stats)
+            return stats
+        except Exception as e:
+            logger.error(f"{name} 爬虫运行失败: {e}")
+            self._stats[_SOURCE_INDEX[name]][_ERRORS_IDX] += 1
+            return {'errors': 1}
+
+    @property
+    def statistics(self) -> Dict[str, Dict[str, int]]:
+        """按来源展开的统计字典（兼容原有的 dict-of-dicts 结构）"""
+        return {
+            name: {FIELDS[idx]: self._stats[i][idx] for idx in _SOURCE_FIELDS[name]}
+            for i, name in enumerate(SOURCES)
+        }
+
+    async def _run_crawlers_concurrently(self, names: List[str]):
+        """并发运行多个爬虫"""
+        return await asyncio.gather(
+            *(self.run_crawler_async(n) for n in names),
+            return_exceptions=True
+        )
     
     def run_all_crawlers(self):
         """运行所有启用的爬虫"""
-        logger.info("\n" + "=" * 60)
-        logger.info(f"开始执行抓取任务 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        logger.info("=" * 60)
-        
-        for name in ['reddit', 'newsapi', 'rss', 'stocktwits', 'alphavantage']:  # ✅ 新增
-            self.run_crawler(name)
+        asyncio.run(self.run_all_crawlers_async())
+
+    async def run_all_crawlers_async(self, background_export: bool = False):
+        """
+        异步运行所有启用的爬虫，随后导出数据并打印统计
+
+        Args:
+            background_export: 为 True 时导出在后台线程执行并立即返回任务，
+                               循环模式下导出与等待间隔重叠
+
+        Returns:
+            asyncio.Task 或 None: 后台导出任务
+        """
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(_BANNER_NL)
+            logger.info(f"开始执行抓取任务 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            logger.info(_BANNER)
         
-        # 数据导出（防止 Redis 内存占用过大）
-        self._export_data()
+        # 各爬虫相互独立且以网络 I/O 为主，并发运行使总耗时接近最慢的单个爬虫
+        names = [n for n in SOURCES if n in self.crawlers]
+        await self._run_crawlers_concurrently(names)
         
-        # 打印总体统计
+        # 数据导出（防止 Redis 内存占用过大），完成后打印总体统计
+        export_task = asyncio.create_task(asyncio.to_thread(self._export_data))
+        if background_export:
+            export_task.add_done_callback(lambda _: self._print_statistics())
+            return export_task
+        await export_task
         self._print_statistics()
+        return None
+
+    async def run_forever(self, interval: int):
+        """
+        循环运行模式：按固定间隔执行抓取，等待期间不阻塞事件循环
+
+        Args:
+            interval: 循环间隔（秒）
+        """
+        # 基于单调时钟的截止时间调度，扣除抓取耗时，避免周期逐次漂移
+        next_deadline = time.monotonic() + interval
+        export_task = None
+        while True:
+            # 上一轮的后台导出需在下一轮抓取前完成，避免修剪与写入交错
+            if export_task is not None:
+                await export_task
+                export_task = None
+
+            self.run_count += 1
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("\n".join([
+                    _BANNER_NL,
+                    f"第 {self.run_count} 次运行 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                    _BANNER_END,
+                ]))
+            
+            # 运行所有爬虫，导出在后台进行
+            export_task = await self.run_all_crawlers_async(background_export=True)
+            
+            # 计算下次运行时间
+            sleep_s = max(0.0, next_deadline - time.monotonic())
+            if logger.isEnabledFor(logging.INFO):
+                next_run = datetime.now() + timedelta(seconds=sleep_s)
+                logger.info("\n".join([
+                    _BANNER_NL,
+                    f"等待 {sleep_s:.0f} 秒 ({sleep_s/60:.0f} 分钟)",
+                    f"下次运行时间: {next_run.strftime('%Y-%m-%d %H:%M:%S')}",
+                    "按 Ctrl+C 停止循环",
+                    _BANNER_END,
+                ]))
+            
+            await asyncio.sleep(sleep_s)
+            # 若本轮耗时超过间隔，则从当前时间重新对齐，避免连续补跑
+            next_deadline = max(next_deadline + interval, time.monotonic())
     
     def _export_data(self):
         """根据阈值导出数据到文件"""
@@ -248,19 +383,22 @@ class CrawlerControlCenter:
             queue_threshold = int(auto_export.get('queue_threshold', max_keep))
             memory_threshold_mb = int(auto_export.get('memory_threshold_mb', 0))
 
-            logger.info("\n" + "=" * 60)
+            logger.info(_BANNER_NL)
             logger.info("检查是否需要导出数据")
-            logger.info("=" * 60)
+            logger.info(_BANNER)
+
+            # 队列长度与内存信息一次往返获取
+            redis_stats = self.redis_client.get_stats_batch()
 
             # 条件1：队列长度
-            current_length = self.redis_client.get_queue_length()
+            current_length = redis_stats['queue_length']
             need_export = current_length > max(queue_threshold, max_keep)
 
             # 条件2：内存阈值
             if memory_threshold_mb > 0:
-                mem = self.redis_client.get_memory_usage()
-                if mem.get('used_memory_mb', 0) >= memory_threshold_mb:
-                    logger.info(f"内存阈值触发：{mem.get('used_memory_mb',0):.2f}MB ≥ {memory_threshold_mb}MB")
+                used_memory_mb = redis_stats['used_memory_mb']
+                if used_memory_mb >= memory_threshold_mb:
+                    logger.info(f"内存阈值触发：{used_memory_mb:.2f}MB ≥ {memory_threshold_mb}MB")
                     need_export = True
 
             logger.info(f"当前 Redis 队列长度: {current_length}")
@@ -282,49 +420,39 @@ class CrawlerControlCenter:
     
     def _print_statistics(self):
         """打印统计信息"""
-        logger.info("\n" + "=" * 60)
-        logger.info("抓取任务统计")
-        logger.info("=" * 60)
-        
-        total_items = 0
-        total_errors = 0
-        
-        # Reddit
-        reddit_total = self.statistics['reddit']['posts'] + self.statistics['reddit']['comments']
-        total_items += reddit_total
-        total_errors += self.statistics['reddit']['errors']
-        logger.info(f"Reddit:      帖子 {self.statistics['reddit']['posts']}, "
-                   f"评论 {self.statistics['reddit']['comments']}, "
-                   f"错误 {self.statistics['reddit']['errors']}")
-        
-        # NewsAPI
-        total_items += self.statistics['newsapi']['articles']
-        total_errors += self.statistics['newsapi']['errors']
-        logger.info(f"NewsAPI:     文章 {self.statistics['newsapi']['articles']}, "
-                   f"错误 {self.statistics['newsapi']['errors']}")
-        
-        # RSS
-        total_items += self.statistics['rss']['articles']
-        total_errors += self.statistics['rss']['errors']
-        logger.info(f"RSS:         文章 {self.statistics['rss']['articles']}, "
-                   f"错误 {self.statistics['rss']['errors']}")
-        
-        # StockTwits
-        total_items += self.statistics['stocktwits']['messages']
-        total_errors += self.statistics['stocktwits']['errors']
-        logger.info(f"StockTwits:  消息 {self.statistics['stocktwits']['messages']}, "
-                   f"错误 {self.statistics['stocktwits']['errors']}")
-        
-        # Alpha Vantage
-        total_items += self.statistics['alphavantage']['items']
-        total_errors += self.statistics['alphavantage']['errors']
-        logger.info(f"AlphaVantage: 数据 {self.statistics['alphavantage']['items']}, "
-                   f"错误 {self.statistics['alphavantage']['errors']}")
-        
-        logger.info("-" * 60)
-        logger.info(f"总计:        数据 {total_items}, 错误 {total_errors}")
-        logger.info(f"队列长度:    {self.redis_client.get_queue_length()}")
-        logger.info("=" * 60)
+        if not logger.isEnabledFor(logging.INFO):
+            return
+
+        # 计数全为 0 或与上次打印时相同（本周期无新数据也无新错误）：只输出一行，跳过格式化与 Redis 查询
+        snapshot = tuple(tuple(row) for row in self._stats)
+        if snapshot == self._last_printed_stats:
+            logger.info("○ 本周期无新数据")
+            return
+        self._last_printed_stats = snapshot
+        stats = self.statistics
+        totals = [sum(col) for col in zip(*self._stats)]
+        total_errors = totals[_ERRORS_IDX]
+        total_items = sum(totals) - total_errors
+        redis_stats = self.redis_client.get_stats_batch()
+
+        # 拼成一条多行日志输出，减少 handler 加锁与 I/O 次数
+        lines = [
+            _BANNER_NL,
+            "抓取任务统计",
+            _BANNER,
+            *(
+                f"{label + ':':<12} " + ", ".join(
+                    f"{FIELD_LABELS[f]} {stats[name][f]}" for f in fields
+                )
+                for name, label, _, fields in CRAWLER_REGISTRY
+            ),
+            _RULE,
+            f"总计:        数据 {total_items}, 错误 {total_errors}",
+            f"队列长度:    {redis_stats['queue_length']}",
+            f"Redis 内存:  {redis_stats['used_memory_human']}",
+            _BANNER,
+        ]
+        logger.info("\n".join(lines))
     
     def get_status(self) -> Dict:
         """
@@ -333,15 +461,18 @@ class CrawlerControlCenter:
         Returns:
             dict: 状态信息
         """
+        redis_stats = self.redis_client.get_stats_batch()
         return {
             'enabled_crawlers': list(self.crawlers.keys()),
             'statistics': self.statistics,
-            'redis_queue_length': self.redis_client.get_queue_length(),
+            'redis_queue_length': redis_stats['queue_length'],
+            'redis_memory_mb': redis_stats['used_memory_mb'],
             'timestamp': datetime.now().isoformat()
         }
     
     def close(self):
         """关闭所有连接"""
+        close_session()
         if self.redis_client:
             self.redis_client.close()
             logger.info("Redis 连接已关闭")
@@ -361,37 +492,18 @@ def main():
         
         if args.loop:
             # 循环模式
-            logger.info("=" * 60)
+            logger.info(_BANNER)
             logger.info(f"启动循环模式 - 间隔: {args.interval} 秒 ({args.interval/60:.0f} 分钟)")
             logger.info("按 Ctrl+C 停止")
-            logger.info("=" * 60)
+            logger.info(_BANNER)
             
-            run_count = 0
             try:
-                while True:
-                    run_count += 1
-                    logger.info(f"\n{'='*60}")
-                    logger.info(f"第 {run_count} 次运行 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                    logger.info(f"{'='*60}\n")
-                    
-                    # 运行所有爬虫
-                    center.run_all_crawlers()
-                    
-                    # 计算下次运行时间
-                    next_run = datetime.now() + timedelta(seconds=args.interval)
-                    logger.info(f"\n{'='*60}")
-                    logger.info(f"等待 {args.interval} 秒 ({args.interval/60:.0f} 分钟)")
-                    logger.info(f"下次运行时间: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
-                    logger.info(f"按 Ctrl+C 停止循环")
-                    logger.info(f"{'='*60}\n")
-                    
-                    time.sleep(args.interval)
-                    
+                asyncio.run(center.run_forever(args.interval))
             except KeyboardInterrupt:
-                logger.info("\n\n" + "="*60)
+                logger.info("\n" + _BANNER_NL)
                 logger.info("收到停止信号 (Ctrl+C)")
-                logger.info(f"总共运行了 {run_count} 次")
-                logger.info("="*60)
+                logger.info(f"总共运行了 {center.run_count} 次")
+                logger.info(_BANNER)
         else:
             # 单次运行模式
             center.run_all_crawlers()
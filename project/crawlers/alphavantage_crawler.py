@@ -5,15 +5,33 @@ API 文档: https://www.alphavantage.co/documentation/
 免费套餐: 25 次/天 (推荐配置)
 """
 import time
-import requests
+import asyncio
 import yaml
 from datetime import datetime, date
-from typing import List, Dict, Any, Optional
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Tuple
 from utils.logger import setup_logger
-from utils.redis_client import RedisClient
+from utils.redis_client import RedisClient, create_pool
+from utils.json_codec import dumps, loads
+from utils.rate_limiter import AsyncTokenBucket
+from utils.http_client import get_session, close_session
+
+# 优先使用 libyaml 的 C 实现，不可用时回退到纯 Python 版本（模块加载时确定一次）
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 
 logger = setup_logger('alphavantage_crawler')
 
+# 配额计数键保留 2 天，足够覆盖跨天查询
+QUOTA_KEY_TTL = 2 * 86400
+# 响应体长度阈值（字节）：空结果（如 {"Global Quote": {}}）短于 MIN_BODY_BYTES，
+# 限速/错误提示短于 SHORT_BODY_BYTES，正常数据远大于后者
+MIN_BODY_BYTES = 60
+SHORT_BODY_BYTES = 1024
+
+
+class RateLimitExceeded(Exception):
+    """Alpha Vantage 返回限速提示"""
+
 
 class AlphaVantageCrawler:
     """Alpha Vantage 爬虫类"""
@@ -31,6 +49,18 @@ class AlphaVantageCrawler:
         self.enabled = config.get('enabled', False)
         self.api_key = config.get('api_key', '')
         self.base_url = 'https://www.alphavantage.co/query'
+        # 复用进程内共享的 HTTP Session（keep-alive + 连接池）
+        self.session = get_session()
+        
+        # 各接口的固定查询参数只构造一次（只读），请求时仅合并 symbol/tickers
+        self._params_quote = MappingProxyType({'function': 'GLOBAL_QUOTE', 'apikey': self.api_key})
+        self._params_news = MappingProxyType({'function': 'NEWS_SENTIMENT', 'apikey': self.api_key, 'limit': 10})
+        self._params_overview = MappingProxyType({'function': 'OVERVIEW', 'apikey': self.api_key})
+        self._params_earnings = MappingProxyType({'function': 'EARNINGS', 'apikey': self.api_key})
+        # 写入 Redis 的 url 字段模板（不含 apikey）
+        self._quote_url_template = self.base_url + '?function=GLOBAL_QUOTE&symbol={}'
+        self._overview_url_template = self.base_url + '?function=OVERVIEW&symbol={}'
+        self._earnings_url_template = self.base_url + '?function=EARNINGS&symbol={}'
         
         # 读取配置
         self.symbols = config.get('symbols', ['AAPL', 'MSFT', 'GOOGL'])
@@ -41,6 +71,24 @@ class AlphaVantageCrawler:
         self.max_requests_per_day = self.rate_limits.get('max_requests_per_day', 25)
         self.requests_per_run = self.rate_limits.get('requests_per_run', 5)
         self.delay_between_requests = self.rate_limits.get('delay_between_requests', 12)
+        # 同时在途的最大请求数
+        self.max_concurrency = self.rate_limits.get('max_concurrency', 5)
+        # 按季度变化的数据在 Redis 中缓存（秒）：公司概况 24 小时，财报 6 小时
+        self.cache_ttl = {'overview': 86400, 'earnings': 21600}
+        self.cache_ttl.update(config.get('cache_ttl') or {})
+        
+        # 限速响应后的最大重试次数
+        self.max_retries = self.rate_limits.get('max_retries', 2)
+        
+        # 令牌桶：未配置 requests_per_minute 时由 delay_between_requests 推算（12 秒 → 5 次/分钟）
+        # 容量为 1，不允许突发：满桶起步会在补充之外再多发一整桶，首分钟超出 5 次/分钟的限额
+        requests_per_minute = self.rate_limits.get('requests_per_minute')
+        if requests_per_minute is None and self.delay_between_requests:
+            requests_per_minute = 60 / self.delay_between_requests
+        self.bucket = (
+            AsyncTokenBucket(rate=requests_per_minute / 60, capacity=1)
+            if requests_per_minute else None
+        )
         
         if not self.enabled:
             logger.info("Alpha Vantage 爬虫已禁用")
@@ -67,7 +115,8 @@ class AlphaVantageCrawler:
             return stats
         
         # 检查每日配额
-        if not self._check_daily_quota():
+        allowed, _ = self._quota_check_and_get()
+        if not allowed:
             logger.warning("⚠️ 今日配额已用完，跳过抓取")
             return stats
         
@@ -77,52 +126,16 @@ class AlphaVantageCrawler:
         symbols_to_process = self.symbols[:self.requests_per_run]
         requests_used = 0
         
-        for symbol in symbols_to_process:
-            try:
-                logger.info(f"正在抓取股票: {symbol}")
-                
-                # 抓取不同类型的数据
-                for data_type in self.data_types:
-                    try:
-                        if data_type == 'quote':
-                            # 实时报价
-                            data = self._fetch_global_quote(symbol)
-                            if data:
-                                stats['items'] += 1
-                                requests_used += 1
-                        
-                        elif data_type == 'news':
-                            # 新闻
-                            news_items = self._fetch_news_sentiment(symbol)
-                            stats['items'] += len(news_items)
-                            requests_used += 1
-                        
-                        elif data_type == 'overview':
-                            # 公司概况
-                            data = self._fetch_company_overview(symbol)
-                            if data:
-                                stats['items'] += 1
-                                requests_used += 1
-                        
-                        elif data_type == 'earnings':
-                            # 财报数据
-                            data = self._fetch_earnings(symbol)
-                            if data:
-                                stats['items'] += 1
-                                requests_used += 1
-                        
-                        # API 限速：免费版 5 次/分钟
-                        time.sleep(self.delay_between_requests)
-                        
-                    except Exception as e:
-                        logger.error(f"  ✗ 抓取 {symbol} 的 {data_type} 数据失败: {e}")
-                        stats['errors'] += 1
-                
-                logger.info(f"✓ 股票 {symbol} 抓取完成")
-                
-            except Exception as e:
-                logger.error(f"抓取股票 {symbol} 时出错: {e}")
+        # 所有 (股票, 数据类型) 请求并发执行，仅受限速约束
+        results = asyncio.run(self._acrawl(symbols_to_process))
+        for (symbol, data_type), result in results:
+            if isinstance(result, Exception):
+                logger.error(f"  ✗ 抓取 {symbol} 的 {data_type} 数据失败: {result}")
                 stats['errors'] += 1
+                continue
+            items, used = result
+            stats['items'] += items
+            requests_used += used
         
         # 更新配额
         self._update_quota(requests_used)
@@ -131,6 +144,151 @@ class AlphaVantageCrawler:
         logger.info(f"本次使用: {requests_used} 次, 今日累计: {self._get_current_day_usage()} 次")
         return stats
     
+    async def _acrawl(self, symbols: List[str]) -> List[Tuple[Tuple[str, str], Any]]:
+        """
+        并发抓取所有 (股票, 数据类型) 组合
+        
+        同步的 _fetch_* 在线程中执行；信号量限制同时在途的请求数，
+        令牌桶控制请求速率（免费版 5 次/分钟）：有余量的请求立即发出，
+        只有超出部分等待；遇到限速响应时扣减令牌并退避重试。
+        
+        Args:
+            symbols: 股票代码列表
+        
+        Returns:
+            list: [((symbol, data_type), (items, requests_used) 或异常), ...]
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def run_one(symbol: str, data_type: str):
+            async with semaphore:
+                for attempt in range(self.max_retries + 1):
+                    if self.bucket:
+                        await self.bucket.acquire()
+                    try:
+                        return await asyncio.to_thread(self._dispatch, symbol, data_type)
+                    except RateLimitExceeded as e:
+                        if attempt >= self.max_retries:
+                            raise
+                        logger.warning(f"  ⚠️ API 限速: {e}，{symbol} 的 {data_type} 稍后重试")
+                        # 惩罚：清空一整桶令牌，后续请求都需等待补充；并指数退避
+                        if self.bucket:
+                            self.bucket.penalize(self.bucket.capacity)
+                        await asyncio.sleep(2 ** attempt)
+        
+        keys = [(symbol, data_type) for symbol in symbols for data_type in self.data_types]
+        results = await asyncio.gather(
+            *(run_one(symbol, data_type) for symbol, data_type in keys),
+            return_exceptions=True
+        )
+        return list(zip(keys, results))
+    
+    def _dispatch(self, symbol: str, data_type: str) -> Tuple[int, int]:
+        """
+        按数据类型调用对应的抓取方法
+        
+        Args:
+            symbol: 股票代码
+            data_type: 数据类型 (quote/news/overview/earnings)
+        
+        Returns:
+            tuple: (保存的数据条数, 消耗的请求次数)
+        """
+        if data_type == 'news':
+            # 新闻
+            news_items = self._fetch_news_sentiment(symbol)
+            return len(news_items), 1
+        
+        fetchers = {
+            'quote': self._fetch_global_quote,         # 实时报价
+            'overview': self._fetch_company_overview,  # 公司概况
+            'earnings': self._fetch_earnings,          # 财报数据
+        }
+        fetcher = fetchers.get(data_type)
+        if fetcher is None:
+            logger.warning(f"  ⚠️ 未知的数据类型: {data_type}")
+            return 0, 0
+        
+        if data_type not in self.cache_ttl:
+            data = fetcher(symbol)
+            return (1, 1) if data else (0, 0)
+        
+        # 公司概况/财报按季度变化：先查 Redis 缓存，命中时不消耗 API 配额
+        cache_key = self._cache_key(data_type, symbol)
+        cached = self._cache_get(cache_key)
+        if cached is None and not self._acquire_refresh_lock(cache_key):
+            logger.info(f"  ○ {symbol} 的 {data_type} 正由其它进程刷新，本次跳过")
+            return 0, 0
+        
+        data = fetcher(symbol, cached)
+        if not data:
+            return 0, 0
+        return 1, (0 if cached is not None else 1)
+    
+    # ============== 响应缓存（cache-aside） ==============
+    def _cache_key(self, data_type: str, symbol: str) -> str:
+        return f"av:{data_type}:{symbol}"
+    
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的 API 响应，未命中或出错返回 None"""
+        try:
+            raw = self.redis_client.client.get(key)
+            return loads(raw) if raw else None
+        except Exception as e:
+            logger.debug(f"读取缓存 {key} 失败: {e}")
+            return None
+    
+    def _cache_set(self, key: str, data: Dict[str, Any], ttl: int):
+        """写入 API 响应缓存并释放刷新锁，失败不影响主流程"""
+        try:
+            pipe = self.redis_client.client.pipeline(transaction=False)
+            pipe.setex(key, ttl, dumps(data))
+            pipe.delete(f"{key}:lock")
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"写入缓存 {key} 失败: {e}")
+    
+    def _acquire_refresh_lock(self, key: str) -> bool:
+        """获取缓存刷新锁（SET NX EX），防止多进程同时刷新同一缓存"""
+        try:
+            return bool(self.redis_client.client.set(f"{key}:lock", 1, nx=True, ex=10))
+        except Exception:
+            # Redis 异常时不阻塞抓取
+            return True
+    
+    def _get_json(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        请求 Alpha Vantage 接口并解析 JSON
+        
+        Args:
+            params: 查询参数
+        
+        Returns:
+            dict: 响应数据（空结果返回 {}）
+        
+        Raises:
+            RateLimitExceeded: 响应为限速提示（Note / Information）
+        """
+        response = self.session.get(self.base_url, params=params, timeout=10)
+        response.raise_for_status()
+        
+        # 直接读取字节，跳过 requests 的编码探测
+        content = response.content
+        if len(content) < MIN_BODY_BYTES:
+            # 空结果，无需解析
+            return {}
+        
+        data = loads(content)
+        
+        # 免费版限速时仍返回 HTTP 200，正文为简短的 Note / Information 提示；
+        # 只检查短响应，正常数据不做额外查找
+        if len(content) < SHORT_BODY_BYTES:
+            for key in ('Note', 'Information'):
+                if key in data:
+                    raise RateLimitExceeded(data[key])
+        
+        return data
+    
     def _fetch_global_quote(self, symbol: str) -> Optional[Dict[str, Any]]:
         """
         抓取实时报价 (GLOBAL_QUOTE)
@@ -142,26 +300,13 @@ class AlphaVantageCrawler:
             dict: 报价数据（统一格式）
         """
         try:
-            params = {
-                'function': 'GLOBAL_QUOTE',
-                'symbol': symbol,
-                'apikey': self.api_key
-            }
-            
-            response = requests.get(self.base_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._get_json({**self._params_quote, 'symbol': symbol})
             
             # 检查错误
             if 'Error Message' in data:
                 logger.error(f"  ✗ API 错误: {data['Error Message']}")
                 return None
             
-            if 'Note' in data:
-                logger.warning(f"  ⚠️ API 限速: {data['Note']}")
-                return None
-            
             quote = data.get('Global Quote', {})
             if not quote:
                 logger.warning(f"  ⚠️ {symbol} 未返回报价数据")
@@ -176,8 +321,8 @@ class AlphaVantageCrawler:
                 # 核心字段（必需）
                 'text': f"${symbol} Stock Quote - Price: ${price}, Change: {change_percent}, Volume: {volume}",
                 'source': 'alphavantage',
-                'timestamp': int(datetime.now().timestamp()),
-                'url': f'https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}',
+                'timestamp': int(time.time()),
+                'url': self._quote_url_template.format(symbol),
                 
                 # Alpha Vantage 特有字段（可选，用于后续分析）
                 'symbol': symbol,
@@ -194,6 +339,8 @@ class AlphaVantageCrawler:
             
             return None
             
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"获取 {symbol} 报价失败: {e}")
             return None
@@ -209,48 +356,33 @@ class AlphaVantageCrawler:
             list: 新闻列表（统一格式）
         """
         try:
-            params = {
-                'function': 'NEWS_SENTIMENT',
-                'tickers': symbol,
-                'apikey': self.api_key,
-                'limit': 10  # 限制返回数量
-            }
-            
-            response = requests.get(self.base_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._get_json({**self._params_news, 'tickers': symbol})
             
             # 检查错误
             if 'Error Message' in data:
                 logger.error(f"  ✗ API 错误: {data['Error Message']}")
                 return []
             
-            if 'Note' in data:
-                logger.warning(f"  ⚠️ API 限速: {data['Note']}")
-                return []
-            
             feed = data.get('feed', [])
             if not feed:
                 logger.warning(f"  ⚠️ {symbol} 未返回新闻数据")
                 return []
             
             news_items = []
+            now_ts = int(time.time())  # 发布时间缺失/无法解析时的回退值
             for article in feed[:10]:  # 只取前 10 条
                 # ✅ 统一格式：text = 标题 + 摘要
                 title = article.get('title', '')
                 summary = article.get('summary', '')[:300]  # 限制摘要长度
                 
                 # 组合 text（类似 NewsAPI 格式）
-                text = title
-                if summary:
-                    text += f"\n\n{summary}"
+                text = '\n\n'.join(p for p in (title, summary) if p)
                 
                 news_data = {
                     # 核心字段（必需）
                     'text': text,
                     'source': 'alphavantage',
-                    'timestamp': self._parse_time(article.get('time_published', '')),
+                    'timestamp': self._parse_time(article.get('time_published', ''), now_ts),
                     'url': article.get('url', ''),
                     
                     # Alpha Vantage 特有字段（可选）
@@ -262,37 +394,35 @@ class AlphaVantageCrawler:
                     'published_at': article.get('time_published', '')
                 }
                 
-                if self.redis_client.push_data(news_data):
-                    news_items.append(news_data)
+                news_items.append(news_data)
+            
+            # 一次 pipeline 批量写入；配额截断只会丢弃末尾的条目
+            pushed = self.redis_client.push_batch(news_items)
+            news_items = news_items[:pushed]
             
             logger.info(f"  ✓ 新闻: {len(news_items)} 条")
             return news_items
             
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"获取 {symbol} 新闻失败: {e}")
             return []
     
-    def _fetch_company_overview(self, symbol: str) -> Optional[Dict[str, Any]]:
+    def _fetch_company_overview(self, symbol: str,
+                                cached: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """
         抓取公司概况 (OVERVIEW)
         
         Args:
             symbol: 股票代码
+            cached: 缓存的 API 响应，提供时不再请求接口
         
         Returns:
             dict: 公司数据（统一格式）
         """
         try:
-            params = {
-                'function': 'OVERVIEW',
-                'symbol': symbol,
-                'apikey': self.api_key
-            }
-            
-            response = requests.get(self.base_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = cached if cached is not None else self._get_json({**self._params_overview, 'symbol': symbol})
             
             # 检查错误
             if 'Error Message' in data:
@@ -303,24 +433,30 @@ class AlphaVantageCrawler:
                 logger.warning(f"  ⚠️ {symbol} 未返回公司数据")
                 return None
             
+            if cached is None:
+                self._cache_set(self._cache_key('overview', symbol), data, self.cache_ttl['overview'])
+            
             # ✅ 统一格式：text = 公司简介
             name = data.get('Name', symbol)
             sector = data.get('Sector', 'N/A')
             industry = data.get('Industry', 'N/A')
             description = data.get('Description', '')[:500]  # 限制长度
             market_cap = data.get('MarketCapitalization', '0')
+            # 部分公司（如 ETF）返回 'None'
+            market_cap_value = int(market_cap) if market_cap and market_cap != 'None' else 0
             
-            text = f"{name} - {sector} / {industry}\n\n"
-            text += f"Market Cap: ${int(market_cap):,}\n"
-            if description:
-                text += f"\n{description}"
+            text = '\n\n'.join(p for p in (
+                f"{name} - {sector} / {industry}",
+                f"Market Cap: ${market_cap_value:,}",
+                description,
+            ) if p)
             
             overview_data = {
                 # 核心字段（必需）
                 'text': text,
                 'source': 'alphavantage',
-                'timestamp': int(datetime.now().timestamp()),
-                'url': f'https://www.alphavantage.co/query?function=OVERVIEW&symbol={symbol}',
+                'timestamp': int(time.time()),
+                'url': self._overview_url_template.format(symbol),
                 
                 # Alpha Vantage 特有字段（可选）
                 'symbol': symbol,
@@ -332,36 +468,31 @@ class AlphaVantageCrawler:
             }
             
             if self.redis_client.push_data(overview_data):
-                logger.info(f"  ✓ 公司概况: {name} (市值: ${int(market_cap):,})")
+                logger.info(f"  ✓ 公司概况: {name} (市值: ${market_cap_value:,})")
                 return overview_data
             
             return None
             
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"获取 {symbol} 公司概况失败: {e}")
             return None
     
-    def _fetch_earnings(self, symbol: str) -> Optional[Dict[str, Any]]:
+    def _fetch_earnings(self, symbol: str,
+                        cached: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """
         抓取财报数据 (EARNINGS)
         
         Args:
             symbol: 股票代码
+            cached: 缓存的 API 响应，提供时不再请求接口
         
         Returns:
             dict: 财报数据（统一格式）
         """
         try:
-            params = {
-                'function': 'EARNINGS',
-                'symbol': symbol,
-                'apikey': self.api_key
-            }
-            
-            response = requests.get(self.base_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = cached if cached is not None else self._get_json({**self._params_earnings, 'symbol': symbol})
             
             # 检查错误
             if 'Error Message' in data:
@@ -373,6 +504,9 @@ class AlphaVantageCrawler:
                 logger.warning(f"  ⚠️ {symbol} 未返回财报数据")
                 return None
             
+            if cached is None:
+                self._cache_set(self._cache_key('earnings', symbol), data, self.cache_ttl['earnings'])
+            
             # 取最新一期财报
             latest = quarterly[0]
             
@@ -391,8 +525,8 @@ class AlphaVantageCrawler:
                 # 核心字段（必需）
                 'text': text,
                 'source': 'alphavantage',
-                'timestamp': int(datetime.now().timestamp()),
-                'url': f'https://www.alphavantage.co/query?function=EARNINGS&symbol={symbol}',
+                'timestamp': int(time.time()),
+                'url': self._earnings_url_template.format(symbol),
                 
                 # Alpha Vantage 特有字段（可选）
                 'symbol': symbol,
@@ -408,16 +542,19 @@ class AlphaVantageCrawler:
             
             return None
             
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"获取 {symbol} 财报失败: {e}")
             return None
     
-    def _parse_time(self, time_str: str) -> int:
+    def _parse_time(self, time_str: str, default: Optional[int] = None) -> int:
         """
         解析时间字符串为 Unix 时间戳
         
         Args:
             time_str: 时间字符串 (格式: 20231020T153045)
+            default: 无法解析时的回退值，默认为当前时间
         
         Returns:
             int: Unix 时间戳
@@ -425,85 +562,66 @@ class AlphaVantageCrawler:
         try:
             dt = datetime.strptime(time_str, '%Y%m%dT%H%M%S')
             return int(dt.timestamp())
-        except:
-            return int(datetime.now().timestamp())
+        except (ValueError, TypeError):
+            return default if default is not None else int(time.time())
     
-    def _check_daily_quota(self) -> bool:
-        """检查每日配额是否可用"""
-        current_usage = self._get_current_day_usage()
-        
-        # 检查是否需要重置计数器
-        self._reset_counter_if_needed()
+    def _quota_check_and_get(self) -> Tuple[bool, int]:
+        """
+        检查每日配额（一次 Redis EVAL 完成读取与比较）
         
-        if current_usage >= self.max_requests_per_day:
-            logger.warning(f"⚠️ 今日配额已用完: {current_usage}/{self.max_requests_per_day}")
-            return False
+        Returns:
+            tuple: (是否可以继续抓取, 剩余请求数)
+        """
+        allowed, value = self.redis_client.check_quota(self._quota_key(), self.max_requests_per_day)
+        if not allowed:
+            logger.warning(f"⚠️ 今日配额已用完: {value}/{self.max_requests_per_day}")
+            return False, 0
         
-        remaining = self.max_requests_per_day - current_usage
-        logger.info(f"✓ 今日配额检查通过: 剩余 {remaining}/{self.max_requests_per_day}")
-        return True
+        logger.info(f"✓ 今日配额检查通过: 剩余 {value}/{self.max_requests_per_day}")
+        return True, value
+    
+    def _quota_key(self) -> str:
+        """今日配额计数键（按日期分键，跨天自动归零）"""
+        return f"av:quota:{date.today()}"
     
     def _get_current_day_usage(self) -> int:
         """获取今日已使用的请求数量"""
-        return self.rate_limits.get('current_day_requests', 0)
+        try:
+            return int(self.redis_client.client.get(self._quota_key()) or 0)
+        except Exception as e:
+            logger.error(f"读取配额计数失败: {e}")
+            return 0
     
     def _update_quota(self, requests_used: int):
-        """更新配额计数"""
-        current = self.rate_limits.get('current_day_requests', 0)
-        new_total = current + requests_used
+        """
+        更新配额计数（Redis 原子累加，多进程并发安全）
         
-        # 更新配置文件中的计数器
-        self._save_quota_to_config(new_total)
+        Args:
+            requests_used: 本次使用的请求数量
+        """
+        if requests_used <= 0:
+            return
         
-        logger.info(f"✓ 配额已更新: {current} → {new_total}")
-    
-    def _reset_counter_if_needed(self):
-        """检查并重置每日计数器"""
-        last_reset = self.rate_limits.get('last_reset_date')
-        today = str(date.today())
-        
-        if last_reset != today:
-            logger.info(f"🔄 重置每日计数器: {last_reset} → {today}")
-            self.rate_limits['current_day_requests'] = 0
-            self.rate_limits['last_reset_date'] = today
-            self._save_quota_to_config(0)
-    
-    def _save_quota_to_config(self, new_total: int):
-        """将配额计数保存到 config.yaml"""
+        key = self._quota_key()
         try:
-            import yaml
-            
-            # 读取配置
-            with open('config.yaml', 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-            
-            # 更新计数
-            if 'alphavantage' not in config:
-                config['alphavantage'] = {}
-            if 'rate_limits' not in config['alphavantage']:
-                config['alphavantage']['rate_limits'] = {}
-            
-            config['alphavantage']['rate_limits']['current_day_requests'] = new_total
-            config['alphavantage']['rate_limits']['last_reset_date'] = str(date.today())
-            
-            # 写回配置
-            with open('config.yaml', 'w', encoding='utf-8') as f:
-                yaml.dump(config, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
-            
+            pipe = self.redis_client.client.pipeline(transaction=False)
+            pipe.incrby(key, requests_used)
+            pipe.expire(key, QUOTA_KEY_TTL)
+            new_total, _ = pipe.execute()
+            logger.info(f"✓ 配额已更新: {new_total - requests_used} → {new_total}")
         except Exception as e:
             logger.error(f"保存配额失败: {e}")
 
 
 def main():
     """测试函数"""
-    import yaml
-    
     # 加载配置
     with open('config.yaml', 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=_YAML_LOADER)
     
-    # 初始化 Redis 客户端
-    redis_client = RedisClient(**config['redis'])
+    # 初始化 Redis 客户端（连接池只创建一次，可供多个客户端共享）
+    pool = create_pool(**config['redis'])
+    redis_client = RedisClient(**config['redis'], pool=pool)
     
     # 初始化并运行爬虫
     crawler = AlphaVantageCrawler(config.get('alphavantage', {}), redis_client)
@@ -512,6 +630,7 @@ def main():
     print(f"抓取完成: {stats}")
     
     # 关闭连接
+    close_session()
     redis_client.close()
 
 
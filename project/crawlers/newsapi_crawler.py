@@ -5,14 +5,48 @@ NewsAPI 爬虫模块
 需要申请免费 API Key: https://newsapi.org/
 """
 import time
+import hashlib
+import threading
 import yaml
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, date
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from utils.logger import setup_logger
-from utils.redis_client import RedisClient
+from utils.redis_client import RedisClient, create_pool
+from utils.json_codec import loads
+from utils.http_client import get_session, close_session
+from utils.rate_limiter import TokenBucket
+
+# 优先使用 libyaml 的 C 实现，不可用时回退到纯 Python 版本（模块加载时确定一次）
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 
 logger = setup_logger('newsapi_crawler')
 
+# 配额计数键保留 2 天，足够覆盖跨天查询
+QUOTA_KEY_TTL = 2 * 86400
+# ETag 与已见文章集合的保留时间
+ETAG_KEY_TTL = 86400
+SEEN_KEY_TTL = 2 * 86400
+
+EVERYTHING_URL = 'https://newsapi.org/v2/everything'
+
+
+@lru_cache(maxsize=4096)
+def _parse_published_at(published_at: str) -> Optional[int]:
+    """
+    解析 NewsAPI 的 publishedAt（ISO-8601，如 2025-10-20T08:30:00Z）为 Unix 时间戳
+    
+    同一批文章常有完全相同的发布时间，结果做缓存
+    
+    Returns:
+        int: Unix 时间戳；无法解析时返回 None
+    """
+    try:
+        return int(datetime.fromisoformat(published_at.replace('Z', '+00:00')).timestamp())
+    except (ValueError, TypeError, AttributeError):
+        return None
+
 
 class NewsAPICrawler:
     """NewsAPI 爬虫类"""
@@ -34,6 +68,10 @@ class NewsAPICrawler:
         self.rate_limits = config.get('rate_limits', {})
         self.max_requests_per_day = self.rate_limits.get('max_requests_per_day', 100)
         self.requests_per_run = self.rate_limits.get('requests_per_run', 3)
+        # 关键词并发数与请求速率（默认每秒 1 次，与原先的请求间隔一致）
+        self.max_workers = self.rate_limits.get('max_workers', 4)
+        requests_per_second = self.rate_limits.get('requests_per_second', 1)
+        self.bucket = TokenBucket(requests_per_second, 1) if requests_per_second > 0 else None
         
         if not self.enabled:
             logger.info("NewsAPI 爬虫已禁用")
@@ -44,17 +82,12 @@ class NewsAPICrawler:
             self.enabled = False
             return
         
-        try:
-            from newsapi import NewsApiClient
-            self.newsapi = NewsApiClient(api_key=self.api_key)
-            logger.info("NewsAPI 爬虫初始化成功")
-        except ImportError as e:
-            logger.error(f"newsapi-python 未安装: {e}")
-            logger.error("请运行: pip install newsapi-python")
-            self.enabled = False
-        except Exception as e:
-            logger.error(f"NewsAPI 初始化失败: {e}")
-            self.enabled = False
+        # 直接调用 REST 接口，复用进程内共享的 HTTP Session（keep-alive + 连接池）
+        self.session = get_session()
+        # 本轮已处理的文章 URL（同一篇文章常被多个关键词命中）
+        self._run_seen = set()
+        self._run_seen_lock = threading.Lock()
+        logger.info("NewsAPI 爬虫初始化成功")
     
     def crawl(self) -> Dict[str, int]:
         """
@@ -70,7 +103,8 @@ class NewsAPICrawler:
             return stats
         
         # 检查每日配额
-        if not self._check_daily_quota():
+        allowed, _ = self._quota_check_and_get()
+        if not allowed:
             logger.warning("⚠️ 今日配额已用完,跳过抓取")
             return stats
         
@@ -89,58 +123,29 @@ class NewsAPICrawler:
         from_7days = (now - timedelta(days=1)).strftime('%Y-%m-%d')  # 改为 7 天
         
         requests_used = 0
+        self._run_seen = set()
         
-        for query in queries:
-            try:
-                logger.info(f"正在搜索关键词: {query}")
-                
-                articles = []
-                
-                # ✅ 修复：使用 everything 端点 + 7天时间范围
+        # 各关键词的请求互不依赖，线程池并发发出（socket 读期间释放 GIL），
+        # 由共享令牌桶控制整体速率，取代原先每个关键词后的 time.sleep(1)
+        max_workers = max(1, min(self.max_workers, len(queries)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self._crawl_query, query, language, from_7days, articles_per_keyword
+                ): query
+                for query in queries
+            }
+            for future in as_completed(futures):
+                query = futures[future]
                 try:
-                    response = self.newsapi.get_everything(
-                        q=query,
-                        language=language,
-                        from_param=from_7days,  # ✅ 改为 7 天
-                        sort_by='publishedAt',  # 按发布时间排序
-                        page_size=articles_per_keyword
-                    )
-                    requests_used += 1
-                    
-                    if response['status'] == 'ok':
-                        articles = response.get('articles', [])
-                        total_results = response.get('totalResults', 0)
-                        logger.info(f"  ✓ 找到 {len(articles)} 篇文章（总共 {total_results} 篇可用）")
-                    else:
-                        logger.warning(f"  ✗ API 返回错误: {response.get('message', 'Unknown')}")
-                        
+                    saved, used, failed = future.result()
+                    stats['articles'] += saved
+                    requests_used += used
+                    if failed:
+                        stats['errors'] += 1
                 except Exception as e:
-                    logger.error(f"  ✗ 抓取失败: {e}")
-                    # ✅ 打印详细错误信息
-                    import traceback
-                    logger.error(traceback.format_exc())
+                    logger.error(f"搜索关键词 {query} 时出错: {e}")
                     stats['errors'] += 1
-                    continue
-                
-                # 保存文章
-                keyword_count = 0
-                for article in articles:
-                    article_data = self._extract_article_data(article, query)
-                    if article_data and self.redis_client.push_data(article_data):
-                        stats['articles'] += 1
-                        keyword_count += 1
-                
-                logger.info(
-                    f"✓ 关键词 '{query}' 抓取完成 - "
-                    f"获取: {len(articles)} 篇, 保存: {keyword_count} 篇"
-                )
-                
-                # 避免请求过快
-                time.sleep(1)
-                
-            except Exception as e:
-                logger.error(f"搜索关键词 {query} 时出错: {e}")
-                stats['errors'] += 1
         
         # 更新配额
         self._update_quota(requests_used)
@@ -149,6 +154,169 @@ class NewsAPICrawler:
         logger.info(f"本次使用: {requests_used} 次, 今日累计: {self._get_current_day_usage()} 次")
         return stats
     
+    def _crawl_query(self, query: str, language: str, from_param: str,
+                     page_size: int) -> Tuple[int, int, bool]:
+        """
+        抓取单个关键词并写入 Redis（在线程池中执行）
+        
+        Args:
+            query: 搜索关键词
+            language: 语言
+            from_param: 起始日期 (YYYY-MM-DD)
+            page_size: 返回数量
+        
+        Returns:
+            tuple: (保存文章数, 消耗请求数, 是否出错)
+        """
+        logger.info(f"正在搜索关键词: {query}")
+        
+        if self.bucket is not None:
+            self.bucket.acquire()
+        
+        articles = []
+        
+        # ✅ 修复：使用 everything 端点 + 7天时间范围
+        try:
+            response = self._get_everything(
+                q=query,
+                language=language,
+                from_param=from_param,  # ✅ 改为 7 天
+                sort_by='publishedAt',  # 按发布时间排序
+                page_size=page_size
+            )
+            
+            if response['status'] == 'not_modified':
+                # 304：结果与上次相同，无需解析与写入
+                logger.info(f"  ○ [{query}] 结果未变化（304），跳过")
+                return 0, 1, False
+            
+            if response['status'] == 'ok':
+                articles = response.get('articles', [])
+                total_results = response.get('totalResults', 0)
+                logger.info(f"  ✓ [{query}] 找到 {len(articles)} 篇文章（总共 {total_results} 篇可用）")
+            else:
+                logger.warning(f"  ✗ [{query}] API 返回错误: {response.get('message', 'Unknown')}")
+                
+        except Exception as e:
+            logger.error(f"  ✗ [{query}] 抓取失败: {e}")
+            # ✅ 打印详细错误信息
+            import traceback
+            logger.error(traceback.format_exc())
+            return 0, 0, True
+        
+        # 保存文章：整理后一次 pipeline 批量写入
+        batch = []
+        duplicates = 0
+        for article in articles:
+            # 本轮其它关键词已处理过的文章直接跳过，不再解析与序列化
+            url = article.get('url')
+            if url:
+                with self._run_seen_lock:
+                    if url in self._run_seen:
+                        duplicates += 1
+                        continue
+                    self._run_seen.add(url)
+            article_data = self._extract_article_data(article, query)
+            if article_data:
+                batch.append(article_data)
+        batch = self._filter_seen(batch)
+        keyword_count = self.redis_client.push_batch(batch)
+        
+        logger.info(
+            f"✓ 关键词 '{query}' 抓取完成 - "
+            f"获取: {len(articles)} 篇, 本轮重复: {duplicates} 篇, 保存: {keyword_count} 篇"
+        )
+        return keyword_count, 1, False
+    
+    def _get_everything(self, q: str, language: str, from_param: str,
+                        sort_by: str, page_size: int) -> Dict[str, Any]:
+        """
+        调用 /v2/everything 接口（条件请求：携带上次的 ETag，未变化时服务端返回 304）
+        
+        Args:
+            q: 搜索关键词
+            language: 语言
+            from_param: 起始日期 (YYYY-MM-DD)
+            sort_by: 排序方式
+            page_size: 返回数量
+        
+        Returns:
+            dict: 接口响应（含 status / articles / totalResults 或 message）；
+                  304 时返回 {'status': 'not_modified'}
+        """
+        params = {
+            'q': q,
+            'language': language,
+            'from': from_param,
+            'sortBy': sort_by,
+            'pageSize': page_size,
+        }
+        # API Key 放在请求头中，避免出现在 URL 与日志里
+        headers = {'X-Api-Key': self.api_key}
+        etag_key = f"newsapi:etag:{q}"
+        etag = self._redis_get(etag_key)
+        if etag:
+            headers['If-None-Match'] = etag
+        
+        response = self.session.get(
+            EVERYTHING_URL,
+            params=params,
+            headers=headers,
+            timeout=10
+        )
+        if response.status_code == 304:
+            return {'status': 'not_modified'}
+        
+        # 错误响应（401/429 等）同样返回 {status: error, message: ...}
+        data = loads(response.content)
+        
+        new_etag = response.headers.get('ETag')
+        if new_etag and data.get('status') == 'ok':
+            try:
+                self.redis_client.client.set(etag_key, new_etag, ex=ETAG_KEY_TTL)
+            except Exception as e:
+                logger.debug(f"保存 ETag 失败: {e}")
+        return data
+    
+    def _redis_get(self, key: str) -> Optional[str]:
+        """读取 Redis 键，出错时返回 None（不影响抓取）"""
+        try:
+            return self.redis_client.client.get(key)
+        except Exception as e:
+            logger.debug(f"读取 {key} 失败: {e}")
+            return None
+    
+    def _filter_seen(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        跨轮询去重：文章 URL 的摘要 SADD 到当日集合，只保留首次出现的文章
+        
+        Args:
+            batch: 待写入的文章列表
+        
+        Returns:
+            list: 未出现过的文章（无 URL 的文章原样保留）
+        """
+        hashed = [i for i, item in enumerate(batch) if item.get('url')]
+        if not hashed:
+            return batch
+        
+        key = f"newsapi:seen:{date.today()}"
+        try:
+            pipe = self.redis_client.client.pipeline(transaction=False)
+            for i in hashed:
+                digest = hashlib.blake2b(batch[i]['url'].encode(), digest_size=8).hexdigest()
+                pipe.sadd(key, digest)
+            pipe.expire(key, SEEN_KEY_TTL)
+            added = pipe.execute()
+        except Exception as e:
+            logger.error(f"文章去重失败，按未去重写入: {e}")
+            return batch
+        
+        seen = {i for i, ok in zip(hashed, added) if not ok}
+        if seen:
+            logger.info(f"  ○ 跳过 {len(seen)} 篇已抓取过的文章")
+        return [item for i, item in enumerate(batch) if i not in seen]
+    
     def _extract_article_data(self, article: dict, query: str) -> Dict[str, Any]:
         """
         提取文章数据 - 完整信息
@@ -166,20 +334,13 @@ class NewsAPICrawler:
             description = article.get('description', '')
             content = article.get('content', '')
             
-            text = title
-            if description:
-                text += "\n\n" + description
-            if content:
-                text += "\n\n" + content
+            text = '\n\n'.join(p for p in (title, description, content) if p)
             
             # 解析时间戳
             published_at = article.get('publishedAt', '')
-            try:
-                from dateutil import parser as date_parser
-                dt = date_parser.parse(published_at)
-                timestamp = int(dt.timestamp())
-            except:
-                timestamp = int(datetime.now().timestamp())
+            timestamp = _parse_published_at(published_at)
+            if timestamp is None:
+                timestamp = int(time.time())
             
             data = {
                 # 基础字段
@@ -213,94 +374,63 @@ class NewsAPICrawler:
             logger.error(f"提取文章数据失败: {e}")
             return None
     
-    def _check_daily_quota(self) -> bool:
+    def _quota_check_and_get(self) -> Tuple[bool, int]:
         """
-        检查每日配额是否可用
+        检查每日配额（一次 Redis EVAL 完成读取与比较）
         
         Returns:
-            bool: 是否可以继续抓取
+            tuple: (是否可以继续抓取, 剩余请求数)
         """
-        current_usage = self._get_current_day_usage()
+        allowed, value = self.redis_client.check_quota(self._quota_key(), self.max_requests_per_day)
+        if not allowed:
+            logger.warning(f"⚠️ 今日配额已用完: {value}/{self.max_requests_per_day}")
+            return False, 0
         
-        # 检查是否需要重置计数器
-        self._reset_counter_if_needed()
-        
-        if current_usage >= self.max_requests_per_day:
-            logger.warning(f"⚠️ 今日配额已用完: {current_usage}/{self.max_requests_per_day}")
-            return False
-        
-        remaining = self.max_requests_per_day - current_usage
-        logger.info(f"✓ 今日配额检查通过: 剩余 {remaining}/{self.max_requests_per_day}")
-        return True
+        logger.info(f"✓ 今日配额检查通过: 剩余 {value}/{self.max_requests_per_day}")
+        return True, value
+    
+    def _quota_key(self) -> str:
+        """今日配额计数键（按日期分键，跨天自动归零）"""
+        return f"newsapi:quota:{date.today()}"
     
     def _get_current_day_usage(self) -> int:
         """获取今日已使用的请求数量"""
-        return self.rate_limits.get('current_day_requests', 0)
+        try:
+            return int(self.redis_client.client.get(self._quota_key()) or 0)
+        except Exception as e:
+            logger.error(f"读取配额计数失败: {e}")
+            return 0
     
     def _update_quota(self, requests_used: int):
         """
-        更新配额计数
+        更新配额计数（Redis 原子累加，多进程并发安全）
         
         Args:
             requests_used: 本次使用的请求数量
         """
-        current = self.rate_limits.get('current_day_requests', 0)
-        new_total = current + requests_used
-        
-        # 更新配置文件中的计数器
-        self._save_quota_to_config(new_total)
-        
-        logger.info(f"✓ 配额已更新: {current} → {new_total}")
-    
-    def _reset_counter_if_needed(self):
-        """检查并重置每日计数器"""
-        last_reset = self.rate_limits.get('last_reset_date')
-        today = str(date.today())
-        
-        if last_reset != today:
-            logger.info(f"✓ 每日计数器重置 (上次: {last_reset})")
-            self.rate_limits['current_day_requests'] = 0
-            self.rate_limits['last_reset_date'] = today
-            self._save_quota_to_config(0)
-    
-    def _save_quota_to_config(self, new_total: int):
-        """
-        将配额计数保存到 config.yaml
+        if requests_used <= 0:
+            return
         
-        Args:
-            new_total: 新的累计数量
-        """
+        key = self._quota_key()
         try:
-            # 读取配置文件
-            with open('config.yaml', 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-            
-            # 更新计数器
-            if 'newsapi' in config and 'rate_limits' in config['newsapi']:
-                config['newsapi']['rate_limits']['current_day_requests'] = new_total
-                config['newsapi']['rate_limits']['last_reset_date'] = str(date.today())
-            
-            # 写回配置文件
-            with open('config.yaml', 'w', encoding='utf-8') as f:
-                yaml.dump(config, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
-            
-            # 更新内存中的配置
-            self.rate_limits['current_day_requests'] = new_total
-            
+            pipe = self.redis_client.client.pipeline(transaction=False)
+            pipe.incrby(key, requests_used)
+            pipe.expire(key, QUOTA_KEY_TTL)
+            new_total, _ = pipe.execute()
+            logger.info(f"✓ 配额已更新: {new_total - requests_used} → {new_total}")
         except Exception as e:
-            logger.error(f"保存配额到配置文件失败: {e}")
+            logger.error(f"保存配额失败: {e}")
 
 
 def main():
     """测试函数"""
-    import yaml
-    
     # 加载配置
     with open('config.yaml', 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=_YAML_LOADER)
     
-    # 初始化 Redis 客户端
-    redis_client = RedisClient(**config['redis'])
+    # 初始化 Redis 客户端（连接池只创建一次，可供多个客户端共享）
+    pool = create_pool(**config['redis'])
+    redis_client = RedisClient(**config['redis'], pool=pool)
     
     # 初始化并运行爬虫
     crawler = NewsAPICrawler(config.get('newsapi', {}), redis_client)
@@ -309,6 +439,7 @@ def main():
     print(f"抓取完成: {stats}")
     
     # 关闭连接
+    close_session()
     redis_client.close()
 
 
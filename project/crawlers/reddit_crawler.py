@@ -3,16 +3,30 @@ Reddit 爬虫模块
 抓取财经相关子版块的帖子和评论
 """
 import time
+import heapq
 import praw
 import prawcore
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Dict, Any
+from itertools import repeat
+from typing import List, Dict, Any, Optional, Tuple
 from utils.logger import setup_logger
 from utils.redis_client import RedisClient
+from utils.rate_limiter import TokenBucket
 
 logger = setup_logger('reddit_crawler')
 
 
+def _author_name(thing) -> str:
+    """
+    帖子或评论的作者名
+    
+    author 只读取一次；Redditor.name 是构造时即有的属性，不会触发懒加载请求
+    """
+    author = thing.author
+    return author.name if author else '[deleted]'
+
+
 class RedditCrawler:
     """Reddit 爬虫类"""
     
@@ -41,11 +55,24 @@ class RedditCrawler:
         self.subreddits = config.get('subreddits', ['investing', 'finance'])
         self.posts_limit = config.get('posts_limit', 50)
         self.comments_limit = config.get('comments_limit', 30)
+        # 是否包含楼中楼回复：默认只取服务端按 top 排好序的顶层评论
+        self.nested_comments = config.get('nested_comments', False)
+        # 帖子与评论先缓存，累计到该数量（或子版块结束时）再一次 pipeline 写入
+        self.batch_size = config.get('batch_size', 100)
+        # 并发线程数与请求速率（默认 100 次/分钟，可突发 max_workers 个请求）
+        self.max_workers = config.get('workers', 8)
+        requests_per_minute = config.get('requests_per_minute', 100)
+        self.bucket = TokenBucket(rate=requests_per_minute / 60, capacity=self.max_workers)
+        # 剩余额度低于该值时暂停到限速窗口重置
+        self.min_remaining = config.get('min_remaining', 5)
     
     def crawl(self) -> Dict[str, int]:
         """
         执行抓取任务
         
+        子版块并发抓取；各子版块内帖子的评论请求共用一个线程池并发发出，
+        共享令牌桶控制整体请求速率（Reddit OAuth 限制 100 次/分钟）
+        
         Returns:
             dict: 抓取统计信息 {'posts': 数量, 'comments': 数量, 'errors': 数量}
         """
@@ -53,60 +80,169 @@ class RedditCrawler:
         
         logger.info("开始抓取 Reddit 数据...")
         
-        for subreddit_name in self.subreddits:
-            sub_posts = 0
-            sub_comments = 0
-            
-            try:
-                logger.info(f"正在抓取子版块: r/{subreddit_name}")
-                subreddit = self.reddit.subreddit(subreddit_name)
-                
-                # 抓取新帖子
-                post_index = 0
-                for submission in subreddit.new(limit=self.posts_limit):
-                    post_index += 1
-                    
-                    # 显示正在处理的帖子
-                    logger.info(f"  [{post_index}/{self.posts_limit}] 抓取帖子: {submission.title[:60]}...")
-                    
-                    # 提取帖子信息
-                    post_data = self._extract_post_data(submission, subreddit_name)
-                    if post_data and self.redis_client.push_data(post_data):
-                        stats['posts'] += 1
-                        sub_posts += 1
-                        logger.debug(f"    ✓ 帖子已保存 (ID: {submission.id})")
-                    
-                    # 抓取评论
-                    logger.info(f"    → 正在抓取评论 (目标: {self.comments_limit} 条)...")
-                    comments_count = self._crawl_comments(submission, subreddit_name)
-                    stats['comments'] += comments_count
-                    sub_comments += comments_count
-                    logger.info(f"    ✓ 评论抓取完成: {comments_count} 条")
-                    
-                    # 避免请求过快
-                    time.sleep(0.5)
-                
-                logger.info(
-                    f"✓ 子版块 r/{subreddit_name} 抓取完成 - "
-                    f"帖子: {sub_posts}, 评论: {sub_comments}"
-                )
-                
-            except prawcore.ResponseException as e:
-                # 修复:使用 ResponseException 替代 RateLimitExceeded
-                if e.response.status_code == 429:
-                    logger.warning(f"Reddit API 速率限制: {e}, 等待后重试...")
-                    time.sleep(60)  # 等待1分钟
-                else:
-                    logger.error(f"Reddit API 响应错误 ({e.response.status_code}): {e}")
-                stats['errors'] += 1
-                
-            except Exception as e:
-                logger.error(f"抓取子版块 r/{subreddit_name} 时出错: {e}")
-                stats['errors'] += 1
+        # 子版块任务会阻塞等待帖子任务，两者使用不同线程池以免互相占满
+        sub_workers = max(1, min(self.max_workers, len(self.subreddits)))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as submission_pool, \
+             ThreadPoolExecutor(max_workers=sub_workers) as subreddit_pool:
+            futures = {
+                subreddit_pool.submit(self._crawl_subreddit, name, submission_pool): name
+                for name in self.subreddits
+            }
+            for future in as_completed(futures):
+                try:
+                    sub_stats = future.result()
+                except Exception as e:
+                    logger.error(f"抓取子版块 r/{futures[future]} 时出错: {e}")
+                    stats['errors'] += 1
+                    continue
+                for key in stats:
+                    stats[key] += sub_stats[key]
         
         logger.info(f"Reddit 抓取完成 - 帖子: {stats['posts']}, 评论: {stats['comments']}, 错误: {stats['errors']}")
         return stats
     
+    def _crawl_subreddit(self, subreddit_name: str, submission_pool: ThreadPoolExecutor) -> Dict[str, int]:
+        """
+        抓取单个子版块（在线程池中执行）
+        
+        Args:
+            subreddit_name: 子版块名称
+            submission_pool: 处理帖子的共享线程池
+        
+        Returns:
+            dict: {'posts': 数量, 'comments': 数量, 'errors': 数量}
+        """
+        sub_stats = {'posts': 0, 'comments': 0, 'errors': 0}
+        pending = []
+        
+        try:
+            logger.info(f"正在抓取子版块: r/{subreddit_name}")
+            subreddit = self.reddit.subreddit(subreddit_name)
+            
+            # 抓取新帖子（列表请求本身也计入速率）
+            self.bucket.acquire()
+            submissions = list(subreddit.new(limit=self.posts_limit))
+            self._adapt_to_rate_limit()
+            
+            # 各帖子的评论并发抓取；map 按原顺序返回结果
+            results = submission_pool.map(
+                self._process_submission,
+                submissions,
+                repeat(subreddit_name),
+                range(1, len(submissions) + 1),
+            )
+            for items in results:
+                pending.extend(items)
+                if len(pending) >= self.batch_size:
+                    posts, comments_saved = self._flush(pending)
+                    sub_stats['posts'] += posts
+                    sub_stats['comments'] += comments_saved
+                    pending = []
+            
+        except prawcore.ResponseException as e:
+            # 修复:使用 ResponseException 替代 RateLimitExceeded
+            if e.response.status_code == 429:
+                logger.warning(f"Reddit API 速率限制: {e}, 等待后重试...")
+                # 清空令牌桶，所有线程的后续请求都需等待补充
+                self.bucket.penalize(self.bucket.capacity)
+                time.sleep(60)  # 等待1分钟
+            else:
+                logger.error(f"Reddit API 响应错误 ({e.response.status_code}): {e}")
+            sub_stats['errors'] += 1
+            
+        except Exception as e:
+            logger.error(f"抓取子版块 r/{subreddit_name} 时出错: {e}")
+            sub_stats['errors'] += 1
+        
+        finally:
+            # 出错前已抓到的数据同样写入
+            if pending:
+                posts, comments_saved = self._flush(pending)
+                sub_stats['posts'] += posts
+                sub_stats['comments'] += comments_saved
+        
+        logger.info(
+            f"✓ 子版块 r/{subreddit_name} 抓取完成 - "
+            f"帖子: {sub_stats['posts']}, 评论: {sub_stats['comments']}"
+        )
+        return sub_stats
+    
+    def _process_submission(self, submission, subreddit_name: str, post_index: int) -> List[Dict[str, Any]]:
+        """
+        提取单个帖子及其评论（在线程池中执行）
+        
+        Args:
+            submission: PRAW submission 对象
+            subreddit_name: 子版块名称
+            post_index: 帖子序号（用于日志）
+        
+        Returns:
+            list: 帖子与评论数据（由调用方批量写入）
+        """
+        items = []
+        # 提取帖子信息
+        post_data = self._extract_post_data(submission, subreddit_name)
+        if post_data:
+            items.append(post_data)
+        
+        # 抓取评论（一次网络请求，受令牌桶限速）
+        self.bucket.acquire()
+        comments = self._crawl_comments(submission, subreddit_name)
+        self._adapt_to_rate_limit()
+        items.extend(comments)
+        # 每个帖子汇总一行进度（%-格式在日志级别关闭时不做格式化）
+        logger.info("  [r/%s %d/%d] %s... - 评论 %d 条",
+                    subreddit_name, post_index, self.posts_limit, submission.title[:60], len(comments))
+        return self._drop_seen(items)
+    
+    def _adapt_to_rate_limit(self):
+        """
+        按 Reddit 响应头（PRAW 的 auth.limits）调整令牌桶速率
+        
+        剩余额度平摊到窗口重置前的时间内，额度充足时不必按固定速率等待；
+        剩余额度过低时扣空令牌桶，后续请求等到窗口重置后再发出
+        """
+        limits = getattr(self.reddit.auth, 'limits', None)
+        if not isinstance(limits, dict):
+            return
+        remaining = limits.get('remaining')
+        reset_timestamp = limits.get('reset_timestamp')
+        if remaining is None or reset_timestamp is None:
+            return  # 尚未收到带限速头的响应
+        
+        window = max(1.0, reset_timestamp - time.time())
+        if remaining < self.min_remaining:
+            logger.warning(f"Reddit 剩余请求额度 {remaining:.0f}，暂停 {window:.0f} 秒等待重置")
+            self.bucket.pause(window + 1)
+        else:
+            self.bucket.set_rate(remaining / window)
+    
+    @staticmethod
+    def _seen_key(item: Dict[str, Any]) -> Optional[str]:
+        """帖子与评论的 Reddit fullname（t3_ / t1_），作为去重标识"""
+        if item.get('post_id'):
+            return f"t3_{item['post_id']}"
+        if item.get('comment_id'):
+            return f"t1_{item['comment_id']}"
+        return None
+    
+    def _drop_seen(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        丢弃近两周已写入过的帖子与评论（按 Reddit fullname 去重，一次 pipeline 往返；只检查不标记）
+        
+        Args:
+            items: 帖子与评论数据
+        
+        Returns:
+            list: 未出现过的数据
+        """
+        keys = [self._seen_key(item) for item in items]
+        members = [key for key in keys if key]
+        if not members:
+            return items
+        flags = iter(self.redis_client.check_seen(members, namespace='reddit'))
+        return [item for item, key in zip(items, keys) if not (key and next(flags))]
+    
     def _extract_post_data(self, submission, subreddit_name: str) -> Dict[str, Any]:
         """
         提取帖子数据 - 尽可能完整的信息
@@ -134,7 +270,7 @@ class RedditCrawler:
                 # Reddit 特有字段
                 'subreddit': subreddit_name,
                 'post_id': submission.id,
-                'author': str(submission.author) if submission.author else '[deleted]',
+                'author': _author_name(submission),
                 
                 # 互动数据（用于趋势分析）
                 'score': submission.score,
@@ -162,7 +298,21 @@ class RedditCrawler:
             logger.error(f"提取帖子数据失败: {e}")
             return None
     
-    def _crawl_comments(self, submission, subreddit_name: str) -> int:
+    def _flush(self, pending: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        将缓存的帖子与评论一次 pipeline 写入 Redis，实际写入的条目同时标记为已处理
+        
+        Args:
+            pending: 待写入的数据列表
+        
+        Returns:
+            tuple: (写入的帖子数, 写入的评论数)
+        """
+        pushed = self.redis_client.push_batch_by_source(
+            pending, seen_ids=[self._seen_key(item) for item in pending], seen_namespace='reddit')
+        return pushed.get('reddit_post', 0), pushed.get('reddit_comment', 0)
+    
+    def _crawl_comments(self, submission, subreddit_name: str) -> List[Dict[str, Any]]:
         """
         抓取帖子的评论
         
@@ -171,35 +321,36 @@ class RedditCrawler:
             subreddit_name: 子版块名称
         
         Returns:
-            int: 成功抓取的评论数量
+            list: 评论数据列表（由调用方批量写入）
         """
-        count = 0
+        comments = []
         try:
-            # 展开所有评论（限制数量以避免过多请求）
-            logger.debug(f"      → 展开评论树...")
-            submission.comments.replace_more(limit=0)
-            
-            # 获取评论列表
-            all_comments = submission.comments.list()
-            logger.debug(f"      → 找到 {len(all_comments)} 条评论,排序中...")
-            
-            # 按评分排序，取前N条
-            sorted_comments = sorted(
-                all_comments, 
-                key=lambda c: c.score if hasattr(c, 'score') else 0, 
-                reverse=True
-            )[:self.comments_limit]
+            if self.nested_comments:
+                # 展开评论树（limit=0 只移除 MoreComments 占位，不额外请求）
+                logger.debug("      → 展开评论树...")
+                submission.comments.replace_more(limit=0)
+                
+                # 获取评论列表（含楼中楼回复）
+                all_comments = submission.comments.list()
+                logger.debug("      → 找到 %d 条评论,排序中...", len(all_comments))
+                
+                # 按评分取前N条：堆选择 O(N log K)，无需对全部评论排序；
+                # 评分只读取一次；同分按原顺序（与稳定排序一致），也避免比较评论对象
+                scored = [(getattr(c, 'score', 0), -i, c) for i, c in enumerate(all_comments)]
+                sorted_comments = [c for _, _, c in heapq.nlargest(self.comments_limit, scored)]
+            else:
+                # 由服务端按 top 排序并截取（?sort=top&limit=N），首次访问 comments 时才发出请求
+                submission.comment_sort = 'top'
+                submission.comment_limit = self.comments_limit
+                # 跳过 MoreComments 占位（没有 body）
+                sorted_comments = [c for c in submission.comments if hasattr(c, 'body')][:self.comments_limit]
             
-            logger.debug(f"      → 准备保存前 {len(sorted_comments)} 条评论")
+            logger.debug("      → 准备保存前 %d 条评论", len(sorted_comments))
             
-            for idx, comment in enumerate(sorted_comments, 1):
-                try:
-                    comment_data = self._extract_comment_data(comment, subreddit_name)
-                    if comment_data and self.redis_client.push_data(comment_data):
-                        count += 1
-                        logger.debug(f"        ✓ [{idx}/{len(sorted_comments)}] 评论已保存")
-                except Exception as e:
-                    logger.warning(f"        ✗ [{idx}/{len(sorted_comments)}] 保存评论失败: {e}")
+            for comment in sorted_comments:
+                comment_data = self._extract_comment_data(comment, subreddit_name)
+                if comment_data:
+                    comments.append(comment_data)
             
         except prawcore.ResponseException as e:
             logger.error(
@@ -212,7 +363,7 @@ class RedditCrawler:
                 f"标题: {submission.title[:40]}...): {e}"
             )
         
-        return count
+        return comments
     
     def _extract_comment_data(self, comment, subreddit_name: str) -> Dict[str, Any]:
         """
@@ -236,7 +387,7 @@ class RedditCrawler:
                 # Reddit 特有字段
                 'subreddit': subreddit_name,
                 'comment_id': comment.id,
-                'author': str(comment.author) if comment.author else '[deleted]',
+                'author': _author_name(comment),
                 
                 # 互动数据（用于情感分析权重）
                 'score': comment.score,
@@ -3,20 +3,126 @@ RSS 爬虫模块
 抓取财经新闻网站的 RSS 订阅源
 支持全文抓取 (使用 newspaper3k)
 """
+import re
 import time
-import socket
+import calendar
+import requests
+import asyncio
 import feedparser
-from datetime import datetime
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from dateutil import parser as date_parser
-from newspaper import Article
+from newspaper import Article, Config
 from newspaper.article import ArticleException
-import requests
 from utils.logger import setup_logger
 from utils.redis_client import RedisClient
+from utils.http_client import get_session, close_session
+
+try:
+    from lxml import html as lxml_html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
 
 logger = setup_logger('rss_crawler')
 
+# 各订阅源上次响应的 ETag / Last-Modified（Redis Hash，field 为订阅源 URL）
+ETAG_HASH_KEY = 'rss:etags'
+MODIFIED_HASH_KEY = 'rss:modified'
+
+# CJK 统一表意文字（基本区），用于语言检测；正则扫描在 C 层完成
+_CJK_RE = re.compile(r'[\u4e00-\u9fff]')
+
+# 全文下载请求头 (模拟真实浏览器)
+_ARTICLE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate',  # requests 未安装 brotli 时无法解码 br
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Cache-Control': 'max-age=0'
+}
+
+# 备用方案请求头
+_FALLBACK_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate',  # requests 未安装 brotli 时无法解码 br
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Referer': 'https://www.google.com/'  # 伪装来源
+}
+
+# 超过该大小（或非 HTML）的页面不下载正文（视频、PDF 等）
+MAX_ARTICLE_BYTES = 2_000_000
+
+# newspaper3k 配置（不抓取图片、不缓存）；只读共享，Article 不会修改其中的值
+_NP_CONFIG = Config()
+_NP_CONFIG.language = 'en'
+_NP_CONFIG.browser_user_agent = _ARTICLE_HEADERS['User-Agent']
+_NP_CONFIG.request_timeout = 10
+_NP_CONFIG.number_threads = 1
+_NP_CONFIG.fetch_images = False  # 不抓取图片,提升速度
+_NP_CONFIG.memoize_articles = False  # 不缓存,避免内存占用
+
+# 备用方案的正文容器选择器（BeautifulSoup 回退时逐个查询）
+_CONTENT_SELECTORS = [
+    'article',
+    '.article-body',
+    '.article-content',
+    '.post-content',
+    '.entry-content',
+    '.content',
+    'main',
+    '[itemprop="articleBody"]'
+]
+
+
+def _class_xpath(name: str) -> str:
+    """CSS 类选择器 .name 对应的 XPath（按空白分隔的类名精确匹配）"""
+    return f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]"
+
+
+# 同一组选择器的 XPath 形式（lxml 合并为一次查询）
+_CONTENT_XPATH = ' | '.join([
+    '//article',
+    _class_xpath('article-body'),
+    _class_xpath('article-content'),
+    _class_xpath('post-content'),
+    _class_xpath('entry-content'),
+    _class_xpath('content'),
+    '//main',
+    '//*[@itemprop="articleBody"]',
+])
+_NOISE_XPATH = '//script | //style | //nav | //header | //footer | //aside'
+if HAS_LXML:
+    # 已解码的 str 统一按 UTF-8 编码后解析，避免与页面内的 charset 声明冲突
+    _UTF8_HTML_PARSER = lxml_html.HTMLParser(encoding='utf-8')
+
+
+@lru_cache(maxsize=1024)
+def _parse_time_string(time_str: str) -> Optional[int]:
+    """
+    解析字符串形式的发布时间为 Unix 时间戳
+    
+    同一订阅源的条目常有完全相同的时间字符串，结果做缓存
+    
+    Returns:
+        int: Unix 时间戳；无法解析时返回 None
+    """
+    try:
+        return int(date_parser.parse(time_str).timestamp())
+    except (ValueError, OverflowError, TypeError):
+        return None
+
 
 class RSSCrawler:
     """RSS 爬虫类 (支持全文抓取)"""
@@ -33,6 +139,13 @@ class RSSCrawler:
         self.redis_client = redis_client
         self.feeds = config.get('feeds', [])
         self.fetch_full_content = config.get('fetch_full_content', True)  # 是否抓取全文
+        self.max_workers = config.get('workers', 8)  # 并发抓取的订阅源数量
+        # 同一订阅源内并发下载全文的文章数（同源文章多在同一站点，限制单站并发）
+        self.article_concurrency = config.get('article_concurrency', 4)
+        # 复用进程内共享的 HTTP Session（keep-alive + 连接池），全文下载不再每次新建 TCP/TLS 连接
+        self.session = get_session()
+        # 条件请求校验值：订阅源未更新时服务器返回 304，省去下载与 XML 解析
+        self._etags, self._modified = self._load_validators()
         
         logger.info(f"RSS 爬虫初始化完成，订阅源数量: {len(self.feeds)}")
         if self.fetch_full_content:
@@ -40,7 +153,7 @@ class RSSCrawler:
     
     def crawl(self) -> Dict[str, int]:
         """
-        执行抓取任务
+        执行抓取任务（各订阅源在线程池中并发抓取）
         
         Returns:
             dict: 抓取统计信息 {'articles': 数量, 'errors': 数量}
@@ -49,48 +162,176 @@ class RSSCrawler:
         
         logger.info("开始抓取 RSS 数据...")
         
+        feeds = []
         for feed_config in self.feeds:
-            feed_name = feed_config.get('name', 'Unknown')
-            feed_url = feed_config.get('url')
-            
-            if not feed_url:
-                logger.warning(f"RSS 源 {feed_name} 缺少 URL，跳过")
+            if not feed_config.get('url'):
+                logger.warning(f"RSS 源 {feed_config.get('name', 'Unknown')} 缺少 URL，跳过")
                 continue
-            
-            try:
-                logger.info(f"正在抓取 RSS 源: {feed_name}")
-                
-                # 解析 RSS (带超时和重试)
-                feed = self._fetch_feed_with_timeout(feed_url, feed_name)
-                
-                # 检查是否解析成功
-                if not feed or feed.bozo:
-                    if feed and feed.bozo:
-                        logger.warning(f"RSS 源 {feed_name} 解析警告: {feed.bozo_exception}")
-                    continue
-                
-                # 提取文章
-                for entry in feed.entries:
-                    article_data = self._extract_article_data(entry, feed_name, feed_config)
-                    if article_data and self.redis_client.push_data(article_data):
-                        stats['articles'] += 1
-                
-                logger.info(f"RSS 源 {feed_name} 抓取完成，文章数: {len(feed.entries)}")
-                
-                # 避免请求过快
-                time.sleep(1)
-                
-            except Exception as e:
-                logger.error(f"抓取 RSS 源 {feed_name} 时出错: {e}")
-                stats['errors'] += 1
+            feeds.append(feed_config)
+        
+        if feeds:
+            # 各订阅源来自不同站点，无需串行等待
+            max_workers = max(1, min(self.max_workers, len(feeds)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for articles, failed in executor.map(self._crawl_feed, feeds):
+                    stats['articles'] += articles
+                    if failed:
+                        stats['errors'] += 1
         
         logger.info(f"RSS 抓取完成 - 文章: {stats['articles']}, 错误: {stats['errors']}")
         return stats
     
+    def _crawl_feed(self, feed_config: dict) -> Tuple[int, bool]:
+        """
+        抓取单个 RSS 源并写入 Redis（在线程池中执行）
+        
+        Args:
+            feed_config: RSS 源配置（包含 name, url, category 等）
+        
+        Returns:
+            tuple: (保存文章数, 是否出错)
+        """
+        feed_name = feed_config.get('name', 'Unknown')
+        feed_url = feed_config.get('url')
+        
+        try:
+            logger.info(f"正在抓取 RSS 源: {feed_name}")
+            
+            # 解析 RSS (带超时和重试)
+            feed = self._fetch_feed_with_timeout(feed_url, feed_name)
+            
+            # 检查是否解析成功
+            if not feed or feed.bozo:
+                if feed and feed.bozo:
+                    logger.warning(f"RSS 源 {feed_name} 解析警告: {feed.bozo_exception}")
+                return 0, False
+            
+            # 订阅源自上次抓取后未更新
+            if feed.get('status') == 304:
+                logger.info(f"RSS 源 {feed_name} 未更新 (304)，跳过")
+                return 0, False
+            
+            # 跳过近两周已写入过的文章（在全文下载之前，一次 pipeline 批量检查；写入成功后才标记）
+            entries = self._filter_unseen(feed.entries)
+            if len(entries) < len(feed.entries):
+                logger.info(f"RSS 源 {feed_name} 跳过已抓取文章: {len(feed.entries) - len(entries)} 篇")
+            
+            # 提取文章，整理后一次 pipeline 批量写入
+            if self.fetch_full_content:
+                # 全文下载是网络 I/O，同一订阅源内的文章并发处理
+                results = asyncio.run(self._aextract_entries(entries, feed_name, feed_config))
+            else:
+                results = [self._extract_article_data(entry, feed_name, feed_config)
+                           for entry in entries]
+            pairs = [(self._entry_guid(entry), article_data)
+                     for entry, article_data in zip(entries, results) if article_data]
+            saved = self.redis_client.push_batch([data for _, data in pairs],
+                                                 seen_ids=[guid for guid, _ in pairs], seen_namespace='rss')
+            
+            self._save_validators(feed_url, feed)
+            
+            logger.info(f"RSS 源 {feed_name} 抓取完成，文章数: {len(feed.entries)}")
+            return saved, False
+            
+        except Exception as e:
+            logger.error(f"抓取 RSS 源 {feed_name} 时出错: {e}")
+            return 0, True
+    
+    @staticmethod
+    def _entry_guid(entry) -> str:
+        """条目唯一ID（id / guid，缺失时退回链接）"""
+        _g = entry.get
+        return _g('id') or _g('guid') or (_g('link') or '').strip()
+    
+    def _filter_unseen(self, entries: list) -> list:
+        """
+        过滤已写入过的条目（按 guid 去重，没有 guid 的条目保留；只检查不标记）
+        
+        Args:
+            entries: feedparser 条目列表
+        
+        Returns:
+            list: 未出现过的条目
+        """
+        guids = [self._entry_guid(entry) for entry in entries]
+        members = [guid for guid in guids if guid]
+        if not members:
+            return list(entries)
+        flags = iter(self.redis_client.check_seen(members, namespace='rss'))
+        return [entry for entry, guid in zip(entries, guids) if not (guid and next(flags))]
+    
+    def _load_validators(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        从 Redis 读取各订阅源的 ETag / Last-Modified
+        
+        Returns:
+            tuple: (etags, modified)，读取失败时为空字典
+        """
+        try:
+            pipe = self.redis_client.client.pipeline()
+            pipe.hgetall(ETAG_HASH_KEY)
+            pipe.hgetall(MODIFIED_HASH_KEY)
+            etags, modified = pipe.execute()
+            return dict(etags or {}), dict(modified or {})
+        except Exception as e:
+            logger.warning(f"读取 RSS 条件请求缓存失败，本次全量抓取: {e}")
+            return {}, {}
+    
+    def _save_validators(self, url: str, feed):
+        """
+        保存订阅源本次响应的 ETag / Last-Modified，供下次条件请求使用
+        
+        Args:
+            url: RSS 源 URL
+            feed: feedparser 解析结果
+        """
+        etag = feed.get('etag')
+        modified = feed.get('modified')
+        if not etag and not modified:
+            return
+        
+        try:
+            pipe = self.redis_client.client.pipeline()
+            if etag:
+                self._etags[url] = etag
+                pipe.hset(ETAG_HASH_KEY, url, etag)
+            if modified:
+                self._modified[url] = modified
+                pipe.hset(MODIFIED_HASH_KEY, url, modified)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"保存 RSS 条件请求缓存失败: {url} - {e}")
+    
+    async def _aextract_entries(self, entries: list, feed_name: str,
+                                feed_config: dict) -> List[Dict[str, Any]]:
+        """
+        并发提取订阅源中的文章（含全文下载）
+        
+        同步的 _extract_article_data 在线程中执行，信号量限制同时下载的文章数
+        
+        Args:
+            entries: feedparser 条目列表
+            feed_name: RSS 源名称
+            feed_config: RSS 源配置
+        
+        Returns:
+            list: 文章数据（与 entries 顺序一致，失败为 None）
+        """
+        semaphore = asyncio.Semaphore(self.article_concurrency)
+        
+        async def run_one(entry):
+            async with semaphore:
+                return await asyncio.to_thread(self._extract_article_data, entry, feed_name, feed_config)
+        
+        return await asyncio.gather(*(run_one(entry) for entry in entries))
+    
     def _fetch_feed_with_timeout(self, url: str, feed_name: str, timeout: int = 10, max_retries: int = 2):
         """
         获取 RSS 源，带超时和重试机制
         
+        通过共享 Session 下载（复用连接、按请求设置超时），再交给 feedparser 解析字节内容；
+        携带上次的 ETag / Last-Modified，未更新时返回 status=304 且不含条目的结果
+        
         Args:
             url: RSS 源 URL
             feed_name: RSS 源名称
@@ -100,17 +341,29 @@ class RSSCrawler:
         Returns:
             feedparser.FeedParserDict 或 None
         """
+        headers = {'User-Agent': feedparser.USER_AGENT}
+        if self._etags.get(url):
+            headers['If-None-Match'] = self._etags[url]
+        if self._modified.get(url):
+            headers['If-Modified-Since'] = self._modified[url]
+        
         for attempt in range(max_retries):
             try:
-                # 设置超时
-                original_timeout = socket.getdefaulttimeout()
-                socket.setdefaulttimeout(timeout)
-                
-                # 解析 RSS
-                feed = feedparser.parse(url)
+                response = self.session.get(url, headers=headers, timeout=timeout)
+                if response.status_code == 304:
+                    return feedparser.FeedParserDict(status=304, entries=[], bozo=False)
+                response.raise_for_status()
                 
-                # 恢复原超时设置
-                socket.setdefaulttimeout(original_timeout)
+                # 解析 RSS（响应头用于编码识别与相对链接解析）
+                feed = feedparser.parse(response.content, response_headers={
+                    'content-type': response.headers.get('Content-Type', ''),
+                    'content-location': response.url,
+                })
+                feed['status'] = response.status_code
+                if response.headers.get('ETag'):
+                    feed['etag'] = response.headers['ETag']
+                if response.headers.get('Last-Modified'):
+                    feed['modified'] = response.headers['Last-Modified']
                 
                 # 检查是否成功
                 if feed and not feed.bozo:
@@ -120,16 +373,10 @@ class RSSCrawler:
                 else:
                     logger.warning(f"RSS 源 {feed_name} 返回空结果 (尝试 {attempt+1}/{max_retries})")
                     
-            except socket.timeout:
+            except requests.Timeout:
                 logger.warning(f"RSS 源 {feed_name} 请求超时 (尝试 {attempt+1}/{max_retries}): {timeout}秒")
             except Exception as e:
                 logger.warning(f"RSS 源 {feed_name} 请求失败 (尝试 {attempt+1}/{max_retries}): {str(e)}")
-            finally:
-                # 确保恢复原超时设置
-                try:
-                    socket.setdefaulttimeout(original_timeout)
-                except:
-                    pass
             
             # 等待后重试
             if attempt < max_retries - 1:
@@ -151,31 +398,36 @@ class RSSCrawler:
             dict: 文章数据
         """
         try:
+            # 本函数对每个条目执行一次，绑定局部变量避免重复查找属性
+            _g = entry.get
+            
             # ===== 核心必备字段 =====
-            title = entry.get('title', '').strip()
-            url = entry.get('link', '').strip()
-            guid = entry.get('id', entry.get('guid', url))  # 唯一ID，用于去重
+            title = (_g('title') or '').strip()
+            url = (_g('link') or '').strip()
+            guid = self._entry_guid(entry)  # 唯一ID，用于去重
             
-            # 提取摘要或内容
-            summary = entry.get('summary', entry.get('description', '')).strip()
+            # 提取摘要或内容（后备字段用 or 惰性求值）
+            summary = (_g('summary') or _g('description') or '').strip()
             content = ''
-            if entry.get('content'):
-                content = entry.content[0].get('value', '').strip()
+            entry_content = _g('content')
+            if entry_content:
+                content = (entry_content[0].get('value') or '').strip()
             
             # ===== 全文抓取 (如果启用) =====
             full_text = None
             if self.fetch_full_content and url:
                 full_text = self._fetch_full_article(url)
                 if full_text:
-                    logger.debug(f"✓ 全文抓取成功: {url[:50]}... ({len(full_text)} 字)")
+                    logger.debug("✓ 全文抓取成功: %s... (%d 字)", url[:50], len(full_text))
                     content = full_text  # 用全文替换 content
             
-            # 组合文本（用于情绪分析等）
-            text = title
+            # 组合文本（用于情绪分析等），一次 join 拼接，避免全文较长时逐段复制
+            parts = [title]
             if summary:
-                text += "\n\n" + summary
+                parts.append(summary)
             if content and content != summary:
-                text += "\n\n" + content
+                parts.append(content)
+            text = '\n\n'.join(parts)
             
             # 提取发布时间
             published = self._extract_timestamp(entry)
@@ -188,15 +440,15 @@ class RSSCrawler:
             publisher = feed_name.split(' - ')[0] if ' - ' in feed_name else feed_name
             
             # ===== 作者与分类 =====
-            author = entry.get('author', entry.get('dc_creator', entry.get('creator', '')))
-            if not author:
-                author = publisher  # 如果没有作者，使用发布机构
+            # 如果没有作者，使用发布机构
+            author = _g('author') or _g('dc_creator') or _g('creator') or publisher
             
             # 提取分类/标签
-            category = entry.get('category', '')
+            category = _g('category') or ''
             tags = []
-            if hasattr(entry, 'tags') and entry.tags:
-                tags = [tag.get('term', '') for tag in entry.tags if tag.get('term')]
+            entry_tags = _g('tags')
+            if entry_tags:
+                tags = [term for term in (tag.get('term') for tag in entry_tags) if term]
             
             # 如果没有 tags，尝试从 category 提取
             if not tags and category:
@@ -209,11 +461,13 @@ class RSSCrawler:
             # 提取媒体链接
             media_url = None
             media_type = None
-            if hasattr(entry, 'media_content') and entry.media_content:
-                media_url = entry.media_content[0].get('url', '')
-                media_type = entry.media_content[0].get('medium', 'image')
-            elif hasattr(entry, 'media_thumbnail') and entry.media_thumbnail:
-                media_url = entry.media_thumbnail[0].get('url', '')
+            media_content = _g('media_content')
+            media_thumbnail = _g('media_thumbnail') if not media_content else None
+            if media_content:
+                media_url = media_content[0].get('url', '')
+                media_type = media_content[0].get('medium', 'image')
+            elif media_thumbnail:
+                media_url = media_thumbnail[0].get('url', '')
                 media_type = 'image'
             
             # ===== 元数据字段 =====
@@ -276,129 +530,211 @@ class RSSCrawler:
         Returns:
             str: 文章全文,失败返回 None
         """
+        # 页面只下载一次，newspaper3k 解析与备用方案共用同一份 HTML
         try:
-            # 配置自定义请求头 (模拟真实浏览器)
-            config = {
-                'browser_user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'request_timeout': 10,
-                'number_threads': 1,
-                'fetch_images': False,  # 不抓取图片,提升速度
-                'memoize_articles': False  # 不缓存,避免内存占用
-            }
-            
-            # 创建 Article 对象
-            article = Article(url, language='en', config=config)
-            
-            # 添加额外的 HTTP 头部
-            article.config.headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Cache-Control': 'max-age=0'
-            }
-            
-            # 下载并解析
-            article.download()
+            # stream=True 先只读取响应头，非 HTML 或过大的页面不下载正文
+            response = self.session.get(url, headers=_ARTICLE_HEADERS, timeout=10,
+                                        allow_redirects=True, stream=True)
+            try:
+                response.raise_for_status()
+                content = self._read_html_body(response)
+            finally:
+                # 流式响应须显式关闭，连接才能回到连接池
+                response.close()
+            if content is None:
+                logger.debug("非 HTML 或页面过大，跳过全文: %s", url)
+                return None
+            html = self._decode_html(response, content)
+        except Exception as e:
+            logger.debug("全文下载失败,尝试备用方案: %s - %s", url, e)
+            return self._fetch_full_article_fallback(url)
+        
+        try:
+            # 直接解析已下载的 HTML，不再由 article.download() 重复请求
+            article = Article(url, config=_NP_CONFIG)
+            article.set_html(html)
             article.parse()
             
-            # 获取正文
+            # 获取正文，随即释放 Article 持有的原始 HTML 与 lxml 文档树（并发下载时每篇可达数 MB）
             full_text = article.text
+            self._release_article(article)
+            del article
             
             # 验证内容质量
             if full_text and len(full_text) > 100:  # 至少 100 字符
                 return full_text
             else:
-                logger.warning(f"全文太短或为空: {url}")
-                return None
+                # 正文识别失败时用备用方案解析同一份 HTML（无需再次下载）
+                logger.debug("newspaper3k 正文太短或为空,尝试备用方案: %s", url)
+                return self._fetch_full_article_fallback(url, html)
                 
         except ArticleException as e:
-            logger.warning(f"newspaper3k 抓取失败,尝试备用方案: {url}")
-            # 备用方案: 使用 requests 直接抓取
-            return self._fetch_full_article_fallback(url)
+            logger.warning(f"newspaper3k 解析失败,尝试备用方案: {url}")
+            # 备用方案: 使用 BeautifulSoup 解析同一份已解码的 HTML
+            return self._fetch_full_article_fallback(url, html)
             
         except Exception as e:
-            logger.debug(f"全文抓取失败: {url} - {e}")
+            logger.debug("全文抓取失败: %s - %s", url, e)
+            return None
+    
+    @staticmethod
+    def _release_article(article):
+        """清空 newspaper3k Article 中体积较大的属性（原始 HTML、文档树、正文节点）"""
+        article.html = ''
+        article.doc = None
+        article.clean_doc = None
+        article.top_node = None
+        article.clean_top_node = None
+    
+    @classmethod
+    def _read_html_body(cls, response) -> Optional[bytes]:
+        """
+        分块读取 HTML 正文，非 HTML 或超过 MAX_ARTICLE_BYTES 时返回 None
+
+        没有 Content-Length 的分块响应也在读满上限时停止，不会把整个页面读入内存
+        """
+        if not cls._is_html_page(response):
             return None
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > MAX_ARTICLE_BYTES:
+                return None
+            chunks.append(chunk)
+        return b''.join(chunks)
+    
+    @staticmethod
+    def _decode_html(response, content: bytes) -> str:
+        """
+        解码页面 HTML：响应头声明了 charset 时按其解码，
+        否则依次使用页面 <meta charset> 与内容检测（requests 对无 charset 的 text/html 默认按 ISO-8859-1 解码）。
+        正文已按流读完，response.apparent_encoding 无法再用，检测直接基于已读取的 content
+        """
+        if 'charset' not in response.headers.get('Content-Type', '').lower():
+            declared = requests.utils.get_encodings_from_content(content[:4096].decode('ascii', errors='ignore'))
+            response.encoding = declared[0] if declared else requests.compat.chardet.detect(content)['encoding']
+        try:
+            return content.decode(response.encoding or 'utf-8', errors='replace')
+        except LookupError:
+            return content.decode('utf-8', errors='replace')
+    
+    @staticmethod
+    def _is_html_page(response) -> bool:
+        """根据响应头判断是否为大小合理的 HTML 页面（缺少响应头时放行）"""
+        content_type = response.headers.get('Content-Type', '')
+        if content_type and 'html' not in content_type:
+            return False
+        try:
+            content_length = int(response.headers.get('Content-Length') or 0)
+        except ValueError:
+            content_length = 0
+        return content_length <= MAX_ARTICLE_BYTES
     
-    def _fetch_full_article_fallback(self, url: str) -> str:
+    def _fetch_full_article_fallback(self, url: str, html=None) -> str:
         """
-        备用全文抓取方案 (使用 requests + BeautifulSoup)
+        备用全文抓取方案 (使用共享 Session + lxml，未安装 lxml 时回退 BeautifulSoup)
         
         Args:
             url: 文章链接
+            html: 已下载的页面内容 (bytes 或 str)，提供时不再请求
         
         Returns:
             str: 文章全文,失败返回 None
         """
         try:
-            from bs4 import BeautifulSoup
-            
-            # 自定义请求头 (模拟真实浏览器)
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Referer': 'https://www.google.com/'  # 伪装来源
-            }
+            if html is None:
+                # 发送请求
+                response = self.session.get(url, headers=_FALLBACK_HEADERS, timeout=10, allow_redirects=True)
+                response.raise_for_status()
+                html = response.content
+            
+            if HAS_LXML:
+                text = self._extract_text_lxml(html)
+            else:
+                text = self._extract_text_bs4(html)
             
-            # 发送请求
-            response = requests.get(url, headers=headers, timeout=10, allow_redirects=True)
-            response.raise_for_status()
-            
-            # 解析 HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # 移除脚本和样式
-            for script in soup(['script', 'style', 'nav', 'header', 'footer', 'aside']):
-                script.decompose()
-            
-            # 尝试多种常见的正文容器
-            content_selectors = [
-                'article',
-                '.article-body',
-                '.article-content',
-                '.post-content',
-                '.entry-content',
-                '.content',
-                'main',
-                '[itemprop="articleBody"]'
-            ]
-            
-            text = None
-            for selector in content_selectors:
-                elements = soup.select(selector)
-                if elements:
-                    text = elements[0].get_text(separator='\n', strip=True)
-                    if len(text) > 100:
-                        logger.debug(f"✓ 备用方案成功: {url} (选择器: {selector})")
-                        return text
-            
-            # 如果没找到特定容器,提取所有段落
-            if not text:
-                paragraphs = soup.find_all('p')
-                text = '\n\n'.join([p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 20])
-                if len(text) > 100:
-                    logger.debug(f"✓ 备用方案成功 (提取段落): {url}")
-                    return text
+            if text:
+                logger.debug("✓ 备用方案成功: %s", url)
+                return text
             
             logger.warning(f"备用方案也失败: {url} - 内容太短")
             return None
             
         except Exception as e:
-            logger.debug(f"备用方案失败: {url} - {e}")
+            logger.debug("备用方案失败: %s - %s", url, e)
             return None
     
+    def _extract_text_lxml(self, html) -> str:
+        """
+        使用 lxml 提取正文：合并 XPath 一次查询所有候选容器
+        
+        Args:
+            html: 页面内容 (bytes 或 str)
+        
+        Returns:
+            str: 正文，未找到足够长的内容返回 None
+        """
+        if isinstance(html, str):
+            doc = lxml_html.fromstring(html.encode('utf-8'), parser=_UTF8_HTML_PARSER)
+        else:
+            doc = lxml_html.fromstring(html)
+        
+        # 移除脚本、样式与导航等非正文节点（drop_tree 保留节点后的 tail 文本）
+        for node in doc.xpath(_NOISE_XPATH):
+            node.drop_tree()
+        
+        nodes = doc.xpath(_CONTENT_XPATH)
+        for node in nodes:
+            text = '\n'.join(s.strip() for s in node.itertext() if s.strip())
+            if len(text) > 100:
+                return text
+        
+        # 如果没找到特定容器,提取所有段落
+        if not nodes:
+            paragraphs = (p.text_content().strip() for p in doc.iter('p'))
+            text = '\n\n'.join(p for p in paragraphs if len(p) > 20)
+            if len(text) > 100:
+                return text
+        
+        return None
+    
+    def _extract_text_bs4(self, html) -> str:
+        """
+        使用 BeautifulSoup 提取正文（未安装 lxml 时的回退）
+        
+        Args:
+            html: 页面内容 (bytes 或 str)
+        
+        Returns:
+            str: 正文，未找到足够长的内容返回 None
+        """
+        from bs4 import BeautifulSoup
+        
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # 移除脚本和样式
+        for script in soup(['script', 'style', 'nav', 'header', 'footer', 'aside']):
+            script.decompose()
+        
+        # 尝试多种常见的正文容器
+        text = None
+        for selector in _CONTENT_SELECTORS:
+            elements = soup.select(selector)
+            if elements:
+                text = elements[0].get_text(separator='\n', strip=True)
+                if len(text) > 100:
+                    return text
+        
+        # 如果没找到特定容器,提取所有段落
+        if not text:
+            paragraphs = soup.find_all('p')
+            text = '\n\n'.join([p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 20])
+            if len(text) > 100:
+                return text
+        
+        return None
+    
     def _detect_language(self, text: str) -> str:
         """
         简单的语言检测
@@ -412,13 +748,14 @@ class RSSCrawler:
         if not text:
             return 'unknown'
         
+        # 纯 ASCII 文本（英文源的绝大多数条目）不可能含中文；isascii() 只读取字符串的内部标记，O(1)
+        if text.isascii():
+            return 'en'
+        
         # 统计中文字符
-        chinese_count = sum(1 for char in text if '\u4e00' <= char <= '\u9fff')
+        chinese_count = len(_CJK_RE.findall(text))
         total_count = len(text)
         
-        if total_count == 0:
-            return 'unknown'
-        
         # 如果中文字符超过30%，判断为中文
         if chinese_count / total_count > 0.3:
             return 'zh-CN'
@@ -431,56 +768,39 @@ class RSSCrawler:
         """
         提取时间戳
         
+        依次尝试 field、published、updated、created 的 *_parsed 时间，
+        都没有时再按同样顺序解析字符串时间
+        
         Args:
             entry: feedparser entry 对象
-            field: 时间字段名 ('published_parsed', 'updated_parsed')
+            field: 优先使用的时间字段名 ('published_parsed', 'updated_parsed')
         
         Returns:
             int: Unix 时间戳
         """
+        fields = tuple(dict.fromkeys((field, 'published_parsed', 'updated_parsed', 'created_parsed')))
         try:
             # 优先使用 parsed 时间
-            time_struct = entry.get(field)
-            if time_struct:
-                return int(time.mktime(time_struct))
+            for parsed_field in fields:
+                time_struct = entry.get(parsed_field)
+                if time_struct:
+                    # feedparser 的 *_parsed 已统一为 UTC，直接换算（mktime 会按本地时区解释）
+                    return calendar.timegm(time_struct)
             
             # 备用: 尝试解析字符串时间
-            time_str = entry.get(field.replace('_parsed', ''))
-            if time_str:
-                dt = date_parser.parse(time_str)
-                return int(dt.timestamp())
-            
-            # 如果都没有，返回当前时间
-            logger.warning(f"无法提取时间戳，使用当前时间")
-            return int(time.time())
-            
+            for parsed_field in fields:
+                time_str = entry.get(parsed_field[:-len('_parsed')])
+                if time_str:
+                    timestamp = _parse_time_string(time_str)
+                    if timestamp is not None:
+                        return timestamp
         except Exception as e:
             logger.warning(f"解析时间戳失败: {e}，使用当前时间")
             return int(time.time())
-        """
-        提取时间戳
         
-        Args:
-            entry: feedparser entry 对象
-        
-        Returns:
-            int: Unix 时间戳
-        """
-        # 尝试多种时间字段
-        time_fields = ['published', 'updated', 'created']
-        
-        for field in time_fields:
-            if field in entry:
-                try:
-                    # 解析时间字符串
-                    dt = date_parser.parse(entry[field])
-                    return int(dt.timestamp())
-                except Exception as e:
-                    logger.debug(f"解析时间字段 {field} 失败: {e}")
-        
-        # 如果都失败，使用当前时间
-        logger.warning(f"无法提取文章时间，使用当前时间")
-        return int(datetime.now().timestamp())
+        # 如果都没有，返回当前时间
+        logger.warning(f"无法提取时间戳，使用当前时间")
+        return int(time.time())
 
 
 def main():
@@ -501,6 +821,7 @@ def main():
     print(f"抓取完成: {stats}")
     
     # 关闭连接
+    close_session()
     redis_client.close()
 
 
@@ -4,13 +4,44 @@ StockTwits 爬虫模块
 """
 import time
 import requests
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from dateutil import parser as date_parser
 from utils.logger import setup_logger
 from utils.redis_client import RedisClient
+from utils.rate_limiter import TokenBucket
+from utils.http_client import get_session, close_session
+from utils.json_codec import loads
 
 logger = setup_logger('stocktwits_crawler')
 
+# 请求头（模拟浏览器访问）；Referer 按股票在请求时补充
+_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'application/json',
+}
+
+
+def _parse_created_at(created_at: str) -> Optional[int]:
+    """
+    解析 StockTwits 的 created_at（ISO-8601，如 2025-10-20T08:30:00Z）为 Unix 时间戳
+    
+    固定格式直接用 fromisoformat，只有非标准格式才交给通用的 dateutil
+    
+    Returns:
+        int: Unix 时间戳；无法解析时返回 None
+    """
+    try:
+        return int(datetime.fromisoformat(created_at.replace('Z', '+00:00')).timestamp())
+    except (ValueError, TypeError, AttributeError):
+        pass
+    try:
+        return int(date_parser.parse(created_at).timestamp())
+    except (ValueError, TypeError, OverflowError):
+        return None
+
 
 class StockTwitsCrawler:
     """StockTwits 爬虫类"""
@@ -33,6 +64,21 @@ class StockTwitsCrawler:
         # 读取 API Token (如果有)
         self.access_token = config.get('access_token')
         self.base_url = "https://api.stocktwits.com/api/2"
+        # 固定请求参数与 URL 模板只构造一次（只读，避免被意外修改）
+        params = {'limit': self.max_messages}
+        if self.access_token:
+            params['access_token'] = self.access_token
+        self._params = MappingProxyType(params)
+        self._stream_url_template = self.base_url + '/streams/symbol/{}.json'
+        # 并发线程数与请求速率（默认每秒 2 次，各线程共享令牌桶）
+        self.max_workers = config.get('workers', 8)
+        self.bucket = TokenBucket(rate=config.get('requests_per_second', 2), capacity=1)
+        # 是否提取完整字段（关闭时只保留情感聚合所需的核心字段）
+        self.full_fields = config.get('full_fields', True)
+        # 剩余请求额度低于该值时暂停到限速窗口重置
+        self.min_remaining = config.get('min_remaining', 5)
+        # 复用进程内共享的 HTTP Session（keep-alive + 连接池，5xx 自动退避重试；429 按限速头暂停令牌桶）
+        self.session = get_session()
         
         if not self.enabled:
             logger.info("StockTwits 爬虫已禁用")
@@ -54,32 +100,80 @@ class StockTwitsCrawler:
         
         logger.info("开始抓取 StockTwits 数据...")
         
-        for symbol in self.symbols:
-            try:
-                logger.info(f"正在抓取股票: ${symbol}")
-                
-                # 抓取股票流
-                messages = self._fetch_symbol_stream(symbol)
-                
-                symbol_count = 0
-                for message in messages:
-                    message_data = self._extract_message_data(message, symbol)
-                    if message_data and self.redis_client.push_data(message_data):
-                        stats['messages'] += 1
-                        symbol_count += 1
-                
-                logger.info(f"✓ 股票 ${symbol} 抓取完成 - 消息: {symbol_count}")
-                
-                # 避免请求过快
-                time.sleep(1)
-                
-            except Exception as e:
-                logger.error(f"抓取股票 ${symbol} 时出错: {e}")
-                stats['errors'] += 1
+        if self.symbols:
+            # 各股票请求相互独立，并发发出；令牌桶控制整体速率（替代逐个 sleep）
+            max_workers = max(1, min(self.max_workers, len(self.symbols)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(self._crawl_symbol, symbol) for symbol in self.symbols]
+                for future in as_completed(futures):
+                    count, failed = future.result()
+                    stats['messages'] += count
+                    if failed:
+                        stats['errors'] += 1
         
         logger.info(f"StockTwits 抓取完成 - 消息: {stats['messages']}, 错误: {stats['errors']}")
         return stats
     
+    def _crawl_symbol(self, symbol: str) -> Tuple[int, bool]:
+        """
+        抓取单个股票的消息流并写入 Redis（在线程池中执行）
+        
+        Args:
+            symbol: 股票代码
+        
+        Returns:
+            tuple: (保存消息数, 是否出错)
+        """
+        try:
+            logger.info(f"正在抓取股票: ${symbol}")
+            
+            # 抓取股票流
+            self.bucket.acquire()
+            messages = self._drop_seen(self._fetch_symbol_stream(symbol))
+            
+            # 整理后一次 pipeline 批量写入，每个股票一次往返
+            extract = self._extract_message_data if self.full_fields else self._extract_message_lite
+            batch = [extract(message, symbol) for message in messages]
+            symbol_count = self.redis_client.push_batch(batch)
+            
+            logger.info(f"✓ 股票 ${symbol} 抓取完成 - 消息: {symbol_count}")
+            return symbol_count, False
+            
+        except Exception as e:
+            logger.error(f"抓取股票 ${symbol} 时出错: {e}")
+            return 0, True
+    
+    def _adapt_to_rate_limit(self, headers) -> None:
+        """
+        按 StockTwits 响应头（X-RateLimit-Remaining / X-RateLimit-Reset）调整令牌桶
+        
+        额度充足时按配置速率继续；剩余额度过低时扣空令牌桶（各线程共享），
+        后续请求等到窗口重置后再发出
+        """
+        try:
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset_timestamp = int(headers['X-RateLimit-Reset'])
+        except (KeyError, TypeError, ValueError):
+            return  # 响应未携带限速头
+        
+        if remaining < self.min_remaining:
+            window = max(1.0, reset_timestamp - time.time())
+            logger.warning(f"StockTwits 剩余请求额度 {remaining}，暂停 {window:.0f} 秒等待重置")
+            self.bucket.pause(window + 1)
+    
+    def _drop_seen(self, messages: List[Dict]) -> List[Dict]:
+        """
+        丢弃近两周已写入过的消息（按消息 ID 去重，一次 pipeline 往返）
+        
+        相邻两轮抓取的消息流大部分重叠，先去重可省去重复的提取与写入
+        """
+        ids = [str(message.get('id') or '') for message in messages]
+        members = [mid for mid in ids if mid]
+        if not members:
+            return messages
+        flags = iter(self.redis_client.seen_many(members, namespace='stocktwits'))
+        return [message for message, mid in zip(messages, ids) if not (mid and next(flags))]
+    
     def _fetch_symbol_stream(self, symbol: str) -> List[Dict]:
         """
         获取股票的消息流
@@ -91,27 +185,18 @@ class StockTwitsCrawler:
             list: 消息列表
         """
         try:
-            # StockTwits API 端点
-            url = f"{self.base_url}/streams/symbol/{symbol}.json"
-            params = {
-                'limit': self.max_messages
-            }
-            
-            # 如果有 access_token,添加到参数中
-            if self.access_token:
-                params['access_token'] = self.access_token
+            # StockTwits API 端点（access_token 已在初始化时并入固定参数）
+            url = self._stream_url_template.format(symbol)
             
             # 添加请求头,模拟浏览器访问
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': 'application/json',
-                'Referer': f'https://stocktwits.com/symbol/{symbol}'
-            }
+            headers = {**_HEADERS, 'Referer': f'https://stocktwits.com/symbol/{symbol}'}
             
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+            response = self.session.get(url, params=self._params, headers=headers, timeout=10)
+            self._adapt_to_rate_limit(response.headers)
             response.raise_for_status()
             
-            data = response.json()
+            # 直接解析响应字节（orjson 可用时更快，且省去先解码为 str）
+            data = loads(response.content)
             messages = data.get('messages', [])
             
             return messages
@@ -130,7 +215,35 @@ class StockTwitsCrawler:
             logger.error(f"解析 ${symbol} 数据失败: {e}")
             return []
     
-    def _extract_message_data(self, message: dict, symbol: str) -> Dict[str, Any]:
+    def _extract_message_lite(self, message: dict, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        提取消息核心字段（full_fields 关闭时使用）- 只保留情感聚合所需的信息
+        
+        Args:
+            message: StockTwits 消息对象
+            symbol: 股票代码
+        
+        Returns:
+            dict: 消息数据
+        """
+        try:
+            _g = message.get
+            sentiment = (_g('entities') or {}).get('sentiment') or {}
+            timestamp = _parse_created_at(_g('created_at', ''))
+            return {
+                'text': _g('body', ''),
+                'source': 'stocktwits',
+                'timestamp': timestamp if timestamp is not None else int(time.time()),
+                'symbol': symbol,
+                'sentiment': sentiment.get('basic'),
+                'likes': (_g('likes') or {}).get('total', 0),
+                'message_id': _g('id', ''),
+            }
+        except Exception as e:
+            logger.error(f"提取消息数据失败: {e}")
+            return None
+    
+    def _extract_message_data(self, message: dict, symbol: str) -> Optional[Dict[str, Any]]:
         """
         提取消息数据 - 包含完整的情感和互动信息
         
@@ -142,34 +255,35 @@ class StockTwitsCrawler:
             dict: 消息数据
         """
         try:
+            # 嵌套对象各取一次（缺失或为 null 时用空值代替），后续字段直接读取局部变量
+            _g = message.get
             # 提取用户信息
-            user = message.get('user', {})
+            user = _g('user') or {}
+            username = user.get('username')
             
             # 提取情感（StockTwits 特有的情感标签）
-            entities = message.get('entities', {})
-            sentiment = entities.get('sentiment', {})
+            entities = _g('entities') or {}
+            sentiment = entities.get('sentiment') or {}
+            chart = entities.get('chart') or {}
+            message_id = _g('id', '')
             
             # 提取时间戳
-            created_at = message.get('created_at', '')
-            try:
-                from dateutil import parser as date_parser
-                dt = date_parser.parse(created_at)
-                timestamp = int(dt.timestamp())
-            except:
-                timestamp = int(datetime.now().timestamp())
+            timestamp = _parse_created_at(_g('created_at', ''))
+            if timestamp is None:
+                timestamp = int(time.time())
             
             data = {
-                'text': message.get('body', ''),
+                'text': _g('body', ''),
                 'source': 'stocktwits',
                 'timestamp': timestamp,
-                'url': f"https://stocktwits.com/{user.get('username')}/message/{message.get('id')}",
+                'url': f"https://stocktwits.com/{username}/message/{message_id}",
                 
                 # 股票信息
                 'symbol': symbol,
-                'symbols': [s.get('symbol') for s in entities.get('symbols', [])],
+                'symbols': [s.get('symbol') for s in (entities.get('symbols') or ())],
                 
                 # 用户信息
-                'user': user.get('username', 'unknown'),
+                'user': username if 'username' in user else 'unknown',
                 'user_id': user.get('id', ''),
                 'user_followers': user.get('followers', 0),
                 'user_following': user.get('following', 0),
@@ -179,14 +293,14 @@ class StockTwitsCrawler:
                 'sentiment': sentiment.get('basic') if sentiment else None,  # 'Bullish' 或 'Bearish'
                 
                 # 互动数据
-                'likes': message.get('likes', {}).get('total', 0),
-                'reshares': message.get('reshare_count', 0),
-                'replies': message.get('conversation', {}).get('replies', 0),
+                'likes': (_g('likes') or {}).get('total', 0),
+                'reshares': _g('reshare_count', 0),
+                'replies': (_g('conversation') or {}).get('replies', 0),
                 
                 # 其他元数据
-                'message_id': message.get('id', ''),
-                'hashtags': [tag for tag in message.get('entities', {}).get('chart', {}).get('tags', [])],
-                'links': [link.get('url') for link in entities.get('links', [])],
+                'message_id': message_id,
+                'hashtags': list(chart.get('tags') or ()),
+                'links': [link.get('url') for link in (entities.get('links') or ())],
             }
             
             return data
@@ -214,6 +328,7 @@ def main():
     print(f"抓取完成: {stats}")
     
     # 关闭连接
+    close_session()
     redis_client.close()
 
 
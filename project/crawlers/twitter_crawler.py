@@ -4,13 +4,54 @@ Twitter 爬虫模块
 推荐使用: twint-fork (pip install twint-fork)
 """
 import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from utils.logger import setup_logger
 from utils.redis_client import RedisClient
 
 logger = setup_logger('twitter_crawler')
 
+# 直接取自推文对象属性的字段：(输出字段, 属性名, 默认值)
+_TWINT_FIELDS = (
+    ('user_id', 'user_id', ''),
+    ('likes', 'likes_count', 0),
+    ('retweets', 'retweets_count', 0),
+    ('replies', 'replies_count', 0),
+    ('language', 'lang', 'en'),
+    ('is_retweet', 'retweet', False),
+)
+_SNSCRAPE_FIELDS = (
+    ('likes', 'likeCount', 0),
+    ('retweets', 'retweetCount', 0),
+    ('replies', 'replyCount', 0),
+    ('quotes', 'quoteCount', 0),
+    ('language', 'lang', 'en'),
+    ('view_count', 'viewCount', 0),
+)
+
+
+@lru_cache(maxsize=1)
+def _load_snscrape():
+    """导入 snscrape 的 Twitter 模块（进程内只尝试一次），未安装返回 None"""
+    try:
+        import snscrape.modules.twitter as sntwitter
+        return sntwitter
+    except ImportError:
+        return None
+
+
+@lru_cache(maxsize=1)
+def _load_twint():
+    """导入 twint-fork（进程内只尝试一次），未安装返回 None"""
+    try:
+        import twint
+        return twint
+    except ImportError:
+        return None
+
 
 class TwitterCrawler:
     """Twitter 爬虫类"""
@@ -29,6 +70,7 @@ class TwitterCrawler:
         self.keywords = config.get('keywords', [])
         self.max_tweets = config.get('max_tweets', 100)
         self.use_twint = config.get('use_twint', True)  # 优先使用 twint-fork
+        self.max_workers = config.get('workers', 4)  # 并发抓取的关键词数量
         
         if not self.enabled:
             logger.info("Twitter 爬虫已禁用")
@@ -39,22 +81,20 @@ class TwitterCrawler:
         self.has_twint = False
         
         # 尝试导入 snscrape（优先，因为更稳定快速）
-        try:
-            import snscrape.modules.twitter as sntwitter
-            self.sntwitter = sntwitter
+        self.sntwitter = _load_snscrape()
+        if self.sntwitter is not None:
             self.has_snscrape = True
             logger.info("✓ snscrape 可用")
-        except ImportError:
+        else:
             logger.warning("✗ snscrape 未安装")
         
         # 尝试导入 twint-fork（备用方案）
         if self.use_twint or not self.has_snscrape:
-            try:
-                import twint
-                self.twint = twint
+            self.twint = _load_twint()
+            if self.twint is not None:
                 self.has_twint = True
                 logger.info("✓ twint-fork 可用")
-            except ImportError:
+            else:
                 logger.warning("✗ twint-fork 未安装")
         
         # 检查是否至少有一个可用
@@ -80,54 +120,63 @@ class TwitterCrawler:
         
         logger.info("开始抓取 Twitter 数据...")
         
-        # 智能选择：优先 snscrape，失败则回退到 twint-fork
-        for keyword in self.keywords:
-            success = False
-            
-            # 尝试 1: snscrape（更快更稳定）
-            if self.has_snscrape and not success:
-                try:
-                    count = self._crawl_keyword_with_snscrape(keyword)
-                    stats['tweets'] += count
-                    success = True
-                    logger.info(f"✓ snscrape 成功抓取关键词 {keyword}: {count} 条")
-                except Exception as e:
-                    logger.warning(f"✗ snscrape 抓取失败: {e}")
-            
-            # 尝试 2: twint-fork（备用方案）
-            if self.has_twint and not success:
-                try:
-                    count = self._crawl_keyword_with_twint(keyword)
+        if self.keywords:
+            # 各关键词的抓取相互独立，并发执行（每个关键词内部仍保持原有的请求间隔）
+            max_workers = max(1, min(self.max_workers, len(self.keywords)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for count, success in executor.map(self._crawl_keyword, self.keywords):
                     stats['tweets'] += count
-                    success = True
-                    logger.info(f"✓ twint-fork 成功抓取关键词 {keyword}: {count} 条")
-                except Exception as e:
-                    logger.warning(f"✗ twint-fork 抓取失败: {e}")
-            
-            if not success:
-                logger.error(f"✗ 关键词 {keyword} 抓取失败（所有方法都失败）")
-                stats['errors'] += 1
+                    if not success:
+                        stats['errors'] += 1
         
         logger.info(f"Twitter 抓取完成 - 推文: {stats['tweets']}, 错误: {stats['errors']}")
         return stats
     
+    def _crawl_keyword(self, keyword: str) -> Tuple[int, bool]:
+        """
+        抓取单个关键词（在线程池中执行）
+        
+        智能选择：优先 snscrape，失败则回退到 twint-fork
+        
+        Returns:
+            tuple: (保存推文数, 是否成功)
+        """
+        # 尝试 1: snscrape（更快更稳定）
+        if self.has_snscrape:
+            try:
+                count = self._crawl_keyword_with_snscrape(keyword)
+                logger.info(f"✓ snscrape 成功抓取关键词 {keyword}: {count} 条")
+                return count, True
+            except Exception as e:
+                logger.warning(f"✗ snscrape 抓取失败: {e}")
+        
+        # 尝试 2: twint-fork（备用方案）
+        if self.has_twint:
+            try:
+                count = self._crawl_keyword_with_twint(keyword)
+                logger.info(f"✓ twint-fork 成功抓取关键词 {keyword}: {count} 条")
+                return count, True
+            except Exception as e:
+                logger.warning(f"✗ twint-fork 抓取失败: {e}")
+        
+        logger.error(f"✗ 关键词 {keyword} 抓取失败（所有方法都失败）")
+        return 0, False
+    
     def _crawl_keyword_with_snscrape(self, keyword: str) -> int:
         """使用 snscrape 抓取单个关键词"""
-        count = 0
         query = f"{keyword} lang:en"
         scraper = self.sntwitter.TwitterSearchScraper(query)
         
+        tweets = []
         for i, tweet in enumerate(scraper.get_items()):
             if i >= self.max_tweets:
                 break
-            
-            tweet_data = self._extract_tweet_data_snscrape(tweet, keyword)
-            if tweet_data and self.redis_client.push_data(tweet_data):
-                count += 1
-            
-            time.sleep(0.3)  # 避免过快
+            # snscrape 自身按服务端限速翻页，无需逐条等待
+            tweets.append(tweet)
         
-        return count
+        batch = [self._extract_tweet_data_snscrape(tweet, keyword) for tweet in self._drop_seen(tweets)]
+        # 整理后一次 pipeline 批量写入
+        return self.redis_client.push_batch(batch)
     
     def _crawl_keyword_with_twint(self, keyword: str) -> int:
         """使用 twint-fork 抓取单个关键词"""
@@ -141,18 +190,36 @@ class TwitterCrawler:
         tweets_list = []
         c.Store_object_tweets_list = tweets_list
         
-        self.twint.run.Search(c)
+        # twint 内部使用 asyncio 事件循环，线程池中的工作线程默认没有事件循环
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self.twint.run.Search(c)
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
         
-        count = 0
-        for tweet in tweets_list:
-            tweet_data = self._extract_tweet_data_twint(tweet, keyword)
-            if tweet_data and self.redis_client.push_data(tweet_data):
-                count += 1
+        # 整理后一次 pipeline 批量写入
+        batch = [self._extract_tweet_data_twint(tweet, keyword) for tweet in self._drop_seen(tweets_list)]
+        count = self.redis_client.push_batch(batch)
         
         time.sleep(2)
         return count
     
-    def _extract_tweet_data_twint(self, tweet, keyword: str) -> Dict[str, Any]:
+    def _drop_seen(self, tweets: list) -> list:
+        """
+        丢弃近两周已写入过的推文（按推文 ID 去重，一次 pipeline 往返）
+        
+        同一关键词相邻两轮的搜索结果大部分重叠，先去重可省去重复的提取与写入
+        """
+        ids = [str(getattr(tweet, 'id', '') or '') for tweet in tweets]
+        members = [tid for tid in ids if tid]
+        if not members:
+            return tweets
+        flags = iter(self.redis_client.seen_many(members, namespace='twitter'))
+        return [tweet for tweet, tid in zip(tweets, ids) if not (tid and next(flags))]
+    
+    def _extract_tweet_data_twint(self, tweet, keyword: str) -> Optional[Dict[str, Any]]:
         """提取推文数据（twint 格式）- 尽可能多的信息"""
         try:
             data = {
@@ -161,45 +228,36 @@ class TwitterCrawler:
                 'timestamp': int(datetime.strptime(
                     f"{tweet.datestamp} {tweet.timestamp}", 
                     "%Y-%m-%d %H:%M:%S"
-                ).timestamp()) if hasattr(tweet, 'datestamp') else int(datetime.now().timestamp()),
+                ).timestamp()) if hasattr(tweet, 'datestamp') else int(time.time()),
                 'url': f"https://twitter.com/{tweet.username}/status/{tweet.id}",
                 'keyword': keyword,
                 'user': tweet.username,
-                'user_id': getattr(tweet, 'user_id', ''),
-                'likes': getattr(tweet, 'likes_count', 0),
-                'retweets': getattr(tweet, 'retweets_count', 0),
-                'replies': getattr(tweet, 'replies_count', 0),
-                'hashtags': getattr(tweet, 'hashtags', []),
-                'mentions': getattr(tweet, 'mentions', []),
-                'language': getattr(tweet, 'lang', 'en'),
-                'is_retweet': getattr(tweet, 'retweet', False)
+                'hashtags': getattr(tweet, 'hashtags', None) or [],
+                'mentions': getattr(tweet, 'mentions', None) or [],
             }
+            data.update({key: getattr(tweet, attr, default) for key, attr, default in _TWINT_FIELDS})
             return data
         except Exception as e:
             logger.error(f"提取推文数据失败（twint）: {e}")
             return None
     
-    def _extract_tweet_data_snscrape(self, tweet, keyword: str) -> Dict[str, Any]:
+    def _extract_tweet_data_snscrape(self, tweet, keyword: str) -> Optional[Dict[str, Any]]:
         """提取推文数据（snscrape 格式）- 尽可能多的信息"""
         try:
+            user = getattr(tweet, 'user', None)
             data = {
                 'text': tweet.content if hasattr(tweet, 'content') else tweet.rawContent,
                 'source': 'twitter',
                 'timestamp': int(tweet.date.timestamp()),
                 'url': tweet.url,
                 'keyword': keyword,
-                'user': tweet.user.username if hasattr(tweet, 'user') else 'unknown',
-                'user_id': tweet.user.id if hasattr(tweet, 'user') else '',
-                'likes': getattr(tweet, 'likeCount', 0),
-                'retweets': getattr(tweet, 'retweetCount', 0),
-                'replies': getattr(tweet, 'replyCount', 0),
-                'quotes': getattr(tweet, 'quoteCount', 0),
-                'hashtags': [tag for tag in (getattr(tweet, 'hashtags', []) or [])],
-                'mentions': [m.username for m in (getattr(tweet, 'mentionedUsers', []) or [])],
-                'language': getattr(tweet, 'lang', 'en'),
+                'user': user.username if user is not None else 'unknown',
+                'user_id': user.id if user is not None else '',
+                'hashtags': list(getattr(tweet, 'hashtags', None) or ()),
+                'mentions': [m.username for m in (getattr(tweet, 'mentionedUsers', None) or ())],
                 'is_retweet': getattr(tweet, 'retweetedTweet', None) is not None,
-                'view_count': getattr(tweet, 'viewCount', 0)
             }
+            data.update({key: getattr(tweet, attr, default) for key, attr, default in _SNSCRAPE_FIELDS})
             return data
         except Exception as e:
             logger.error(f"提取推文数据失败（snscrape）: {e}")
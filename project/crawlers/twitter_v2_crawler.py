@@ -3,15 +3,26 @@ Twitter/X API v2 爬虫模块
 支持 X API Free Tier 的限制管理
 """
 import time
+import hashlib
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from utils.logger import setup_logger
 from utils.redis_client import RedisClient
-import yaml
+from utils.rate_limiter import TokenBucket
+from utils.http_client import create_session
+from utils.json_codec import loads
 
 logger = setup_logger('twitter_v2_crawler')
 
+# 月度配额计数键的过期时间（秒）：按月分键，过期后自然归零
+QUOTA_KEY_TTL = 40 * 86400
+# Bearer Token 校验结果缓存时间（秒）：期间重启不再发送校验请求
+TOKEN_CHECK_TTL = 6 * 3600
+# 合并查询的最大长度（recent search 的 query 上限为 512 字符，留出余量）
+MAX_QUERY_LENGTH = 480
+
 
 class TwitterV2Crawler:
     """Twitter API v2 爬虫类 (支持免费套餐限制管理)"""
@@ -45,10 +56,23 @@ class TwitterV2Crawler:
         # 读取抓取配置
         self.keywords = config.get('keywords', [])
         self.tweets_per_keyword = config.get('tweets_per_keyword', 1)
+        # 将多个关键词用 OR 合并为一次搜索请求（Free 套餐按请求次数限速）
+        self.combine_keywords = config.get('combine_keywords', True)
         
         # API 端点
         self.search_url = "https://api.twitter.com/2/tweets/search/recent"
         
+        # 并发搜索的关键词数；令牌桶保持原有的平均请求间隔（默认 5 秒），允许 workers 个请求同时发出
+        self.max_workers = config.get('workers', 2)
+        self.bucket = TokenBucket(rate=1.0 / config.get('request_interval', 5), capacity=self.max_workers)
+        # keep-alive 连接复用；429 由 _search_tweets 按 x-rate-limit-reset 处理，不交给自动重试
+        self.session = create_session(pool_maxsize=self.max_workers, max_retries=0)
+        # 认证与 UA 请求头设置在 Session 上，各请求不再重复构造
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.bearer_token}",
+            "User-Agent": "v2TweetSearchPython"
+        })
+        
         # 验证配置
         if not self.bearer_token and not (self.api_key and self.api_secret):
             logger.error("❌ 缺少 Twitter API 凭证!")
@@ -57,7 +81,7 @@ class TwitterV2Crawler:
             return
         
         # 测试 Bearer Token 是否有效
-        if self.bearer_token and not self._test_bearer_token():
+        if self.bearer_token and not self._bearer_token_valid():
             logger.error("❌ Bearer Token 无效或已过期!")
             logger.error("请访问 https://developer.x.com/en/portal/dashboard 检查你的 App")
             self.enabled = False
@@ -88,46 +112,20 @@ class TwitterV2Crawler:
         logger.info("开始抓取 Twitter 数据...")
         logger.info(f"关键词: {', '.join(self.keywords)}")
         
-        total_tweets_this_run = 0
-        
-        for keyword in self.keywords:
-            # 检查是否超过单次限制
-            if total_tweets_this_run >= self.max_posts_per_run:
-                logger.warning(f"⚠️ 已达到单次限制 ({self.max_posts_per_run} 条),停止抓取")
-                break
-            
-            try:
-                logger.info(f"正在搜索: {keyword}")
-                
-                # 计算本次可抓取数量
-                remaining_quota = self.max_posts_per_run - total_tweets_this_run
-                max_results = min(self.tweets_per_keyword, remaining_quota, 10)  # API 单次最多 10
-                
-                # 搜索推文
-                tweets = self._search_tweets(keyword, max_results=max_results)
-                
-                if not tweets:
-                    logger.warning(f"关键词 {keyword} 未找到推文")
-                    continue
-                
-                # 保存推文
-                keyword_count = 0
-                for tweet in tweets:
-                    tweet_data = self._extract_tweet_data(tweet, keyword)
-                    if tweet_data and self.redis_client.push_data(tweet_data):
-                        stats['tweets'] += 1
-                        total_tweets_this_run += 1
-                        keyword_count += 1
-                
-                logger.info(f"✓ 关键词 {keyword} 抓取完成 - 推文: {keyword_count}")
-                
-                # 避免请求过快 - Twitter Free 限制很严格,需要更长延迟
-                logger.info("⏳ 等待 5 秒避免速率限制...")
-                time.sleep(5)  # 从 2 秒增加到 5 秒
-                
-            except Exception as e:
-                logger.error(f"抓取关键词 {keyword} 时出错: {e}")
-                stats['errors'] += 1
+        # 单次限额预先按关键词顺序分配，各关键词即可并发搜索
+        plan = self._plan_keywords()
+        if len(plan) < len(self.keywords):
+            logger.warning(f"⚠️ 已达到单次限制 ({self.max_posts_per_run} 条),跳过 {len(self.keywords) - len(plan)} 个关键词")
+        
+        queries = self._group_queries(plan)
+        if queries:
+            max_workers = max(1, min(self.max_workers, len(queries)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for count, failed in executor.map(lambda item: self._crawl_query(*item), queries):
+                    stats['tweets'] += count
+                    if failed:
+                        stats['errors'] += 1
+        total_tweets_this_run = stats['tweets']
         
         # 更新配额计数
         self._update_quota(total_tweets_this_run)
@@ -137,6 +135,127 @@ class TwitterV2Crawler:
         
         return stats
     
+    def _plan_keywords(self) -> List[Tuple[str, int]]:
+        """
+        按关键词顺序分配单次限额
+        
+        Returns:
+            list: [(关键词, 本次最多抓取条数)]，限额用完后的关键词不再抓取
+        """
+        plan = []
+        remaining_quota = self.max_posts_per_run
+        for keyword in self.keywords:
+            if remaining_quota <= 0:
+                break
+            max_results = min(self.tweets_per_keyword, remaining_quota, 10)  # API 单次最多 10
+            plan.append((keyword, max_results))
+            remaining_quota -= max_results
+        return plan
+    
+    def _group_queries(self, plan: List[Tuple[str, int]]) -> List[Tuple[List[str], int]]:
+        """
+        将关键词合并为 OR 查询（长度不超过 MAX_QUERY_LENGTH，条数不超过单次上限 10）
+        
+        Args:
+            plan: _plan_keywords 的结果
+        
+        Returns:
+            list: [(关键词列表, 本次最多抓取条数)]
+        """
+        if not self.combine_keywords:
+            return [([keyword], max_results) for keyword, max_results in plan]
+        
+        groups: List[Tuple[List[str], int]] = []
+        for keyword, max_results in plan:
+            if groups:
+                keywords, total = groups[-1]
+                if (total + max_results <= 10
+                        and len(self._build_query(keywords + [keyword])) <= MAX_QUERY_LENGTH):
+                    groups[-1] = (keywords + [keyword], total + max_results)
+                    continue
+            groups.append(([keyword], max_results))
+        return groups
+    
+    @staticmethod
+    def _build_query(keywords: List[str]) -> str:
+        """构造搜索语句：单个关键词原样使用，多个关键词用 OR 连接（多词短语加括号）"""
+        if len(keywords) == 1:
+            return keywords[0]
+        return '(' + ' OR '.join(f'({k})' if ' ' in k else k for k in keywords) + ')'
+    
+    @staticmethod
+    def _match_keyword(text: str, keywords: List[str]) -> str:
+        """按正文子串将合并查询的结果归到关键词，都不包含时归到第一个关键词"""
+        lowered = text.lower()
+        for keyword in keywords:
+            if keyword.lower() in lowered:
+                return keyword
+        return keywords[0]
+    
+    def _crawl_query(self, keywords: List[str], max_results: int) -> Tuple[int, bool]:
+        """
+        搜索一组关键词（合并为一次请求）并写入 Redis（在线程池中执行）
+        
+        Returns:
+            tuple: (保存推文数, 是否出错)
+        """
+        query = self._build_query(keywords)
+        try:
+            # 令牌桶替代逐个关键词 sleep(5)：各线程共享，保持整体请求间隔
+            self.bucket.acquire()
+            logger.info(f"正在搜索: {query}")
+            
+            tweets = self._search_tweets(query, max_results=max_results)
+            if not tweets:
+                logger.warning(f"关键词 {query} 未找到推文")
+                return 0, False
+            
+            # 整理后一次 pipeline 批量写入
+            if len(keywords) == 1:
+                batch = [self._extract_tweet_data(tweet, keywords[0]) for tweet in tweets]
+            else:
+                batch = [self._extract_tweet_data(tweet, self._match_keyword(tweet.get('text') or '', keywords))
+                         for tweet in tweets]
+            keyword_count = self.redis_client.push_batch(batch)
+            
+            logger.info(f"✓ 关键词 {query} 抓取完成 - 推文: {keyword_count}")
+            return keyword_count, False
+            
+        except Exception as e:
+            logger.error(f"抓取关键词 {query} 时出错: {e}")
+            return 0, True
+    
+    def _token_check_key(self) -> str:
+        """Bearer Token 校验结果缓存键（只保存 Token 的摘要）"""
+        digest = hashlib.sha256(self.bearer_token.encode('utf-8')).hexdigest()[:16]
+        return f"twitter:token_valid:{digest}"
+    
+    def _bearer_token_valid(self) -> bool:
+        """
+        检查 Bearer Token 是否有效（优先读取 Redis 中缓存的校验结果）
+        
+        校验请求同样占用 15 分钟窗口内的配额，缓存命中时省去这次请求
+        """
+        try:
+            cached = self.redis_client.client.get(self._token_check_key())
+        except Exception as e:
+            logger.warning(f"读取 Token 校验缓存失败: {e}")
+            cached = None
+        if cached == '1':
+            logger.info("✓ Bearer Token 校验结果命中缓存")
+            return True
+        if cached == '0':
+            logger.error("❌ Bearer Token 最近校验无效 (缓存)")
+            return False
+        return self._test_bearer_token()
+    
+    def _cache_token_check(self, valid: bool):
+        """缓存确定的校验结果（200 / 401 / 403），限速或网络异常时不缓存"""
+        try:
+            self.redis_client.client.set(self._token_check_key(), '1' if valid else '0', ex=TOKEN_CHECK_TTL)
+        except Exception as e:
+            logger.warning(f"缓存 Token 校验结果失败: {e}")
+    
     def _test_bearer_token(self) -> bool:
         """
         测试 Bearer Token 是否有效
@@ -145,28 +264,26 @@ class TwitterV2Crawler:
             bool: Token 是否有效
         """
         try:
-            headers = {
-                "Authorization": f"Bearer {self.bearer_token}",
-                "User-Agent": "v2TweetSearchPython"
-            }
-            
             # 使用一个简单的查询测试
             params = {
                 "query": "test",
                 "max_results": 10
             }
             
-            response = requests.get(self.search_url, headers=headers, params=params, timeout=10)
+            response = self.session.get(self.search_url, params=params, timeout=10)
             
             if response.status_code == 200:
                 logger.info("✓ Bearer Token 验证成功")
+                self._cache_token_check(True)
                 return True
             elif response.status_code == 401:
                 logger.error("❌ Bearer Token 无效 (401 Unauthorized)")
+                self._cache_token_check(False)
                 return False
             elif response.status_code == 403:
                 logger.error("❌ Bearer Token 权限不足 (403 Forbidden)")
                 logger.error("   请确保你的 App 有 'Read' 权限")
+                self._cache_token_check(False)
                 return False
             elif response.status_code == 429:
                 logger.warning("⚠️ 速率限制,但 Token 可能有效")
@@ -191,11 +308,6 @@ class TwitterV2Crawler:
             list: 推文列表
         """
         try:
-            headers = {
-                "Authorization": f"Bearer {self.bearer_token}",
-                "User-Agent": "v2TweetSearchPython"
-            }
-            
             # API 参数
             params = {
                 "query": query,
@@ -205,7 +317,7 @@ class TwitterV2Crawler:
                 "user.fields": "username,name,verified,public_metrics"
             }
             
-            response = requests.get(self.search_url, headers=headers, params=params, timeout=30)
+            response = self.session.get(self.search_url, params=params, timeout=30)
             
             # 检查速率限制
             if response.status_code == 429:
@@ -224,9 +336,12 @@ class TwitterV2Crawler:
                         wait_seconds = max(0, reset_timestamp - now + 5)  # +5秒缓冲
                         if wait_seconds < 900:  # 如果等待时间小于15分钟
                             logger.warning(f"⏳ 等待 {int(wait_seconds)} 秒后重试...")
-                            time.sleep(wait_seconds)
+                            # 暂停共享令牌桶：其他关键词线程一并等到窗口重置，之后按桶速率依次放行，
+                            # 不会在重置时刻同时重试
+                            self.bucket.pause(wait_seconds)
+                            self.bucket.acquire()
                             # 重试一次
-                            response = requests.get(self.search_url, headers=headers, params=params, timeout=30)
+                            response = self.session.get(self.search_url, params=params, timeout=30)
                             if response.status_code != 200:
                                 return []
                         else:
@@ -238,7 +353,8 @@ class TwitterV2Crawler:
                     return []
             
             response.raise_for_status()
-            data = response.json()
+            # 直接解析响应字节（orjson 可用时更快，且省去先解码为 str）
+            data = loads(response.content)
             
             tweets = data.get('data', [])
             users = {user['id']: user for user in data.get('includes', {}).get('users', [])}
@@ -261,7 +377,7 @@ class TwitterV2Crawler:
             logger.error(f"搜索推文失败: {e}")
             return []
     
-    def _extract_tweet_data(self, tweet: dict, keyword: str) -> Dict[str, Any]:
+    def _extract_tweet_data(self, tweet: dict, keyword: str) -> Optional[Dict[str, Any]]:
         """
         提取推文数据
         
@@ -273,11 +389,14 @@ class TwitterV2Crawler:
             dict: 推文数据
         """
         try:
-            author = tweet.get('author', {})
-            metrics = tweet.get('public_metrics', {})
+            # 嵌套对象各取一次（缺失或为 null 时用空值代替）
+            _g = tweet.get
+            author = _g('author') or {}
+            metrics = _g('public_metrics') or {}
+            tweet_id = _g('id')
             
             # 时间戳转换
-            created_at = tweet.get('created_at')
+            created_at = _g('created_at')
             if created_at:
                 timestamp = int(datetime.fromisoformat(created_at.replace('Z', '+00:00')).timestamp())
             else:
@@ -285,18 +404,18 @@ class TwitterV2Crawler:
             
             data = {
                 # 基础字段
-                'text': tweet.get('text', ''),
+                'text': _g('text', ''),
                 'source': 'twitter',
                 'timestamp': timestamp,
-                'url': f"https://twitter.com/i/web/status/{tweet.get('id')}",
+                'url': f"https://twitter.com/i/web/status/{tweet_id}",
                 
                 # Twitter 特有字段
-                'tweet_id': tweet.get('id'),
+                'tweet_id': tweet_id,
                 'author': author.get('username', 'unknown'),
                 'author_name': author.get('name', 'Unknown'),
                 'verified': author.get('verified', False),
                 'keyword': keyword,
-                'language': tweet.get('lang', 'en'),
+                'language': _g('lang', 'en'),
                 
                 # 互动数据
                 'retweet_count': metrics.get('retweet_count', 0),
@@ -305,7 +424,7 @@ class TwitterV2Crawler:
                 'quote_count': metrics.get('quote_count', 0),
                 
                 # 实体信息
-                'entities': tweet.get('entities', {}),
+                'entities': _g('entities') or {},
             }
             
             return data
@@ -321,72 +440,42 @@ class TwitterV2Crawler:
         Returns:
             bool: 是否可以继续抓取
         """
-        current_usage = self._get_current_month_usage()
-        
-        # 检查是否需要重置计数器
-        self._reset_counter_if_needed()
-        
-        if current_usage >= self.max_posts_per_month:
-            logger.warning(f"⚠️ 月度配额已用完: {current_usage}/{self.max_posts_per_month}")
+        allowed, value = self.redis_client.check_quota(self._quota_key(), self.max_posts_per_month)
+        if not allowed:
+            logger.warning(f"⚠️ 月度配额已用完: {value}/{self.max_posts_per_month}")
             return False
         
-        remaining = self.max_posts_per_month - current_usage
-        logger.info(f"✓ 月度配额检查通过: 剩余 {remaining}/{self.max_posts_per_month}")
+        logger.info(f"✓ 月度配额检查通过: 剩余 {value}/{self.max_posts_per_month}")
         return True
     
+    def _quota_key(self) -> str:
+        """本月配额计数键（按月份分键，跨月自动归零）"""
+        return f"twitter:quota:{date.today():%Y-%m}"
+    
     def _get_current_month_usage(self) -> int:
         """获取本月已使用的 Posts 数量"""
-        return self.rate_limits.get('current_month_posts', 0)
+        try:
+            return int(self.redis_client.client.get(self._quota_key()) or 0)
+        except Exception as e:
+            logger.error(f"读取配额计数失败: {e}")
+            return 0
     
     def _update_quota(self, posts_used: int):
         """
-        更新配额计数
+        更新配额计数（Redis 原子累加，多进程并发安全）
         
         Args:
             posts_used: 本次使用的 Posts 数量
         """
-        current = self.rate_limits.get('current_month_posts', 0)
-        new_total = current + posts_used
-        
-        # 更新配置文件中的计数器
-        self._save_quota_to_config(new_total)
-        
-        logger.info(f"✓ 配额已更新: {current} → {new_total}")
-    
-    def _reset_counter_if_needed(self):
-        """检查并重置月度计数器"""
-        last_reset = self.rate_limits.get('last_reset_date')
-        today = str(date.today())
-        
-        if last_reset is None or last_reset[:7] != today[:7]:  # 不同月份
-            logger.info(f"✓ 月度计数器重置 (上次: {last_reset})")
-            self.rate_limits['current_month_posts'] = 0
-            self.rate_limits['last_reset_date'] = today
-            self._save_quota_to_config(0)
-    
-    def _save_quota_to_config(self, new_total: int):
-        """
-        将配额计数保存到 config.yaml
+        if posts_used <= 0:
+            return
         
-        Args:
-            new_total: 新的累计数量
-        """
+        key = self._quota_key()
         try:
-            # 读取配置文件
-            with open('config.yaml', 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-            
-            # 更新计数器
-            if 'twitter' in config and 'rate_limits' in config['twitter']:
-                config['twitter']['rate_limits']['current_month_posts'] = new_total
-                config['twitter']['rate_limits']['last_reset_date'] = str(date.today())
-            
-            # 写回配置文件
-            with open('config.yaml', 'w', encoding='utf-8') as f:
-                yaml.dump(config, f, allow_unicode=True, default_flow_style=False)
-            
-            # 更新内存中的配置
-            self.rate_limits['current_month_posts'] = new_total
-            
+            pipe = self.redis_client.client.pipeline(transaction=False)
+            pipe.incrby(key, posts_used)
+            pipe.expire(key, QUOTA_KEY_TTL)
+            new_total, _ = pipe.execute()
+            logger.info(f"✓ 配额已更新: {new_total - posts_used} → {new_total}")
         except Exception as e:
-            logger.error(f"保存配额到配置文件失败: {e}")
+            logger.error(f"保存配额失败: {e}")
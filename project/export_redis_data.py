@@ -3,17 +3,76 @@
 用于分享数据给数据分析、清洗团队
 """
 import os
+import gzip
 import sys
 import json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import redis
 import yaml
+from utils.json_codec import extract_source, loads
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Parquet 固定列（各数据源的公共字段）；完整字段仍保留在 JSON/JSONL 中
+PARQUET_STR_FIELDS = (
+    'source', 'title', 'text', 'url', 'author', 'user', 'symbol',
+    'keyword', 'subreddit', 'feed_category', 'sentiment', 'language',
+)
+# 每个 row group 的行数（攒够后写入一次，避免过小的 row group）
+PARQUET_ROW_GROUP = 16384
+WRITE_BUFFER = 1 << 20  # 导出文件写缓冲（逐条写入的小字符串攒满 1MB 才落盘）
+
 
 def load_config():
     """加载配置文件"""
     with open('config.yaml', 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
+def parquet_schema():
+    """Parquet 导出的固定 schema"""
+    return pa.schema([(f, pa.string()) for f in PARQUET_STR_FIELDS] + [('timestamp', pa.int64())])
+
+
+def to_parquet_row(item):
+    """将一条记录转换为固定列（缺失为 null，类型不符时转为字符串或置空）"""
+    row = {f: (None if item.get(f) is None else str(item.get(f))) for f in PARQUET_STR_FIELDS}
+    ts = item.get('timestamp')
+    row['timestamp'] = int(ts) if isinstance(ts, (int, float)) and not isinstance(ts, bool) else None
+    return row
+
+
+def stream_batches(r, key, total, batch_size=1000, batches_per_trip=16):
+    """
+    按批 LRANGE 读取队列，每次只在内存中保留若干批原始 JSON 字符串
+
+    每次往返用非事务 pipeline 发送 batches_per_trip 条 LRANGE，减少网络往返次数；
+    调用方写文件的同时，后台线程预取下一组数据（最多提前一组，内存仍有上限）
+    """
+    step = batch_size * batches_per_trip
+
+    def fetch(start):
+        pipe = r.pipeline(transaction=False)
+        for i in range(start, min(start + step, total), batch_size):
+            pipe.lrange(key, i, min(i + batch_size - 1, total - 1))
+        return pipe.execute()
+
+    if total <= 0:
+        return
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(fetch, 0)
+        for start in range(0, total, step):
+            batches = future.result()
+            if start + step < total:
+                future = executor.submit(fetch, start + step)
+            yield from batches
+
 def export_redis_data():
     """导出 Redis 所有数据到 JSON 文件"""
     print("=" * 60)
@@ -56,61 +115,100 @@ def export_redis_data():
     
     print(f"✓ 找到 {total:,} 条数据")
     
-    # 3. 读取所有数据
-    print("\n[3/4] 读取数据...")
-    all_data = []
-    batch_size = 1000
-    
-    for i in range(0, total, batch_size):
-        batch = r.lrange(queue_key, i, min(i + batch_size - 1, total - 1))
-        for item in batch:
-            try:
-                all_data.append(json.loads(item))
-            except json.JSONDecodeError:
-                continue
-        
-        progress = min(i + batch_size, total)
-        print(f"  进度: {progress:,}/{total:,} ({progress/total*100:.1f}%)", end='\r')
-    
-    print(f"\n✓ 成功读取 {len(all_data):,} 条有效数据")
-    
-    # 4. 导出到文件
-    print("\n[4/4] 导出到文件...")
+    # 3. 边读边写：每批数据直接写入文件并统计来源，不在内存中累积全部数据
+    print("\n[3/4] 读取并导出数据...")
     
     # 创建导出目录
     export_dir = "data_exports/manual_export"
     os.makedirs(export_dir, exist_ok=True)
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    # 导出完整 JSON
     json_file = os.path.join(export_dir, f"redis_export_{timestamp}.json")
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(all_data, f, ensure_ascii=False, indent=2)
+    # JSONL (每行一条,方便分析工具读取)
+    # 默认 gzip 压缩（跟随 data_management.archive.compress），pandas 按扩展名自动解压
+    compress = (config.get('data_management') or {}).get('archive', {}).get('compress', True)
+    jsonl_file = os.path.join(export_dir, f"redis_export_{timestamp}.jsonl" + ('.gz' if compress else ''))
+    
+    # 数据分析用列式 Parquet（默认 zstd 压缩）：archive.format 为 parquet 且安装了 pyarrow 时额外生成
+    parquet_file = None
+    parquet_writer = None
+    parquet_rows = []
+    archive_format = (config.get('data_management') or {}).get('archive', {}).get('format', 'json')
+    if archive_format == 'parquet':
+        if HAS_PYARROW:
+            parquet_file = os.path.join(export_dir, f"redis_export_{timestamp}.parquet")
+            compression = (config.get('data_management') or {}).get('archive', {}).get('compression', 'zstd')
+            parquet_writer = pq.ParquetWriter(parquet_file, parquet_schema(), compression=compression)
+        else:
+            print("○ 未安装 pyarrow，跳过 Parquet 导出（pip install pyarrow）")
+    
+    exported = 0
+    skipped = 0
+    progress = 0
+    source_counts = Counter()
+    if compress:
+        # 低压缩级别：压缩比已接近默认级别，CPU 开销小，不会成为新的瓶颈
+        jsonl_out = gzip.open(jsonl_file, 'wt', encoding='utf-8', compresslevel=3)
+    else:
+        jsonl_out = open(jsonl_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER)
+    with open(json_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as jf, jsonl_out as lf:
+        # 完整 JSON 为数组，每条记录占一行
+        jf.write('[')
+        for batch in stream_batches(r, queue_key, total):
+            for raw in batch:
+                # 先校验是合法的 JSON 对象（截断或损坏的记录会使整个 JSON 数组无法解析），再原样写出，无需重新序列化
+                try:
+                    record = loads(raw)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict):
+                    skipped += 1
+                    continue
+                jf.write('\n' if exported == 0 else ',\n')
+                jf.write(raw)
+                lf.write(raw)
+                lf.write('\n')
+                exported += 1
+                # 来源统计只需一个字段，用子串查找代替完整解析
+                source_counts[extract_source(raw)] += 1
+                if parquet_writer is not None:
+                    parquet_rows.append(to_parquet_row(record))
+            
+            if parquet_writer is not None and len(parquet_rows) >= PARQUET_ROW_GROUP:
+                parquet_writer.write_table(pa.Table.from_pylist(parquet_rows, schema=parquet_writer.schema))
+                parquet_rows = []
+            progress += len(batch)
+            print(f"  进度: {progress:,}/{total:,} ({progress/total*100:.1f}%)", end='\r')
+        jf.write('\n]\n')
+    if parquet_writer is not None:
+        if parquet_rows:
+            parquet_writer.write_table(pa.Table.from_pylist(parquet_rows, schema=parquet_writer.schema))
+        parquet_writer.close()
+    
+    print(f"\n✓ 成功导出 {exported:,} 条有效数据")
+    if skipped:
+        print(f"⚠️  跳过 {skipped:,} 条无法解析的记录")
+    
+    # 4. 导出结果
+    print("\n[4/4] 导出文件...")
     file_size_mb = os.path.getsize(json_file) / (1024 * 1024)
     print(f"✓ JSON 文件: {json_file}")
     print(f"  大小: {file_size_mb:.2f} MB")
-    
-    # 导出 JSONL (每行一条,方便分析工具读取)
-    jsonl_file = os.path.join(export_dir, f"redis_export_{timestamp}.jsonl")
-    with open(jsonl_file, 'w', encoding='utf-8') as f:
-        for item in all_data:
-            f.write(json.dumps(item, ensure_ascii=False) + '\n')
     file_size_mb = os.path.getsize(jsonl_file) / (1024 * 1024)
     print(f"✓ JSONL 文件: {jsonl_file}")
     print(f"  大小: {file_size_mb:.2f} MB")
+    if parquet_file:
+        file_size_mb = os.path.getsize(parquet_file) / (1024 * 1024)
+        print(f"✓ Parquet 文件: {parquet_file}")
+        print(f"  大小: {file_size_mb:.2f} MB")
     
     # 按数据源统计
     print("\n" + "=" * 60)
     print("数据源统计:")
     print("=" * 60)
-    source_counts = {}
-    for item in all_data:
-        source = item.get('source', 'unknown')
-        source_counts[source] = source_counts.get(source, 0) + 1
     
-    for source, count in sorted(source_counts.items(), key=lambda x: x[1], reverse=True):
-        percentage = count / len(all_data) * 100
+    for source, count in source_counts.most_common():
+        percentage = count / max(exported, 1) * 100
         print(f"  {source:12s}: {count:6,} 条 ({percentage:5.1f}%)")
     
     # 导出元数据
@@ -119,20 +217,22 @@ def export_redis_data():
     print("=" * 60)
     metadata = {
         "export_time": datetime.now().isoformat(),
-        "total_records": len(all_data),
-        "source_distribution": source_counts,
+        "total_records": exported,
+        "source_distribution": dict(source_counts),
         "files": {
             "json": json_file,
             "jsonl": jsonl_file
         }
     }
+    if parquet_file:
+        metadata["files"]["parquet"] = parquet_file
     
     metadata_file = os.path.join(export_dir, f"export_metadata_{timestamp}.json")
     with open(metadata_file, 'w', encoding='utf-8') as f:
         json.dump(metadata, f, ensure_ascii=False, indent=2)
     
     print(f"导出目录: {os.path.abspath(export_dir)}")
-    print(f"总记录数: {len(all_data):,} 条")
+    print(f"总记录数: {exported:,} 条")
     print(f"元数据文件: {metadata_file}")
     
     print("\n" + "=" * 60)
@@ -141,14 +241,21 @@ def export_redis_data():
     print("\n可以将以下文件分享给数据分析团队:")
     print(f"  • {json_file}")
     print(f"  • {jsonl_file}")
+    if parquet_file:
+        print(f"  • {parquet_file}")
     print(f"  • {metadata_file}")
     
     print("\n使用建议:")
     print("  • JSON 格式: 适合查看、编辑、可视化")
-    print("  • JSONL 格式: 适合流式处理、pandas 读取")
+    print("  • JSONL 格式: 适合流式处理、保留完整字段")
+    if parquet_file:
+        print("  • Parquet 格式: 列式压缩，pandas/polars 读取最快（仅公共字段）")
     print("\nPython 读取示例:")
     print("  import pandas as pd")
-    print(f"  df = pd.read_json('{jsonl_file}', lines=True)")
+    if parquet_file:
+        print(f"  df = pd.read_parquet('{parquet_file}')")
+    else:
+        print(f"  df = pd.read_json('{jsonl_file}', lines=True)")
     print("  print(df.head())")
     
     return True
@@ -0,0 +1,17 @@
+"""
+pytest 全局配置
+测试期间日志写入临时目录，不污染仓库内的 logs/
+"""
+import shutil
+import tempfile
+
+import pytest
+
+
+def pytest_configure(config):
+    """在收集测试（导入各模块、创建模块级 logger）之前把日志目录指向临时目录"""
+    log_dir = tempfile.mkdtemp(prefix='cs5481_test_logs_')
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setenv('CRAWLER_LOG_DIR', log_dir)
+    config.add_cleanup(lambda: shutil.rmtree(log_dir, ignore_errors=True))
+    config.add_cleanup(monkeypatch.undo)
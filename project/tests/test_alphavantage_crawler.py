@@ -0,0 +1,172 @@
+"""
+Alpha Vantage 爬虫单元测试
+测试并发抓取调度与统计汇总（不访问真实 API）
+"""
+import json
+import pytest
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+from crawlers.alphavantage_crawler import AlphaVantageCrawler, RateLimitExceeded
+
+
+def _make_crawler(**overrides):
+    """构造一个启用状态、无请求间隔的爬虫实例"""
+    config = {
+        'enabled': True,
+        'api_key': 'test-key',
+        'symbols': ['AAPL', 'MSFT'],
+        'data_types': ['quote', 'news'],
+        'rate_limits': {
+            'max_requests_per_day': 25,
+            'requests_per_run': 5,
+            'delay_between_requests': 0,
+        },
+    }
+    config.update(overrides)
+    return AlphaVantageCrawler(config, MagicMock())
+
+
+class TestAlphaVantageCrawler:
+    """AlphaVantageCrawler 单元测试"""
+
+    def test_crawl_aggregates_concurrent_results(self):
+        """测试并发抓取后正确汇总数据条数、请求次数与错误"""
+        crawler = _make_crawler()
+
+        def fake_news(symbol):
+            if symbol == 'MSFT':
+                raise RuntimeError('boom')
+            return [{'text': 'n1'}, {'text': 'n2'}]
+
+        with patch.object(crawler, '_quota_check_and_get', return_value=(True, 25)), \
+             patch.object(crawler, '_update_quota') as mock_update, \
+             patch.object(crawler, '_get_current_day_usage', return_value=0), \
+             patch.object(crawler, '_fetch_global_quote', return_value={'text': 'q'}) as mock_quote, \
+             patch.object(crawler, '_fetch_news_sentiment', side_effect=fake_news):
+            stats = crawler.crawl()
+
+        # 2 条报价 + AAPL 的 2 条新闻；MSFT 新闻失败计 1 个错误
+        assert stats == {'items': 4, 'errors': 1}
+        assert mock_quote.call_count == 2
+        # 2 次报价 + 1 次成功的新闻请求
+        mock_update.assert_called_once_with(3)
+
+    def test_dispatch_unknown_type(self):
+        """测试未知数据类型不消耗请求"""
+        crawler = _make_crawler()
+        assert crawler._dispatch('AAPL', 'unknown') == (0, 0)
+
+    def test_rate_limited_request_is_retried(self):
+        """测试遇到限速提示时退避重试"""
+        crawler = _make_crawler(data_types=['quote'], symbols=['AAPL'])
+        crawler.max_retries = 1
+
+        with patch.object(crawler, '_quota_check_and_get', return_value=(True, 25)), \
+             patch.object(crawler, '_update_quota') as mock_update, \
+             patch.object(crawler, '_get_current_day_usage', return_value=0), \
+             patch.object(crawler, '_fetch_global_quote',
+                          side_effect=[RateLimitExceeded('limit'), {'text': 'q'}]) as mock_quote, \
+             patch('crawlers.alphavantage_crawler.asyncio.sleep'):
+            stats = crawler.crawl()
+
+        assert stats == {'items': 1, 'errors': 0}
+        assert mock_quote.call_count == 2
+        mock_update.assert_called_once_with(1)
+
+
+    def test_overview_cache_hit_skips_quota(self):
+        """测试公司概况命中缓存时不请求接口、不消耗配额"""
+        crawler = _make_crawler()
+        cached = {'Symbol': 'AAPL', 'Name': 'Apple', 'MarketCapitalization': '100'}
+        crawler.redis_client.client.get.return_value = json.dumps(cached)
+        crawler.redis_client.push_data.return_value = True
+
+        with patch.object(crawler, '_get_json') as mock_get_json:
+            items, used = crawler._dispatch('AAPL', 'overview')
+
+        assert (items, used) == (1, 0)
+        mock_get_json.assert_not_called()
+        crawler.redis_client.client.get.assert_called_once_with('av:overview:AAPL')
+
+    def test_earnings_cache_miss_fetches_and_caches(self):
+        """测试财报未命中缓存时请求接口并写入缓存"""
+        crawler = _make_crawler()
+        crawler.redis_client.client.get.return_value = None
+        crawler.redis_client.client.set.return_value = True
+        crawler.redis_client.push_data.return_value = True
+        mock_pipe = crawler.redis_client.client.pipeline.return_value
+        response = {'quarterlyEarnings': [{'fiscalDateEnding': '2025-09-30', 'reportedEPS': '1.5'}]}
+
+        with patch.object(crawler, '_get_json', return_value=response) as mock_get_json:
+            items, used = crawler._dispatch('AAPL', 'earnings')
+
+        assert (items, used) == (1, 1)
+        mock_get_json.assert_called_once()
+        key, ttl, payload = mock_pipe.setex.call_args[0]
+        assert (key, ttl) == ('av:earnings:AAPL', 21600)
+        assert json.loads(payload) == response
+
+
+    def test_update_quota_uses_dated_redis_counter(self):
+        """测试配额计数写入按日期分键的 Redis 计数器"""
+        crawler = _make_crawler()
+        mock_pipe = crawler.redis_client.client.pipeline.return_value
+        mock_pipe.execute.return_value = [7, True]
+
+        crawler._update_quota(3)
+
+        key = f"av:quota:{date.today()}"
+        mock_pipe.incrby.assert_called_once_with(key, 3)
+        mock_pipe.expire.assert_called_once_with(key, 2 * 86400)
+
+        crawler.redis_client.client.get.return_value = '7'
+        assert crawler._get_current_day_usage() == 7
+
+    def test_quote_merges_static_params_and_url_template(self):
+        """测试报价请求合并固定参数，写入的 url 不含 API Key"""
+        crawler = _make_crawler()
+        crawler.redis_client.push_data.return_value = True
+        response = {'Global Quote': {'05. price': '100', '10. change percent': '1%'}}
+
+        with patch.object(crawler, '_get_json', return_value=response) as mock_get_json:
+            data = crawler._fetch_global_quote('AAPL')
+
+        mock_get_json.assert_called_once_with(
+            {'function': 'GLOBAL_QUOTE', 'apikey': 'test-key', 'symbol': 'AAPL'}
+        )
+        assert data['url'] == 'https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol=AAPL'
+        assert 'symbol' not in crawler._params_quote
+
+    def test_get_json_short_bodies(self):
+        """测试空结果直接返回 {}，短响应中的限速提示抛出 RateLimitExceeded"""
+        crawler = _make_crawler()
+        crawler.session = MagicMock()
+        response = crawler.session.get.return_value
+
+        response.content = b'{"Global Quote": {}}'
+        assert crawler._get_json({'function': 'GLOBAL_QUOTE'}) == {}
+
+        response.content = json.dumps({'Note': 'Thank you for using Alpha Vantage! ' * 3}).encode()
+        with pytest.raises(RateLimitExceeded):
+            crawler._get_json({'function': 'GLOBAL_QUOTE'})
+
+    def test_bucket_allows_no_burst(self):
+        """测试令牌桶按每分钟请求数补充、容量为 1，首分钟不会突发超出限额"""
+        crawler = _make_crawler(rate_limits={'requests_per_minute': 5})
+        assert crawler.bucket.rate == 5 / 60
+        assert crawler.bucket.capacity == 1
+
+        crawler = _make_crawler(rate_limits={'delay_between_requests': 12})
+        assert crawler.bucket.rate == 5 / 60
+        assert crawler.bucket.capacity == 1
+
+    def test_parse_time_falls_back_to_default(self):
+        """测试无法解析的发布时间回退到传入的默认时间戳"""
+        crawler = _make_crawler()
+        assert crawler._parse_time('20251020T083000') == int(datetime(2025, 10, 20, 8, 30).timestamp())
+        assert crawler._parse_time('', 123) == 123
+        assert crawler._parse_time(None, 456) == 456
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
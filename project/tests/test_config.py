@@ -0,0 +1,55 @@
+"""
+配置读取模块单元测试
+测试 config.yaml 未变化时只解析一次、修改后重新读取，以及读取失败时的报错与回退
+"""
+import os
+import pytest
+import yaml
+from utils.config import load_config, read_config
+
+
+class TestReadConfig:
+    """read_config 单元测试"""
+
+    def test_config_parsed_once(self, tmp_path):
+        """测试文件未变化时多次读取只解析一次"""
+        path = tmp_path / 'config.yaml'
+        path.write_text('logging:\n  level: DEBUG\n', encoding='utf-8')
+        read_config.cache_clear()
+
+        first = read_config(str(path))
+        second = read_config(str(path))
+
+        assert first is second
+        assert second['logging']['level'] == 'DEBUG'
+
+    def test_config_reloaded_after_change(self, tmp_path):
+        """测试文件修改（mtime 变化）后重新读取"""
+        path = tmp_path / 'config.yaml'
+        path.write_text('logging:\n  level: DEBUG\n', encoding='utf-8')
+        assert read_config(str(path))['logging']['level'] == 'DEBUG'
+
+        path.write_text('logging:\n  level: ERROR\n', encoding='utf-8')
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+        assert read_config(str(path))['logging']['level'] == 'ERROR'
+
+    def test_missing_file_returns_empty(self, tmp_path):
+        """测试配置文件不存在时返回空字典"""
+        assert read_config(str(tmp_path / 'missing.yaml')) == {}
+
+    def test_load_config_raises(self, tmp_path):
+        """测试 load_config 在文件不存在或解析失败时抛出异常，read_config 回退空字典"""
+        with pytest.raises(FileNotFoundError):
+            load_config(str(tmp_path / 'missing.yaml'))
+
+        path = tmp_path / 'config.yaml'
+        path.write_text('redis: [unclosed\n', encoding='utf-8')
+        with pytest.raises(yaml.YAMLError):
+            load_config(str(path))
+        assert read_config(str(path)) == {}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
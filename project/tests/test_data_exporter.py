@@ -5,11 +5,35 @@
 import pytest
 import json
 import os
+from functools import partial
 from unittest.mock import Mock, patch, MagicMock, mock_open
-from utils.data_exporter import DataExporter
+from utils.data_exporter import DataExporter, write_parquet_stream
 from utils.redis_client import RedisClient
 
 
+def _fake_pipeline_lrange(mock_redis, queue):
+    """让 mock_redis 走真实的 read_oldest/trim_oldest，pipeline 的 LRANGE 在 execute 时按 Redis 负索引语义切片 queue（队头在前）"""
+    mock_redis.read_oldest.side_effect = partial(RedisClient.read_oldest, mock_redis)
+    mock_redis.trim_oldest.side_effect = partial(RedisClient.trim_oldest, mock_redis)
+    mock_redis.source_counts_key = f'{mock_redis.queue_name}:source_counts'
+    mock_pipe = mock_redis.client.pipeline.return_value
+    ranges = []
+    mock_pipe.lrange.side_effect = lambda key, start, end: ranges.append((start, end))
+    
+    def lrange(start, end):
+        n = len(queue)
+        start, end = max(start + n if start < 0 else start, 0), end + n if end < 0 else end
+        return queue[start:end + 1]
+    
+    def execute():
+        results = [lrange(s, e) for s, e in ranges]
+        ranges.clear()
+        return results
+    
+    mock_pipe.execute.side_effect = execute
+    return mock_pipe
+
+
 class TestDataExporter:
     """DataExporter 单元测试"""
     
@@ -44,41 +68,155 @@ class TestDataExporter:
         assert stats['queue_length_before'] == 500
     
     @patch('utils.data_exporter.os.path.exists', return_value=True)
+    @patch('utils.data_exporter.os.replace')
+    @patch('utils.data_exporter._fsync')
     @patch('builtins.open', new_callable=mock_open)
-    @patch('utils.data_exporter.json.dump')
-    def test_export_and_trim_json(self, mock_json_dump, mock_file, mock_exists):
-        """测试 JSON 导出功能"""
+    def test_export_and_trim_json(self, mock_file, mock_fsync, mock_replace, mock_exists):
+        """测试 JSON 导出功能：从队尾分批读取最旧数据，文件发布后再删除并扣减来源计数"""
         mock_redis = MagicMock(spec=RedisClient)
-        # 调用顺序: 1. 导出前检查 (1500), 2. _export_data内部 (1500), 3. 导出后检查 (1000)
-        mock_redis.get_queue_length.side_effect = [1500, 1500, 1000]
+        # 调用顺序: 1. 导出前检查 (1500), 2. 导出后检查 (1000)
+        mock_redis.get_queue_length.side_effect = [1500, 1000]
         
-        # 创建 mock client 属性
+        # 创建 mock client 属性（LRANGE 经 pipeline 发送）；队头最新，队尾 old_post_0 最旧
         mock_client = MagicMock()
-        mock_client.lrange.return_value = [
-            json.dumps({'source': 'reddit', 'text': f'old_post_{i}'})
-            for i in range(500)
-        ]
         mock_redis.client = mock_client
         mock_redis.queue_name = 'test_queue'
-        
-        # mock ltrim 操作
-        mock_client.ltrim.return_value = None
-        
-        mock_redis.rebuild_source_counts.return_value = (1000, {'reddit': 800, 'twitter': 200})
+        queue = [json.dumps({'source': 'rss', 'text': 'new'})] * 1000 + [
+            json.dumps({'source': 'reddit', 'text': f'old_post_{i}'})
+            for i in reversed(range(500))
+        ]
+        mock_pipe = _fake_pipeline_lrange(mock_redis, queue)
         
         exporter = DataExporter(mock_redis, 'test_exports', format='json')
-        stats = exporter.export_and_trim(max_keep=1000, batch_size=100)
+        stats = exporter.export_and_trim(max_keep=1000, batch_size=200)
         
         assert stats['queue_length_before'] == 1500
         assert stats['exported'] == 500
         assert stats['queue_length_after'] == 1000
         assert stats['export_file'] is not None
-        # 验证导出文件被写入
-        mock_json_dump.assert_called_once()
-        # 验证队列被修剪
-        mock_client.ltrim.assert_called_once_with('test_queue', 0, 999)
-        # 验证来源计数被重建
-        mock_redis.rebuild_source_counts.assert_called_once()
+        # 验证原始数据流式写入，文件内容是合法 JSON
+        written = ''.join(c[0][0] for c in mock_file().write.call_args_list)
+        doc = json.loads(written)
+        assert doc['count'] == 500
+        assert doc['data'][0] == {'source': 'reddit', 'text': 'old_post_0'}
+        assert [item['source'] for item in doc['data']] == ['reddit'] * 500
+        # 验证按批从队尾读取且同一趟 pipeline 发送
+        assert [c[0][1:] for c in mock_pipe.lrange.call_args_list] == [(-200, -1), (-400, -201), (-500, -401)]
+        mock_client.lrange.assert_not_called()
+        # 验证写完后一次删除已导出的条数，来源计数按导出数量扣减，无需全量重建
+        mock_pipe.ltrim.assert_called_once_with('test_queue', 0, -501)
+        mock_pipe.hincrby.assert_called_once_with('test_queue:source_counts', 'reddit', -500)
+        mock_redis.rebuild_source_counts.assert_not_called()
+        # 验证先写临时文件，完成后再改名发布
+        tmp, final = mock_replace.call_args[0]
+        assert tmp == final + '.part'
+        assert mock_file.call_args_list[0][0][0] == tmp
+    
+    @patch('utils.data_exporter.os.path.exists', return_value=True)
+    def test_export_failure_keeps_items(self, mock_exists):
+        """测试写文件失败时不删除队列数据，也不扣减来源计数"""
+        mock_redis = MagicMock(spec=RedisClient)
+        mock_redis.get_queue_length.return_value = 3
+        mock_client = MagicMock()
+        mock_redis.client = mock_client
+        mock_redis.queue_name = 'test_queue'
+        mock_pipe = _fake_pipeline_lrange(mock_redis, ['old', 'older', 'oldest'])
+        
+        exporter = DataExporter(mock_redis, 'test_exports', format='json')
+        handle = mock_open()
+        handle().write.side_effect = [None, None, None, OSError('disk full')]
+        with patch('builtins.open', handle):
+            stats = exporter.export_and_trim(max_keep=0)
+        
+        assert stats['export_file'] is None
+        mock_pipe.ltrim.assert_not_called()
+        mock_pipe.hincrby.assert_not_called()
+        mock_client.rpush.assert_not_called()
+    
+    @patch('utils.data_exporter.os.path.exists', return_value=True)
+    @patch('utils.data_exporter.os.replace')
+    @patch('utils.data_exporter._fsync')
+    @patch('utils.data_exporter.PARQUET_ROW_GROUP', 1)
+    def test_parquet_streamed_by_row_group(self, mock_fsync, mock_replace, mock_exists):
+        """测试 Parquet 经 pyarrow ParquetWriter 按 row group 流式写出，新字段写入 _extra 列"""
+        mock_redis = MagicMock(spec=RedisClient)
+        mock_redis.get_queue_length.side_effect = [2, 0]
+        mock_redis.client = MagicMock()
+        mock_redis.queue_name = 'test_queue'
+        # 队尾（最旧）为 rss
+        _fake_pipeline_lrange(mock_redis, [json.dumps({'source': 'reddit', 'score': 5}),
+                                           json.dumps({'source': 'rss', 'title': 't'})])
+        
+        with patch('utils.data_exporter.pa') as mock_pa, patch('utils.data_exporter.pq') as mock_pq:
+            mock_pq.ParquetWriter.return_value.schema.names = ['source', 'title', '_extra']
+            exporter = DataExporter(mock_redis, 'test_exports', format='parquet', compression='zstd')
+            stats = exporter.export_and_trim(max_keep=0, batch_size=1)
+        
+        assert stats['export_file'].endswith('.parquet')
+        writer = mock_pq.ParquetWriter.return_value
+        kwargs = mock_pq.ParquetWriter.call_args[1]
+        assert (kwargs['compression'], kwargs['compression_level']) == ('zstd', 3)
+        # 首组（rss）确定 schema，之后每组各写一次
+        schema_columns = mock_pa.Table.from_pydict.call_args_list[0][0][0]
+        assert schema_columns == {'source': ['rss'], 'title': ['t']}
+        assert writer.write_table.call_count == 2
+        last_columns = mock_pa.Table.from_pydict.call_args_list[-1][0][0]
+        assert last_columns == {'source': ['reddit'], 'title': [None], '_extra': ['{"score": 5}']}
+        writer.close.assert_called_once()
+    
+    def test_parquet_row_group_sorted_by_source(self):
+        """测试 row group 内按来源稳定排序，同一来源保持原有顺序"""
+        items = [json.dumps({'source': s, 'n': i}) for i, s in enumerate(['rss', 'reddit', 'rss', 'news'])]
+        
+        with patch('utils.data_exporter.pa') as mock_pa, patch('utils.data_exporter.pq') as mock_pq:
+            mock_pq.ParquetWriter.return_value.schema.names = ['source', 'n', '_extra']
+            write_parquet_stream('out.parquet', [items])
+        
+        columns = mock_pa.Table.from_pydict.call_args_list[-1][0][0]
+        assert columns['source'] == ['news', 'reddit', 'rss', 'rss']
+        assert columns['n'] == [3, 1, 0, 2]
+    
+    @patch('utils.data_exporter.os.path.exists', return_value=True)
+    def test_export_by_source_pages_queue(self, mock_exists):
+        """测试按来源导出分页 LRANGE（pipeline 发送），每个来源只导出最新 max_per_source 条之外的数据"""
+        queue = [json.dumps({'source': s, 'i': i}) for i, s in enumerate(
+            ['reddit', 'rss', 'rss', 'reddit', 'rss', 'reddit', 'rss'])]
+        mock_redis = MagicMock(spec=RedisClient)
+        mock_redis.client = MagicMock()
+        mock_redis.client.llen.return_value = len(queue)
+        mock_redis.queue_name = 'test_queue'
+        mock_pipe = mock_redis.client.pipeline.return_value
+        ranges = []
+        mock_pipe.lrange.side_effect = lambda key, start, end: ranges.append((start, end))
+        mock_pipe.execute.side_effect = lambda: [queue[s:e + 1] for s, e in ranges]
+        
+        exporter = DataExporter(mock_redis, 'test_exports', format='json')
+        with patch('builtins.open', mock_open()):
+            stats = exporter.export_by_source(max_per_source=2, page_size=3)
+        
+        assert stats == {'reddit': 1, 'rss': 2}
+        assert ranges == [(0, 2), (3, 5), (6, 6)]
+        mock_redis.client.lrange.assert_not_called()
+    
+    def test_export_file_published_atomically(self, tmp_path):
+        """测试导出文件写完才出现在导出目录，写入失败不留下残缺文件"""
+        mock_redis = MagicMock(spec=RedisClient)
+        exporter = DataExporter(mock_redis, str(tmp_path), format='json')
+        target = tmp_path / 'data_export.json'
+        
+        exporter._write_json_stream(str(target), [['{"source":"rss"}', '{"source":"reddit"}']])
+        
+        assert json.loads(target.read_text(encoding='utf-8'))['count'] == 2
+        assert [p.name for p in tmp_path.iterdir()] == ['data_export.json']
+        
+        def broken():
+            yield ['{"source":"rss"}']
+            raise OSError('disk full')
+        
+        failed = tmp_path / 'failed.json'
+        with pytest.raises(OSError):
+            exporter._write_json_stream(str(failed), broken())
+        assert [p.name for p in tmp_path.iterdir()] == ['data_export.json']
 
 
 class TestDataExporterIntegration:
@@ -0,0 +1,48 @@
+"""
+JSON 编解码单元测试
+测试 orjson 与标准库回退路径的一致性
+"""
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from utils import json_codec
+
+
+class TestJsonCodec:
+    """json_codec 单元测试"""
+
+    def test_roundtrip_keeps_non_ascii(self):
+        """测试序列化保留中文并可还原"""
+        data = {'text': '美股收盘', 'timestamp': 1760949000}
+        raw = json_codec.dumps(data)
+        assert isinstance(raw, str)
+        assert '美股收盘' in raw
+        assert json_codec.loads(raw) == data
+
+    def test_falls_back_for_unsupported_data(self):
+        """测试 orjson 不支持的数据（非 str 键）回退到标准库"""
+        assert json.loads(json_codec.dumps({1: 'a'})) == {'1': 'a'}
+
+    def test_stdlib_fallback_when_orjson_missing(self):
+        """测试未安装 orjson 时使用标准库"""
+        with patch.object(json_codec, 'orjson', None):
+            assert json_codec.dumps({'a': '中', 'b': [1, 2]}) == '{"a":"中","b":[1,2]}'
+            assert json_codec.loads(b'{"a": 1}') == {'a': 1}
+
+    def test_orjson_output_decoded_to_str(self):
+        """测试 orjson 路径同样返回 str，与标准库回退的类型一致"""
+        fake_orjson = MagicMock()
+        fake_orjson.dumps.return_value = '{"a":"中"}'.encode('utf-8')
+        with patch.object(json_codec, 'orjson', fake_orjson):
+            assert json_codec.dumps({'a': '中'}) == '{"a":"中"}'
+
+    def test_extract_source_without_parsing(self):
+        """测试不解析整条 JSON 取出 source，正文中转义的引号不会误匹配"""
+        assert json_codec.extract_source('{"text":"say \\"source\\": x","source":"reddit"}') == 'reddit'
+        assert json_codec.extract_source(json.dumps({'source': 'rss'})) == 'rss'
+        assert json_codec.extract_source('{"text":"no source"}') == 'unknown'
+        assert json_codec.extract_source('{"source":null}') == 'unknown'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
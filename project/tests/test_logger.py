@@ -0,0 +1,77 @@
+"""
+日志工具单元测试
+测试记录经队列交给后台线程写入各模块自己的日志文件
+"""
+import time
+import pytest
+import logging
+from logging.handlers import QueueHandler
+from utils.logger import _BatchedRotatingFileHandler, setup_logger
+
+
+def _read_when_written(path, text, timeout=2.0):
+    """等待后台监听线程写入指定内容后返回文件内容"""
+    deadline = time.time() + timeout
+    content = ''
+    while time.time() < deadline:
+        content = path.read_text(encoding='utf-8') if path.exists() else ''
+        if text in content:
+            break
+        time.sleep(0.02)
+    return content
+
+
+class TestSetupLogger:
+    """setup_logger 单元测试"""
+
+    def test_logger_only_enqueues(self, tmp_path):
+        """测试 logger 只挂一个入队处理器、不向上传播，重复调用不重复添加"""
+        logger = setup_logger('test_logger_enqueue', log_dir=str(tmp_path))
+        setup_logger('test_logger_enqueue', log_dir=str(tmp_path))
+
+        assert len(logger.handlers) == 1
+        assert isinstance(logger.handlers[0], QueueHandler)
+        assert logger.propagate is False
+
+    def test_records_routed_to_own_file(self, tmp_path):
+        """测试各 logger 的记录由后台线程写入各自的文件"""
+        first = setup_logger('test_logger_first', log_dir=str(tmp_path))
+        second = setup_logger('test_logger_second', log_dir=str(tmp_path))
+
+        first.info('来自 %s', 'first')
+        second.warning('来自 second')
+
+        first_file = next(tmp_path.glob('test_logger_first_*.log'))
+        second_file = next(tmp_path.glob('test_logger_second_*.log'))
+        first_log = _read_when_written(first_file, '来自 first')
+        second_log = _read_when_written(second_file, '来自 second')
+
+        assert 'test_logger_first - INFO - 来自 first' in first_log
+        assert '来自 second' not in first_log
+        assert 'WARNING - 来自 second' in second_log
+
+
+class TestBatchedRotatingFileHandler:
+    """_BatchedRotatingFileHandler 单元测试"""
+
+    def test_write_without_flush_and_rotate_by_size(self, tmp_path):
+        """测试逐条写入不 flush，按累计长度轮转"""
+        path = tmp_path / 'app.log'
+        handler = _BatchedRotatingFileHandler(str(path), maxBytes=100, backupCount=2, encoding='utf-8')
+        record = logging.makeLogRecord({'msg': 'x' * 30, 'levelno': logging.INFO})
+
+        handler.emit(record)
+        assert path.read_text(encoding='utf-8') == ''
+        handler.flush()
+        assert path.read_text(encoding='utf-8') == 'x' * 30 + '\n'
+
+        for _ in range(3):
+            handler.emit(record)
+        handler.close()
+
+        assert (tmp_path / 'app.log.1').exists()
+        assert path.stat().st_size <= 100
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,126 @@
+"""
+NewsAPI 爬虫单元测试
+测试直接调用 REST 接口与文章解析（不访问真实 API）
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+from crawlers.newsapi_crawler import NewsAPICrawler, EVERYTHING_URL
+
+
+def _make_crawler(**overrides):
+    """构造一个启用状态的爬虫实例"""
+    config = {
+        'enabled': True,
+        'api_key': 'test-key',
+        'query_keywords': ['stocks'],
+        'rate_limits': {'max_requests_per_day': 100, 'requests_per_run': 3},
+    }
+    config.update(overrides)
+    return NewsAPICrawler(config, MagicMock())
+
+
+class TestNewsAPICrawler:
+    """NewsAPICrawler 单元测试"""
+
+    def test_get_everything_sends_key_in_header(self):
+        """测试 API Key 通过请求头发送而非 URL 参数"""
+        crawler = _make_crawler()
+        crawler.session = MagicMock()
+        crawler.redis_client.client.get.return_value = None
+        crawler.session.get.return_value.status_code = 200
+        crawler.session.get.return_value.content = b'{"status": "ok", "articles": []}'
+
+        result = crawler._get_everything('stocks', 'en', '2025-10-20', 'publishedAt', 20)
+
+        assert result['status'] == 'ok'
+        args, kwargs = crawler.session.get.call_args
+        assert args[0] == EVERYTHING_URL
+        assert kwargs['headers'] == {'X-Api-Key': 'test-key'}
+        assert 'apiKey' not in kwargs['params']
+        assert kwargs['params']['pageSize'] == 20
+
+    def test_get_everything_conditional_request(self):
+        """测试携带 ETag 发起条件请求，304 时返回 not_modified"""
+        crawler = _make_crawler()
+        crawler.session = MagicMock()
+        crawler.redis_client.client.get.return_value = '"abc"'
+        crawler.session.get.return_value.status_code = 304
+
+        result = crawler._get_everything('stocks', 'en', '2025-10-20', 'publishedAt', 20)
+
+        assert result == {'status': 'not_modified'}
+        crawler.redis_client.client.get.assert_called_once_with('newsapi:etag:stocks')
+        assert crawler.session.get.call_args[1]['headers']['If-None-Match'] == '"abc"'
+        crawler.redis_client.client.set.assert_not_called()
+
+    def test_filter_seen_drops_repeated_urls(self):
+        """测试已出现过的 URL 被过滤，无 URL 的文章保留"""
+        crawler = _make_crawler()
+        mock_pipe = crawler.redis_client.client.pipeline.return_value
+        mock_pipe.execute.return_value = [1, 0, True]
+        batch = [{'url': 'https://a'}, {'url': 'https://b'}, {'url': ''}]
+
+        result = crawler._filter_seen(batch)
+
+        assert result == [{'url': 'https://a'}, {'url': ''}]
+        assert mock_pipe.sadd.call_count == 2
+
+    def test_extract_article_data_parses_iso_timestamp(self):
+        """测试解析 ISO-8601 发布时间"""
+        crawler = _make_crawler()
+        article = {
+            'title': 'Title',
+            'description': 'Desc',
+            'content': None,
+            'url': 'https://example.com/a',
+            'source': {'id': 'reuters', 'name': 'Reuters'},
+            'publishedAt': '2025-10-20T08:30:00Z',
+        }
+
+        data = crawler._extract_article_data(article, 'stocks')
+
+        assert data['timestamp'] == 1760949000
+        assert data['text'] == 'Title\n\nDesc'
+        assert data['source_name'] == 'Reuters'
+
+    def test_crawl_runs_queries_concurrently_and_aggregates(self):
+        """测试多个关键词经线程池抓取后正确汇总文章数、请求数与错误"""
+        crawler = _make_crawler(query_keywords=['stocks', 'bonds', 'forex'])
+        crawler.bucket = None
+        crawler.redis_client.push_batch.side_effect = lambda batch: len(batch)
+
+        def fake_get(q, **kwargs):
+            if q == 'forex':
+                raise RuntimeError('boom')
+            return {'status': 'ok', 'totalResults': 1,
+                    'articles': [{'title': q, 'publishedAt': '2025-10-20T08:30:00Z'}]}
+
+        with patch.object(crawler, '_quota_check_and_get', return_value=(True, 25)), \
+             patch.object(crawler, '_get_current_day_usage', return_value=0), \
+             patch.object(crawler, '_update_quota') as mock_update, \
+             patch.object(crawler, '_get_everything', side_effect=fake_get):
+            stats = crawler.crawl()
+
+        assert stats == {'articles': 2, 'errors': 1}
+        mock_update.assert_called_once_with(2)
+
+    def test_crawl_skips_articles_seen_under_other_keywords(self):
+        """测试同一轮中被多个关键词命中的文章只处理一次"""
+        crawler = _make_crawler(query_keywords=['stocks', 'market'])
+        crawler.bucket = None
+        crawler.redis_client.push_batch.side_effect = lambda batch: len(batch)
+        response = {'status': 'ok', 'totalResults': 1,
+                    'articles': [{'title': 't', 'url': 'https://example.com/a'}]}
+
+        with patch.object(crawler, '_quota_check_and_get', return_value=(True, 25)), \
+             patch.object(crawler, '_get_current_day_usage', return_value=0), \
+             patch.object(crawler, '_update_quota'), \
+             patch.object(crawler, '_filter_seen', side_effect=lambda batch: batch), \
+             patch.object(crawler, '_get_everything', return_value=response):
+            stats = crawler.crawl()
+
+        assert stats == {'articles': 1, 'errors': 0}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
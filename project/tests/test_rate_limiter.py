@@ -0,0 +1,78 @@
+"""
+限速器单元测试
+测试令牌桶的突发放行、等待与惩罚逻辑
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from utils.rate_limiter import AsyncTokenBucket, TokenBucket
+
+
+class TestAsyncTokenBucket:
+    """AsyncTokenBucket 单元测试"""
+
+    def test_burst_within_capacity_does_not_wait(self):
+        """测试容量内的请求立即放行"""
+        bucket = AsyncTokenBucket(rate=1, capacity=3)
+
+        async def run():
+            with patch('utils.rate_limiter.asyncio.sleep') as mock_sleep:
+                for _ in range(3):
+                    await bucket.acquire()
+                mock_sleep.assert_not_called()
+
+        asyncio.run(run())
+        assert bucket.tokens < 1
+
+    def test_waits_when_empty(self):
+        """测试令牌耗尽后按补充速率等待"""
+        bucket = AsyncTokenBucket(rate=10, capacity=1)
+
+        async def run():
+            await bucket.acquire()
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await bucket.acquire()
+            return loop.time() - start
+
+        assert asyncio.run(run()) >= 0.05
+
+    def test_penalize_allows_negative_tokens(self):
+        """测试惩罚可使令牌为负，延长后续等待"""
+        bucket = AsyncTokenBucket(rate=1, capacity=5)
+        bucket.penalize(8)
+        assert bucket.tokens < 0
+
+
+class TestTokenBucket:
+    """TokenBucket（线程版）单元测试"""
+
+    def test_burst_within_capacity_does_not_wait(self):
+        """测试容量内的请求立即放行"""
+        bucket = TokenBucket(rate=1, capacity=2)
+        with patch('utils.rate_limiter.time.sleep') as mock_sleep:
+            bucket.acquire()
+            bucket.acquire()
+        mock_sleep.assert_not_called()
+
+    def test_sleeps_when_empty(self):
+        """测试令牌耗尽后阻塞等待补充"""
+        bucket = TokenBucket(rate=2, capacity=1)
+        with patch('utils.rate_limiter.time.sleep') as mock_sleep:
+            bucket.acquire()
+            bucket.acquire()
+        mock_sleep.assert_called_once()
+        assert mock_sleep.call_args[0][0] == pytest.approx(0.5, abs=0.05)
+
+    def test_pause_does_not_stack(self):
+        """测试重复暂停不会叠加等待时间"""
+        bucket = TokenBucket(rate=1, capacity=5)
+        bucket.pause(10)
+        bucket.pause(10)
+        with patch('utils.rate_limiter.time.sleep') as mock_sleep:
+            bucket.acquire()
+        assert mock_sleep.call_args[0][0] == pytest.approx(11, abs=0.05)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,132 @@
+"""
+Reddit 爬虫单元测试
+测试帖子与评论的批量写入（不访问真实 API）
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+
+
+def _make_crawler(**overrides):
+    """构造一个使用 mock PRAW 客户端的爬虫实例"""
+    from crawlers.reddit_crawler import RedditCrawler
+
+    config = {
+        'client_id': 'id',
+        'client_secret': 'secret',
+        'user_agent': 'test-agent',
+        'subreddits': ['investing'],
+        'posts_limit': 3,
+        'comments_limit': 2,
+    }
+    config.update(overrides)
+    with patch('crawlers.reddit_crawler.praw.Reddit'):
+        return RedditCrawler(config, MagicMock())
+
+
+class TestRedditCrawler:
+    """RedditCrawler 单元测试"""
+
+    def test_crawl_flushes_posts_and_comments_in_batches(self):
+        """测试帖子与评论累计到 batch_size 时批量写入，子版块结束时写入剩余部分"""
+        crawler = _make_crawler(batch_size=4)
+        submissions = [MagicMock(title=f'post {i}') for i in range(3)]
+        crawler.reddit.subreddit.return_value.new.return_value = submissions
+
+        def fake_push(batch, seen_ids, seen_namespace):
+            assert len(seen_ids) == len(batch) and seen_namespace == 'reddit'
+            counts = {}
+            for item in batch:
+                counts[item['source']] = counts.get(item['source'], 0) + 1
+            return counts
+
+        crawler.redis_client.push_batch_by_source.side_effect = fake_push
+        comments = [{'source': 'reddit_comment'}, {'source': 'reddit_comment'}]
+
+        with patch.object(crawler, '_extract_post_data', return_value={'source': 'reddit_post'}), \
+             patch.object(crawler, '_crawl_comments', return_value=comments), \
+             patch('crawlers.reddit_crawler.time.sleep'):
+            stats = crawler.crawl()
+
+        assert stats == {'posts': 3, 'comments': 6, 'errors': 0}
+        # 每个帖子 3 条数据：第 2 个帖子后达到阈值写入 6 条，结束时写入剩余 3 条
+        batch_sizes = [len(c[0][0]) for c in crawler.redis_client.push_batch_by_source.call_args_list]
+        assert batch_sizes == [6, 3]
+        crawler.redis_client.push_data.assert_not_called()
+
+    def test_drop_seen_skips_known_posts_and_comments(self):
+        """测试按 fullname 去重，已写入过的帖子与评论被丢弃"""
+        crawler = _make_crawler()
+        items = [{'post_id': 'p1'}, {'comment_id': 'c1'}, {'comment_id': 'c2'}, {'source': 'x'}]
+        crawler.redis_client.check_seen.return_value = [True, False, True]
+
+        kept = crawler._drop_seen(items)
+
+        assert kept == [{'comment_id': 'c1'}, {'source': 'x'}]
+        crawler.redis_client.check_seen.assert_called_once_with(['t3_p1', 't1_c1', 't1_c2'], namespace='reddit')
+        crawler.redis_client.seen_many.assert_not_called()
+
+    def test_flush_marks_items_seen_with_push(self):
+        """测试写入时按条目传入 fullname，由写入的同一 pipeline 标记已处理"""
+        crawler = _make_crawler()
+        pending = [{'post_id': 'p1', 'source': 'reddit_post'}, {'comment_id': 'c1', 'source': 'reddit_comment'}]
+        crawler.redis_client.push_batch_by_source.return_value = {'reddit_post': 1, 'reddit_comment': 1}
+
+        assert crawler._flush(pending) == (1, 1)
+        crawler.redis_client.push_batch_by_source.assert_called_once_with(
+            pending, seen_ids=['t3_p1', 't1_c1'], seen_namespace='reddit')
+
+    def test_rate_adapts_to_remaining_quota(self):
+        """测试按剩余额度调整速率，额度不足时暂停到窗口重置"""
+        crawler = _make_crawler()
+        now = 1_000_000.0
+
+        with patch('crawlers.reddit_crawler.time.time', return_value=now):
+            crawler.reddit.auth.limits = {'remaining': 300, 'reset_timestamp': now + 100, 'used': 300}
+            crawler._adapt_to_rate_limit()
+            assert crawler.bucket.rate == pytest.approx(3.0)
+            
+            crawler.reddit.auth.limits = {'remaining': 2, 'reset_timestamp': now + 30, 'used': 598}
+            with patch.object(crawler.bucket, 'pause') as mock_pause:
+                crawler._adapt_to_rate_limit()
+            mock_pause.assert_called_once_with(31)
+    
+    def test_author_name_uses_name_attribute(self):
+        """测试作者名取自 Redditor.name，已删除账号记为 [deleted]"""
+        from crawlers.reddit_crawler import _author_name
+
+        author = MagicMock()
+        author.name = 'alice'
+        assert _author_name(MagicMock(author=author)) == 'alice'
+        assert _author_name(MagicMock(author=None)) == '[deleted]'
+
+    def test_crawl_comments_keeps_top_scored(self):
+        """测试展开评论树时只保留评分最高的 comments_limit 条评论，同分保持原顺序"""
+        crawler = _make_crawler(comments_limit=2, nested_comments=True)
+        comments = [MagicMock(score=s, id=str(i)) for i, s in enumerate([5, 9, 1, 9])]
+        submission = MagicMock()
+        submission.comments.list.return_value = comments
+
+        with patch.object(crawler, '_extract_comment_data', side_effect=lambda c, _: c.id):
+            result = crawler._crawl_comments(submission, 'investing')
+
+        assert result == ['1', '3']
+
+    def test_crawl_comments_uses_server_side_top_sort(self):
+        """测试默认由服务端按 top 排序截取顶层评论，跳过 MoreComments 且不展开评论树"""
+        crawler = _make_crawler(comments_limit=2)
+        more = MagicMock(spec=['count'])
+        comments = [MagicMock(id='a'), more, MagicMock(id='b'), MagicMock(id='c')]
+        submission = MagicMock()
+        submission.comments.__iter__.return_value = iter(comments)
+
+        with patch.object(crawler, '_extract_comment_data', side_effect=lambda c, _: c.id):
+            result = crawler._crawl_comments(submission, 'investing')
+
+        assert result == ['a', 'b']
+        assert submission.comment_sort == 'top'
+        assert submission.comment_limit == 2
+        submission.comments.replace_more.assert_not_called()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -4,8 +4,9 @@ Redis 客户端单元测试
 """
 import pytest
 import json
+from datetime import date
 from unittest.mock import Mock, patch, MagicMock
-from utils.redis_client import RedisClient
+from utils.redis_client import RedisClient, TRIM_TO_CAP_SCRIPT, create_pool
 
 
 class TestRedisClient:
@@ -36,8 +37,9 @@ class TestRedisClient:
         """测试成功推送数据"""
         mock_client = MagicMock()
         mock_client.ping.return_value = True
-        mock_client.llen.return_value = 100
-        mock_client.get.return_value = '10'  # 来源计数
+        mock_client.hget.return_value = '10'  # 来源计数
+        mock_pipe = mock_client.pipeline.return_value
+        mock_pipe.execute.return_value = [100, 11]  # LPUSH 返回推送后的队列长度
         mock_redis.return_value = mock_client
         
         client = RedisClient(queue_name='test_queue')
@@ -46,15 +48,19 @@ class TestRedisClient:
         result = client.push_data(data)
         
         assert result is True
-        mock_client.lpush.assert_called_once()
-        mock_client.incr.assert_called_once()
+        # 推送与计数在同一趟 pipeline 中发送，不再单独 LLEN
+        mock_pipe.lpush.assert_called_once()
+        mock_pipe.hincrby.assert_called_once_with('test_queue:source_counts', 'reddit', 1)
+        mock_pipe.execute.assert_called_once()
+        mock_client.lpush.assert_not_called()
+        mock_client.llen.assert_not_called()
     
     @patch('utils.redis_client.redis.Redis')
     def test_push_data_quota_exceeded(self, mock_redis):
         """测试配额超限时拒绝推送"""
         mock_client = MagicMock()
         mock_client.ping.return_value = True
-        mock_client.get.return_value = '600'  # 已有600条reddit数据
+        mock_client.hget.return_value = '600'  # 已有600条reddit数据
         mock_redis.return_value = mock_client
         
         # 配额：reddit占50%，max_keep=1000，即500条上限
@@ -69,7 +75,161 @@ class TestRedisClient:
         
         # 应该拒绝推送
         assert result is False
-        mock_client.lpush.assert_not_called()
+        mock_client.hget.assert_called_once_with('test_queue:source_counts', 'reddit')
+        mock_client.pipeline.return_value.lpush.assert_not_called()
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_init_rebuilds_missing_count_hash(self, mock_redis):
+        """测试启用配额且计数 Hash 不存在时按队列数据重建一次"""
+        mock_client = MagicMock()
+        mock_client.exists.return_value = 0
+        mock_redis.return_value = mock_client
+        
+        with patch.object(RedisClient, 'rebuild_source_counts') as mock_rebuild:
+            RedisClient(queue_name='test_queue', source_quotas={'reddit': 0.5})
+            mock_client.exists.return_value = 1
+            RedisClient(queue_name='test_queue', source_quotas={'reddit': 0.5})
+        
+        mock_rebuild.assert_called_once()
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_push_data_quota_uses_cached_count(self, mock_redis):
+        """测试配额检查使用 HINCRBY 返回的计数缓存，接近上限时才重新 HGET"""
+        mock_client = MagicMock()
+        mock_client.hget.return_value = '10'
+        mock_pipe = mock_client.pipeline.return_value
+        mock_pipe.execute.return_value = [100, 11]
+        mock_redis.return_value = mock_client
+        
+        client = RedisClient(
+            queue_name='test_queue',
+            storage_config={'max_keep': 1000},
+            source_quotas={'reddit': 0.5}
+        )
+        data = {'source': 'reddit', 'title': 'Test'}
+        
+        assert client.push_data(data) is True
+        assert client.push_data(data) is True
+        assert mock_client.hget.call_count == 1
+        
+        # HINCRBY 返回的计数接近上限（500 的 5% 余量内），下次推送前重新读取
+        mock_pipe.execute.return_value = [100, 480]
+        client.push_data(data)
+        client.push_data(data)
+        assert mock_client.hget.call_count == 2
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_push_data_queue_warning_not_repeated(self, mock_redis):
+        """测试队列超阈值时不逐条重复警告，再增长 10% 阈值才再次提醒"""
+        mock_client = MagicMock()
+        mock_pipe = mock_client.pipeline.return_value
+        mock_redis.return_value = mock_client
+        client = RedisClient(queue_name='test_queue', storage_config={'max_keep': 1000})
+        
+        with patch('utils.redis_client.logger') as mock_logger:
+            for length in (1001, 1002, 1050, 1101, 900, 1001):
+                mock_pipe.execute.return_value = [length, 1]
+                client.push_data({'source': 'rss'})
+        
+        warned = [c[0][1] for c in mock_logger.warning.call_args_list]
+        assert warned == [1001, 1101, 1001]
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_peek_data_reads_in_pages(self, mock_redis):
+        """测试查看数据按页 LRANGE，不一次取出大范围，队列读完即停止"""
+        queue = [json.dumps({'source': 'rss', 'i': i}) for i in range(25)]
+        mock_client = MagicMock()
+        mock_client.lrange.side_effect = lambda key, start, end: queue[start:end + 1]
+        mock_redis.return_value = mock_client
+        client = RedisClient(queue_name='test_queue')
+        
+        data = client.peek_data(100)
+        
+        assert [d['i'] for d in data] == list(range(25))
+        assert list(client.iter_data(15, page_size=10))[-1]['i'] == 14
+        ranges = [c[0][1:] for c in mock_client.lrange.call_args_list]
+        assert ranges == [(0, 99), (0, 9), (10, 14)]
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_read_oldest_pipelines_batches_per_trip(self, mock_redis):
+        """测试每趟 pipeline 最多发送 batches_per_trip 个 LRANGE，读到队头后停止，只读不删"""
+        mock_client = MagicMock()
+        mock_redis.return_value = mock_client
+        client = RedisClient(queue_name='test_queue')
+        mock_pipe = mock_client.pipeline.return_value
+        # 队头最新：队尾 i=0 最旧
+        queue = [f'{{"source":"{"rss" if i % 2 else "reddit"}","i":{i}}}' for i in reversed(range(23))]
+        ranges = []
+        
+        def execute():
+            results = []
+            for start, end in ranges:
+                start, end = max(start + len(queue), 0), end + len(queue)
+                results.append(queue[start:end + 1])
+            ranges.clear()
+            return results
+        
+        mock_pipe.lrange.side_effect = lambda key, start, end: ranges.append((start, end))
+        mock_pipe.execute.side_effect = execute
+        
+        exported = {}
+        batches = list(client.read_oldest(100, exported, batch_size=5, batches_per_trip=2))
+        
+        assert [len(b) for b in batches] == [5, 5, 5, 5, 3]
+        assert batches[0][0] == '{"source":"reddit","i":0}'
+        assert exported == {'reddit': 12, 'rss': 11}
+        # 23 条每趟 10 条：3 趟，最后一趟只读到 3 条即停止
+        assert mock_pipe.execute.call_count == 3
+        mock_pipe.ltrim.assert_not_called()
+        mock_client.rpop.assert_not_called()
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_get_source_counts(self, mock_redis):
+        """测试来源计数一次 HGETALL 读取，扣减到 0 及以下的来源不返回"""
+        mock_client = MagicMock()
+        mock_client.hgetall.return_value = {'rss': '12', 'reddit': '0'}
+        mock_redis.return_value = mock_client
+        client = RedisClient(queue_name='test_queue')
+        
+        assert client.get_source_counts() == {'rss': 12}
+        mock_client.hgetall.assert_called_once_with('test_queue:source_counts')
+        mock_client.lrange.assert_not_called()
+        
+        mock_client.hgetall.side_effect = Exception('down')
+        assert client.get_source_counts() == {}
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_trim_oldest(self, mock_redis):
+        """测试已导出数据一次事务删除，来源计数按来源扣减（非 JSON 条目只计条数）"""
+        mock_client = MagicMock()
+        mock_redis.return_value = mock_client
+        client = RedisClient(queue_name='test_queue')
+        
+        assert client.trim_oldest({'rss': 2, 'reddit': 1, '': 1}) == 4
+        
+        mock_client.pipeline.assert_called_with(transaction=True)
+        mock_pipe = mock_client.pipeline.return_value
+        mock_pipe.ltrim.assert_called_once_with('test_queue', 0, -5)
+        mock_pipe.hincrby.assert_any_call('test_queue:source_counts', 'rss', -2)
+        mock_pipe.hincrby.assert_any_call('test_queue:source_counts', 'reddit', -1)
+        assert mock_pipe.hincrby.call_count == 2
+        mock_pipe.execute.assert_called_once()
+        
+        assert client.trim_oldest({}) == 0
+        mock_pipe.execute.assert_called_once()
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_slim_data_keeps_core_fields(self, mock_redis):
+        """测试精简模式只保留核心字段，缺失的时间戳与摘要从其他字段补齐"""
+        mock_redis.return_value = MagicMock()
+        client = RedisClient(queue_name='test_queue')
+        data = {'text': 'x' * 600, 'source': 'rss', 'title': 'T', 'author': 'a', 'crawl_timestamp': 1}
+        
+        slimmed = client._slim_data(data)
+        
+        assert list(slimmed) == ['title', 'source', 'timestamp', 'summary']
+        assert slimmed['timestamp'] == 1
+        assert len(slimmed['summary']) == 500
     
     @patch('utils.redis_client.redis.Redis')
     def test_get_queue_length(self, mock_redis):
@@ -115,10 +275,220 @@ class TestRedisClient:
         
         # 验证 pipeline 被使用
         mock_client.pipeline.assert_called_once()
-        # 验证 pipeline.set 被调用 3 次（3 个不同的来源）
-        assert mock_pipeline.set.call_count == 3
+        # 验证计数 Hash 整体替换：先删除再一次 HSET 写入 3 个来源
+        mock_pipeline.delete.assert_called_once_with('test_queue:source_counts')
+        mock_pipeline.hset.assert_called_once_with(
+            'test_queue:source_counts', mapping={'reddit': 3, 'twitter': 1, 'rss': 1})
         # 验证 pipeline.execute 被调用
         mock_pipeline.execute.assert_called_once()
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_rebuild_source_counts_parses_only_without_source(self, mock_redis):
+        """测试重建计数只扫描 source 字段，取不到时才完整解析，非法数据跳过"""
+        mock_client = MagicMock()
+        mock_client.llen.return_value = 4
+        mock_client.lrange.return_value = [
+            '{"text":"a","source":"reddit"}',
+            '{"text": "b", "source": "rss"}',
+            '{"text":"c","source":null}',
+            'not json',
+        ]
+        mock_redis.return_value = mock_client
+        
+        client = RedisClient(queue_name='test_queue')
+        with patch('utils.redis_client.loads', side_effect=json.loads) as mock_loads:
+            scanned, counts = client.rebuild_source_counts()
+        
+        assert scanned == 4
+        assert counts == {'reddit': 1, 'rss': 1, 'unknown': 1}
+        assert mock_loads.call_count == 2
+
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_push_batch_chunks_and_quota(self, mock_redis):
+        """测试批量推送：按块 LPUSH，并按来源配额截断"""
+        mock_client = MagicMock()
+        mock_client.ping.return_value = True
+        mock_client.hmget.return_value = ['498']  # reddit 已有 498 条，上限 500
+        mock_pipeline = MagicMock()
+        mock_client.pipeline.return_value = mock_pipeline
+        mock_redis.return_value = mock_client
+        
+        client = RedisClient(
+            queue_name='test_queue',
+            storage_config={'max_keep': 1000},
+            source_quotas={'reddit': 0.5}
+        )
+        data_list = [{'source': 'reddit', 'title': f'p{i}'} for i in range(5)]
+        data_list += [{'source': 'rss', 'title': f'a{i}'} for i in range(3)]
+        
+        pushed = client.push_batch(data_list, chunk_size=2)
+        
+        # reddit 只剩 2 条余量，rss 无配额限制
+        assert pushed == 5
+        mock_client.pipeline.assert_called_once_with(transaction=False)
+        assert mock_pipeline.lpush.call_count == 3
+        mock_pipeline.hincrby.assert_any_call('test_queue:source_counts', 'reddit', 2)
+        mock_pipeline.hincrby.assert_any_call('test_queue:source_counts', 'rss', 3)
+        mock_pipeline.execute.assert_called_once()
+        mock_client.get.assert_not_called()
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_push_batch_trims_to_hard_cap(self, mock_redis):
+        """测试配置硬上限时在同一 pipeline 中用脚本修剪队列并扣减被截掉数据的来源计数，未配置则不修剪"""
+        mock_client = MagicMock()
+        mock_client.ping.return_value = True
+        mock_pipeline = MagicMock()
+        mock_client.pipeline.return_value = mock_pipeline
+        mock_redis.return_value = mock_client
+        
+        client = RedisClient(queue_name='test_queue', storage_config={'hard_cap': 100})
+        client.push_batch([{'source': 'rss', 'title': 'a'}])
+        client.push_data({'source': 'rss', 'title': 'b'})
+        
+        script = mock_client.register_script.return_value
+        mock_client.register_script.assert_called_once_with(TRIM_TO_CAP_SCRIPT)
+        script.assert_called_with(keys=['test_queue', 'test_queue:source_counts'], args=[100], client=mock_pipeline)
+        assert script.call_count == 2
+        mock_pipeline.ltrim.assert_not_called()
+        
+        mock_client.register_script.reset_mock()
+        RedisClient(queue_name='test_queue').push_batch([{'source': 'rss', 'title': 'a'}])
+        mock_client.register_script.assert_not_called()
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_push_batch_by_source(self, mock_redis):
+        """测试混合来源批量写入时按来源返回成功条数"""
+        mock_client = MagicMock()
+        mock_client.ping.return_value = True
+        mock_redis.return_value = mock_client
+        
+        client = RedisClient(queue_name='test_queue')
+        data = [
+            {'source': 'reddit_post', 'text': 'p1'},
+            {'source': 'reddit_comment', 'text': 'c1'},
+            {'source': 'reddit_comment', 'text': 'c2'},
+        ]
+        
+        assert client.push_batch_by_source(data) == {'reddit_post': 1, 'reddit_comment': 2}
+        assert client.push_batch(data) == 3
+        assert client.push_batch_by_source([]) == {}
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_get_stats_batch(self, mock_redis):
+        """测试一次 pipeline 获取队列长度与内存信息"""
+        mock_client = MagicMock()
+        mock_client.ping.return_value = True
+        mock_pipeline = MagicMock()
+        mock_pipeline.execute.return_value = [
+            42,
+            {
+                'used_memory': 2 * 1024 * 1024,
+                'used_memory_human': '2.00M',
+                'used_memory_peak': 4 * 1024 * 1024,
+                'used_memory_peak_human': '4.00M',
+            },
+        ]
+        mock_client.pipeline.return_value = mock_pipeline
+        mock_redis.return_value = mock_client
+        
+        client = RedisClient(queue_name='test_queue')
+        stats = client.get_stats_batch()
+        
+        assert stats['queue_length'] == 42
+        assert stats['used_memory_mb'] == 2
+        mock_pipeline.llen.assert_called_once_with('test_queue')
+        mock_pipeline.info.assert_called_once_with('memory')
+        mock_pipeline.execute.assert_called_once()
+        mock_client.llen.assert_not_called()
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_check_quota_registers_script_once(self, mock_redis):
+        """测试配额检查通过 Lua 脚本完成，脚本只注册一次"""
+        mock_client = MagicMock()
+        mock_client.ping.return_value = True
+        mock_script = MagicMock(side_effect=[[1, 20], [0, 25]])
+        mock_client.register_script.return_value = mock_script
+        mock_redis.return_value = mock_client
+        
+        client = RedisClient(queue_name='test_queue')
+        
+        assert client.check_quota('av:quota:2025-10-20', 25) == (True, 20)
+        assert client.check_quota('av:quota:2025-10-20', 25) == (False, 25)
+        mock_client.register_script.assert_called_once()
+        mock_script.assert_called_with(keys=['av:quota:2025-10-20'], args=[25])
+    
+    @patch('utils.redis_client.redis.Redis')
+    def test_init_with_shared_pool(self, mock_redis):
+        """测试传入共享连接池时由连接池创建客户端"""
+        mock_redis.return_value = MagicMock()
+        pool = create_pool(host='localhost', queue_name='test_queue', max_connections=4)
+        
+        RedisClient(queue_name='test_queue', pool=pool)
+        
+        mock_redis.assert_called_once_with(connection_pool=pool)
+        assert pool.max_connections == 4
+    
+    @patch('utils.redis_client.date')
+    @patch('utils.redis_client.redis.Redis')
+    def test_seen_many_checks_current_and_previous_week(self, mock_redis, mock_date):
+        """测试去重写入本周集合，并同时检查上周集合"""
+        mock_client = MagicMock()
+        mock_client.ping.return_value = True
+        mock_redis.return_value = mock_client
+        mock_date.today.return_value = date(2025, 10, 20)
+        mock_pipe = mock_client.pipeline.return_value
+        # SADD: a 新增、b 已存在、c 新增；EXPIRE；SISMEMBER 上周: 仅 c 存在
+        mock_pipe.execute.return_value = [1, 0, 1, True, False, False, True]
+        
+        client = RedisClient(queue_name='test_queue')
+        
+        assert client.seen_many(['a', 'b', 'c'], namespace='rss') == [False, True, True]
+        mock_pipe.sadd.assert_any_call('rss:seen:guids:202543', 'a')
+        mock_pipe.sismember.assert_any_call('rss:seen:guids:202542', 'c')
+        mock_pipe.expire.assert_called_once_with('rss:seen:guids:202543', 14 * 86400)
+        assert client.seen_many([]) == []
+
+    @patch('utils.redis_client.date')
+    @patch('utils.redis_client.redis.Redis')
+    def test_check_seen_does_not_mark(self, mock_redis, mock_date):
+        """测试只读检查本周与上周集合，不写入去重集合"""
+        mock_client = MagicMock()
+        mock_redis.return_value = mock_client
+        mock_date.today.return_value = date(2025, 10, 20)
+        mock_pipe = mock_client.pipeline.return_value
+        # (本周, 上周)：a 都不在、b 在本周、c 在上周
+        mock_pipe.execute.return_value = [False, False, True, False, False, True]
+        
+        client = RedisClient(queue_name='test_queue')
+        
+        assert client.check_seen(['a', 'b', 'c'], namespace='rss') == [False, True, True]
+        mock_pipe.sismember.assert_any_call('rss:seen:guids:202543', 'b')
+        mock_pipe.sismember.assert_any_call('rss:seen:guids:202542', 'c')
+        mock_pipe.sadd.assert_not_called()
+        assert client.check_seen([]) == []
+
+    @patch('utils.redis_client.date')
+    @patch('utils.redis_client.redis.Redis')
+    def test_push_batch_marks_only_pushed_seen(self, mock_redis, mock_date):
+        """测试写入时在同一 pipeline 标记去重，被配额丢弃的条目不标记"""
+        mock_client = MagicMock()
+        mock_client.hmget.return_value = ['499']  # reddit 只剩 1 条余量
+        mock_redis.return_value = mock_client
+        mock_date.today.return_value = date(2025, 10, 20)
+        mock_pipe = mock_client.pipeline.return_value
+        
+        client = RedisClient(queue_name='test_queue', storage_config={'max_keep': 1000},
+                             source_quotas={'reddit': 0.5})
+        data = [{'source': 'reddit', 'text': 'p1'}, {'source': 'reddit', 'text': 'p2'}, None,
+                {'source': 'rss', 'text': 'a1'}]
+        
+        assert client.push_batch(data, seen_ids=['t3_p1', 't3_p2', None, None],
+                                 seen_namespace='reddit') == 2
+        
+        mock_pipe.sadd.assert_called_once_with('reddit:seen:guids:202543', 't3_p1')
+        mock_pipe.expire.assert_called_once_with('reddit:seen:guids:202543', 14 * 86400)
+        mock_pipe.execute.assert_called_once()
 
 
 if __name__ == '__main__':
@@ -2,7 +2,10 @@
 RSS 爬虫解析测试
 测试 RSS 爬虫的数据解析功能（使用 mock 数据）
 """
+import io
+import time
 import pytest
+import requests
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
 import feedparser
@@ -63,6 +66,258 @@ class TestRSSCrawler:
             
         except ImportError:
             pytest.skip("RSSCrawler 未实现")
+    
+    def test_crawl_feeds_concurrently_and_aggregates(self):
+        """测试多个订阅源并发抓取后正确汇总文章数与错误"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        mock_redis = MagicMock()
+        mock_redis.push_batch.side_effect = lambda batch, **kwargs: len(batch)
+        mock_redis.check_seen.side_effect = lambda members, namespace: [False] * len(members)
+        config = {
+            'fetch_full_content': False,
+            'feeds': [
+                {'name': 'A', 'url': 'https://a.com/rss'},
+                {'name': 'B', 'url': 'https://b.com/rss'},
+                {'name': 'NoURL'},
+            ],
+        }
+        crawler = RSSCrawler(config, mock_redis)
+        
+        def fake_fetch(url, name):
+            if name == 'B':
+                raise RuntimeError('boom')
+            return MagicMock(bozo=False, entries=[{'title': 't1'}, {'title': 't2'}])
+        
+        with patch.object(crawler, '_fetch_feed_with_timeout', side_effect=fake_fetch), \
+             patch.object(crawler, '_extract_article_data', return_value={'source': 'rss'}):
+            stats = crawler.crawl()
+        
+        assert stats == {'articles': 2, 'errors': 1}
+        mock_redis.push_batch.assert_called_once()
+    
+    def test_only_pushed_entries_marked_seen(self):
+        """测试已写入过的文章跳过；提取失败的文章不随写入标记，下次仍会重试"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        mock_redis = MagicMock()
+        mock_redis.check_seen.return_value = [True, False, False]
+        mock_redis.push_batch.return_value = 1
+        crawler = RSSCrawler({'feeds': [], 'fetch_full_content': False}, mock_redis)
+        entries = [{'id': 'g1'}, {'id': 'g2'}, {'id': 'g3'}]
+        feed = MagicMock(bozo=False, entries=entries)
+        feed.get.return_value = 200
+        
+        with patch.object(crawler, '_fetch_feed_with_timeout', return_value=feed), \
+             patch.object(crawler, '_extract_article_data', side_effect=[None, {'source': 'rss'}]):
+            saved, failed = crawler._crawl_feed({'name': 'Test Feed', 'url': 'https://test.com/rss'})
+        
+        assert (saved, failed) == (1, False)
+        mock_redis.check_seen.assert_called_once_with(['g1', 'g2', 'g3'], namespace='rss')
+        mock_redis.seen_many.assert_not_called()
+        mock_redis.push_batch.assert_called_once_with([{'source': 'rss'}], seen_ids=['g3'], seen_namespace='rss')
+    
+    def test_conditional_get_uses_cached_etag(self):
+        """测试携带缓存的 ETag 请求订阅源，304 时不解析、不提取文章也不写入"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        mock_redis = MagicMock()
+        feed_url = 'https://test.com/rss'
+        mock_redis.client.pipeline.return_value.execute.return_value = [
+            {feed_url: '"v1"'}, {feed_url: 'Mon, 20 Oct 2025 10:00:00 GMT'}
+        ]
+        crawler = RSSCrawler({'feeds': [], 'fetch_full_content': False}, mock_redis)
+        crawler.session = MagicMock()
+        crawler.session.get.return_value = MagicMock(status_code=304)
+        
+        with patch('crawlers.rss_crawler.feedparser.parse') as mock_parse:
+            saved, failed = crawler._crawl_feed({'name': 'Test Feed', 'url': feed_url})
+        
+        assert (saved, failed) == (0, False)
+        headers = crawler.session.get.call_args[1]['headers']
+        assert headers['If-None-Match'] == '"v1"'
+        assert headers['If-Modified-Since'] == 'Mon, 20 Oct 2025 10:00:00 GMT'
+        mock_parse.assert_not_called()
+        mock_redis.push_batch.assert_not_called()
+    
+    def test_feed_parsed_from_session_bytes(self):
+        """测试订阅源经共享 Session 下载后解析字节内容，并记录新的 ETag"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        crawler = RSSCrawler({'feeds': [], 'fetch_full_content': False}, MagicMock())
+        crawler.session = MagicMock()
+        body = (b'<?xml version="1.0"?><rss version="2.0"><channel><title>T</title>'
+                b'<item><title>Hello</title><link>https://example.com/1</link></item>'
+                b'</channel></rss>')
+        crawler.session.get.return_value = MagicMock(
+            status_code=200, content=body, url='https://test.com/rss',
+            headers={'Content-Type': 'application/rss+xml', 'ETag': '"v2"'},
+        )
+        
+        feed = crawler._fetch_feed_with_timeout('https://test.com/rss', 'Test Feed')
+        
+        assert [e.title for e in feed.entries] == ['Hello']
+        assert feed.get('etag') == '"v2"'
+        assert 'If-None-Match' not in crawler.session.get.call_args[1]['headers']
+    
+    def test_fallback_extracts_article_body(self):
+        """测试备用方案按正文容器提取文本并剔除脚本与导航"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        crawler = RSSCrawler({'feeds': [], 'fetch_full_content': False}, MagicMock())
+        body = 'Shares of Apple rose after the company reported record quarterly revenue. ' * 3
+        html = (
+            '<html><body><nav>Home | Markets</nav>'
+            '<div class="story article-body"><p>' + body + '</p>'
+            '<script>var x = 1;</script></div></body></html>'
+        )
+        
+        text = crawler._fetch_full_article_fallback('https://example.com/a', html)
+        
+        assert text == body.strip()
+        assert crawler._fetch_full_article_fallback('https://example.com/b', '<p>short</p>') is None
+    
+    def test_extract_timestamp_treats_parsed_time_as_utc(self):
+        """测试 *_parsed 按 UTC 换算，字符串时间按其时区解析"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        crawler = RSSCrawler({'feeds': [], 'fetch_full_content': False}, MagicMock())
+        expected = 1760954400  # 2025-10-20 10:00:00 UTC
+        
+        entry = {'published_parsed': time.strptime('2025-10-20 10:00:00', '%Y-%m-%d %H:%M:%S')}
+        assert crawler._extract_timestamp(entry) == expected
+        assert crawler._extract_timestamp({'published': '2025-10-20T18:00:00+08:00'}) == expected
+        # 缺少发布时间时依次回退到 updated / created
+        updated = {'updated_parsed': entry['published_parsed']}
+        assert crawler._extract_timestamp(updated) == expected
+        assert crawler._extract_timestamp({'created': 'Mon, 20 Oct 2025 10:00:00 GMT'}) == expected
+    
+    def test_extract_article_field_fallbacks(self):
+        """测试作者、摘要、标签与媒体字段的后备取值"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        crawler = RSSCrawler({'feeds': [], 'fetch_full_content': False}, MagicMock())
+        entry = {
+            'title': 'Fed holds rates',
+            'link': 'https://example.com/fed',
+            'summary': '',
+            'description': 'Policy unchanged',
+            'dc_creator': 'Jane Doe',
+            'tags': [{'term': 'macro'}, {'term': ''}],
+            'media_thumbnail': [{'url': 'https://example.com/t.jpg'}],
+        }
+        
+        data = crawler._extract_article_data(entry, 'Reuters - Business')
+        
+        assert data['summary'] == 'Policy unchanged'
+        assert data['author'] == 'Jane Doe'
+        assert data['guid'] == 'https://example.com/fed'
+        assert data['tags'] == ['macro']
+        assert (data['media_url'], data['media_type']) == ('https://example.com/t.jpg', 'image')
+        assert crawler._extract_article_data({'title': 'x'}, 'Reuters - Business')['author'] == 'Reuters'
+    
+    def test_detect_language(self):
+        """测试按中文字符占比判断语言"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        crawler = RSSCrawler({'feeds': [], 'fetch_full_content': False}, MagicMock())
+        
+        assert crawler._detect_language('美股三大指数收涨') == 'zh-CN'
+        assert crawler._detect_language('Apple 发布财报 earnings beat expectations') == 'zh'
+        assert crawler._detect_language('Stocks rallied') == 'en'
+        assert crawler._detect_language('') == 'unknown'
+    
+    def test_full_article_downloads_page_once(self):
+        """测试全文抓取只下载一次页面，由 newspaper3k 直接解析已下载的 HTML"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        crawler = RSSCrawler({'feeds': []}, MagicMock())
+        sentence = 'Stocks rallied on strong earnings from major technology companies. '
+        response = MagicMock(headers={'Content-Type': 'text/html; charset=utf-8'}, encoding='utf-8')
+        response.iter_content.return_value = [f'<html><body><article><p>{sentence * 5}</p></article></body></html>'.encode()]
+        
+        crawler.session = MagicMock()
+        crawler.session.get.return_value = response
+        
+        text = crawler._fetch_full_article('https://example.com/a')
+        
+        assert text.startswith('Stocks rallied')
+        crawler.session.get.assert_called_once()
+    
+    def test_full_article_decodes_without_header_charset(self):
+        """测试响应头未声明 charset 时按页面 <meta charset> 解码，不按 ISO-8859-1 产生乱码"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        crawler = RSSCrawler({'feeds': []}, MagicMock())
+        sentence = 'Le café de Paris a publié ses résultats trimestriels en hausse. '
+        html = f'<html><head><meta charset="utf-8"></head><body><article><p>{sentence * 5}</p></article></body></html>'
+        response = MagicMock(headers={'Content-Type': 'text/html'}, encoding='ISO-8859-1')
+        response.iter_content.return_value = [html.encode('utf-8')]
+        
+        crawler.session = MagicMock()
+        crawler.session.get.return_value = response
+        
+        text = crawler._fetch_full_article('https://example.com/a')
+        
+        assert 'café' in text and 'Ã' not in text
+        assert response.encoding == 'utf-8'
+    
+    def test_full_article_detects_charset_of_streamed_body(self):
+        """测试响应头与页面均未声明 charset 时，基于已读取的正文检测编码，不重复下载"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        crawler = RSSCrawler({'feeds': []}, MagicMock())
+        sentence = 'Le café de Paris a publié ses résultats trimestriels en hausse. '
+        html = f'<html><body><article><p>{sentence * 5}</p></article></body></html>'
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'text/html'
+        response.raw = io.BytesIO(html.encode('utf-8'))
+        
+        crawler.session = MagicMock()
+        crawler.session.get.return_value = response
+        
+        text = crawler._fetch_full_article('https://example.com/a')
+        
+        assert crawler.session.get.call_count == 1
+        assert response.encoding == 'utf-8'
+        assert 'café' in text and 'Ã' not in text
+    
+    def test_full_article_skips_non_html_and_oversized(self):
+        """测试根据响应头跳过 PDF 与过大的页面，不读取正文"""
+        from crawlers.rss_crawler import RSSCrawler
+        
+        crawler = RSSCrawler({'feeds': []}, MagicMock())
+        crawler.session = MagicMock()
+        
+        for headers in ({'Content-Type': 'application/pdf'},
+                        {'Content-Type': 'text/html', 'Content-Length': '5000000'}):
+            response = MagicMock(headers=headers)
+            crawler.session.get.return_value = response
+            
+            assert crawler._fetch_full_article('https://example.com/a') is None
+            response.close.assert_called_once()
+            response.iter_content.assert_not_called()
+    
+    def test_full_article_closes_and_caps_chunked_body(self):
+        """测试无 Content-Length 的分块响应读满上限即停止；出错或跳过时响应均被关闭"""
+        from crawlers.rss_crawler import RSSCrawler, MAX_ARTICLE_BYTES
+        
+        crawler = RSSCrawler({'feeds': []}, MagicMock())
+        crawler.session = MagicMock()
+        chunk = b'x' * (64 * 1024)
+        response = MagicMock(headers={'Content-Type': 'text/html'})
+        response.iter_content.return_value = iter([chunk] * (MAX_ARTICLE_BYTES // len(chunk) + 100))
+        crawler.session.get.return_value = response
+        
+        assert crawler._fetch_full_article('https://example.com/a') is None
+        response.close.assert_called_once()
+        
+        failed = MagicMock(headers={'Content-Type': 'text/html'})
+        failed.raise_for_status.side_effect = Exception('404')
+        crawler.session.get.side_effect = [failed, Exception('fallback')]
+        assert crawler._fetch_full_article('https://example.com/b') is None
+        failed.close.assert_called_once()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,239 @@
+"""
+智能导出器单元测试
+测试分批读取的原始数据逐行写入 JSONL 文件，写完才从 Redis 删除
+"""
+import gzip
+import pytest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+from utils.json_codec import extract_source
+from utils.smart_exporter import SmartExporter
+
+
+def _make_exporter(tmp_path, queue, **archive):
+    """构造导出器，read_oldest 按批从 queue 末尾（队尾）只读，trim_oldest 删除已读取的条数"""
+    redis_client = MagicMock()
+    redis_client.max_keep = 0
+    redis_client.queue_name = 'data_queue'
+    redis_client.get_queue_length.side_effect = lambda: len(queue)
+
+    def read_oldest(count, exported, batch_size):
+        oldest = queue[::-1][:count]
+        for i in range(0, len(oldest), batch_size):
+            batch = oldest[i:i + batch_size]
+            for raw in batch:
+                exported[extract_source(raw)] = exported.get(extract_source(raw), 0) + 1
+            yield batch
+
+    def trim_oldest(exported):
+        total = sum(exported.values())
+        del queue[len(queue) - total:]
+        return total
+
+    redis_client.read_oldest.side_effect = read_oldest
+    redis_client.trim_oldest.side_effect = trim_oldest
+    archive = {'compress': False, **archive}
+    return SmartExporter(redis_client, {'export_dir': str(tmp_path), 'archive': archive})
+
+
+class TestSmartExporter:
+    """SmartExporter 单元测试"""
+
+    def test_export_streams_jsonl(self, tmp_path):
+        """测试按批读取并逐行写入原始 JSON，写完后从队尾删除并扣减来源计数"""
+        queue = [f'{{"source": "rss", "id": {i}}}' for i in range(5)]
+        exporter = _make_exporter(tmp_path, queue)
+
+        stats = exporter.export(batch_size=2)
+
+        assert stats['error'] is None
+        assert stats['exported'] == 5
+        assert stats['export_file'].endswith('.jsonl')
+        with open(stats['export_file'], encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        assert lines == [f'{{"source": "rss", "id": {i}}}' for i in reversed(range(5))]
+        exporter.redis_client.read_oldest.assert_called_once()
+        assert exporter.redis_client.read_oldest.call_args[0][2] == 2
+        exporter.redis_client.trim_oldest.assert_called_once_with({'rss': 5})
+        assert queue == []
+
+    def test_export_gzip_jsonl(self, tmp_path):
+        """测试开启压缩时写入 .jsonl.gz，gzip 级别默认 1"""
+        exporter = _make_exporter(tmp_path, ['{"id": 1}'], compress=True)
+        assert exporter.gzip_level == 1
+
+        with patch('utils.smart_exporter.gzip.open', wraps=gzip.open) as mock_gzip_open:
+            stats = exporter.export()
+        assert mock_gzip_open.call_args[1]['compresslevel'] == 1
+
+        assert stats['export_file'].endswith('.jsonl.gz')
+        with gzip.open(stats['export_file'], 'rt', encoding='utf-8') as f:
+            assert f.read() == '{"id": 1}\n'
+
+    def test_export_failure_keeps_queue(self, tmp_path):
+        """测试写文件失败时不删除队列数据"""
+        queue = ['{"id": 1}', '{"id": 2}', '{"id": 3}']
+        exporter = _make_exporter(tmp_path, queue)
+
+        real_open = exporter._open_jsonl
+
+        def failing_open(*args):
+            f = real_open(*args)
+            f.write = MagicMock(side_effect=[None, OSError('disk full')])
+            return f
+
+        with patch.object(exporter, '_open_jsonl', side_effect=failing_open):
+            stats = exporter.export()
+
+        assert stats['error'] == 'disk full'
+        assert list(tmp_path.rglob('data_*')) == []  # 不留下残缺的归档或临时文件
+        assert queue == ['{"id": 1}', '{"id": 2}', '{"id": 3}']
+        exporter.redis_client.trim_oldest.assert_not_called()
+
+    def test_prefetch_failure_keeps_queue(self, tmp_path):
+        """测试后台预取时写入失败，取数线程退出，队列数据保持不变"""
+        items = [f'{{"id": {i}}}' for i in range(20)]
+        queue = list(items)
+        exporter = _make_exporter(tmp_path, queue)
+        real_open = exporter._open_jsonl
+
+        def failing_open(*args):
+            f = real_open(*args)
+            f.write = MagicMock(side_effect=OSError('disk full'))
+            return f
+
+        with patch.object(exporter, '_open_jsonl', side_effect=failing_open):
+            stats = exporter.export(batch_size=1)
+
+        assert stats['error'] == 'disk full'
+        assert queue == items
+        exporter.redis_client.trim_oldest.assert_not_called()
+
+    def test_prefetch_reraises_fetch_error(self):
+        """测试取数线程的异常在已取到的批次之后抛出"""
+        def batches():
+            yield ['a']
+            raise ConnectionError('redis down')
+
+        got = []
+        with pytest.raises(ConnectionError):
+            for batch in SmartExporter._prefetch(batches()):
+                got.append(batch)
+        assert got == [['a']]
+
+    def test_parquet_written_per_batch(self, tmp_path):
+        """测试 Parquet 每批直接交给 pyarrow 流式写入，不经 pandas"""
+        exporter = _make_exporter(tmp_path, ['{"id": 1}', '{"id": 2}', '{"id": 3}'], format='parquet')
+        written = []
+
+        def fake_write(filepath, batches, compression):
+            assert filepath.endswith('.parquet.part')
+            written.extend(list(batches))
+            open(filepath, 'wb').close()
+
+        with patch('utils.smart_exporter.pa', MagicMock()), \
+             patch('utils.smart_exporter.HAS_PARQUET', True), \
+             patch('utils.smart_exporter.write_parquet_stream', side_effect=fake_write):
+            stats = exporter.export(batch_size=2)
+
+        assert stats['export_file'].endswith('.parquet')
+        assert written == [['{"id": 3}', '{"id": 2}'], ['{"id": 1}']]
+
+    def test_parquet_failure_falls_back_to_jsonl_gz(self, tmp_path):
+        """测试 Parquet 写入失败时从头重新读取，原样写入 JSONL.GZ 后再删除"""
+        exporter = _make_exporter(tmp_path, ['{"id": 1}', '{"id": 2}', '{"id": 3}'], format='parquet')
+
+        def fake_write(filepath, batches, compression):
+            next(iter(batches))
+            raise ValueError('schema mismatch')
+
+        with patch('utils.smart_exporter.pa', MagicMock()), \
+             patch('utils.smart_exporter.HAS_PARQUET', True), \
+             patch('utils.smart_exporter.write_parquet_stream', side_effect=fake_write):
+            stats = exporter.export(batch_size=2)
+
+        assert stats['exported'] == 3
+        assert stats['export_file'].endswith('.jsonl.gz')
+        assert [p.name for p in tmp_path.rglob('data_*')] == [Path(stats['export_file']).name]
+        with gzip.open(stats['export_file'], 'rb') as f:
+            assert f.read() == b'{"id": 3}\n{"id": 2}\n{"id": 1}\n'
+        exporter.redis_client.trim_oldest.assert_called_once_with({'unknown': 3})
+
+    def test_default_format_and_compression(self, tmp_path):
+        """测试未配置格式时可写 Parquet 则默认 Parquet，压缩默认 zstd，显式配置优先"""
+        with patch('utils.smart_exporter.HAS_PARQUET', True):
+            exporter = _make_exporter(tmp_path, [])
+        assert (exporter.export_format, exporter.compression) == ('parquet', 'zstd')
+
+        with patch('utils.smart_exporter.HAS_PARQUET', False):
+            assert _make_exporter(tmp_path, []).export_format == 'json'
+
+        exporter = _make_exporter(tmp_path, [], format='json', compression='Snappy')
+        assert (exporter.export_format, exporter.compression) == ('json', 'snappy')
+
+    def test_should_export_caches_status(self, tmp_path):
+        """测试队列长度与内存一次 pipeline 读取，短时间内重复判断不再访问 Redis"""
+        exporter = _make_exporter(tmp_path, [])
+        exporter.last_export_time = datetime.now()
+        pipe = exporter.redis_client.client.pipeline.return_value
+        pipe.execute.return_value = [10, {'used_memory': 1024 * 1024}]
+
+        assert exporter.should_export() == (False, "无需导出")
+        exporter.should_export()
+
+        pipe.llen.assert_called_once_with('data_queue')
+        pipe.info.assert_called_once_with('memory')
+        pipe.execute.assert_called_once()
+
+        exporter._status_time -= 10
+        pipe.execute.return_value = [6000, {'used_memory': 0}]
+        assert exporter.should_export()[0] is True
+
+    def test_cleanup_and_stats_scan_once(self, tmp_path):
+        """测试过期归档按文件名日期删除（截止日当天也删除），统计只计 data_* 导出文件"""
+        cutoff = (datetime.now() - timedelta(days=30)).strftime('%Y%m%d')
+        kept = (datetime.now() - timedelta(days=29)).strftime('%Y%m%d')
+        for name in ['data_20000101_000000.jsonl.gz', f'data_{cutoff}_000000.parquet',
+                     f'data_{kept}_000000.parquet', 'data_29990102_000000.jsonl', 'data_latest.json',
+                     'data_29990103_000000.jsonl.part', 'notes.json']:
+            (tmp_path / name).write_bytes(b'x' * 10)
+        exporter = _make_exporter(tmp_path, [], retention_days=30)
+
+        exporter._cleanup_old_archives()
+        stats = exporter.get_export_stats()
+
+        assert not (tmp_path / 'data_20000101_000000.jsonl.gz').exists()
+        assert not (tmp_path / f'data_{cutoff}_000000.parquet').exists()
+        assert stats['total_files'] == 3
+        assert stats['files_by_format'] == {'.parquet': 1, '.jsonl': 1, '.json': 1}
+
+    @patch('utils.smart_exporter.CLEANUP_PARALLEL_MIN', 2)
+    def test_cleanup_parallel_delete(self, tmp_path):
+        """测试过期文件较多时并行删除，合计删除数量与释放空间"""
+        for i in range(5):
+            (tmp_path / f'data_20000101_00000{i}.jsonl.gz').write_bytes(b'x' * 100)
+        exporter = _make_exporter(tmp_path, [])
+
+        with patch('utils.smart_exporter.logger') as mock_logger:
+            exporter._cleanup_old_archives()
+
+        assert list(tmp_path.glob('data_*')) == []
+        assert '删除 5 个过期归档' in mock_logger.info.call_args[0][0]
+
+    def test_stats_parquet_rows_from_footer(self, tmp_path):
+        """测试 Parquet 行数从 footer 元数据读取，JSONL 不解压"""
+        (tmp_path / 'data_20250101_000000.parquet').write_bytes(b'x')
+        (tmp_path / 'data_20250101_000001.jsonl.gz').write_bytes(b'x')
+        exporter = _make_exporter(tmp_path, [])
+
+        with patch('utils.smart_exporter.pq') as mock_pq:
+            mock_pq.ParquetFile.return_value.metadata.num_rows = 42
+            stats = exporter.get_export_stats()
+
+        assert stats['parquet_rows'] == 42
+        mock_pq.ParquetFile.assert_called_once_with(str(tmp_path / 'data_20250101_000000.parquet'))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,163 @@
+"""
+StockTwits 爬虫单元测试
+测试消息提取与批量写入（不访问真实 API）
+"""
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from crawlers.stocktwits_crawler import StockTwitsCrawler, _parse_created_at
+
+
+def _make_crawler(**overrides):
+    """构造一个启用状态的爬虫实例"""
+    config = {
+        'enabled': True,
+        'watch_symbols': ['AAPL', 'TSLA'],
+        'messages_per_symbol': 30,
+    }
+    config.update(overrides)
+    redis_client = MagicMock()
+    redis_client.seen_many.side_effect = lambda members, namespace: [False] * len(members)
+    return StockTwitsCrawler(config, redis_client)
+
+
+def _message(message_id, **overrides):
+    """构造一条 StockTwits 消息"""
+    message = {
+        'id': message_id,
+        'body': f'$AAPL message {message_id}',
+        'created_at': '2025-10-20T08:30:00Z',
+        'user': {'username': 'trader', 'id': 7, 'followers': 10},
+        'entities': {
+            'sentiment': {'basic': 'Bullish'},
+            'symbols': [{'symbol': 'AAPL'}],
+        },
+        'likes': {'total': 3},
+    }
+    message.update(overrides)
+    return message
+
+
+class TestStockTwitsCrawler:
+    """StockTwitsCrawler 单元测试"""
+
+    def test_crawl_pushes_each_symbol_in_one_batch(self):
+        """测试每个股票的消息整理后一次批量写入"""
+        crawler = _make_crawler()
+        crawler.redis_client.push_batch.side_effect = lambda batch: len(batch)
+        streams = {'AAPL': [_message(1), _message(2)], 'TSLA': [_message(3)]}
+
+        with patch.object(crawler, '_fetch_symbol_stream', side_effect=lambda s: streams[s]):
+            stats = crawler.crawl()
+
+        assert stats == {'messages': 3, 'errors': 0}
+        assert crawler.redis_client.push_batch.call_count == 2
+        crawler.redis_client.push_data.assert_not_called()
+
+    def test_crawl_symbols_concurrently_counts_errors(self):
+        """测试股票并发抓取，单个股票出错只计 1 个错误"""
+        crawler = _make_crawler(watch_symbols=['AAPL', 'TSLA', 'NVDA'])
+        crawler.redis_client.push_batch.side_effect = lambda batch: len(batch)
+
+        def fake_fetch(symbol):
+            if symbol == 'TSLA':
+                raise RuntimeError('boom')
+            return [_message(symbol)]
+
+        with patch.object(crawler, '_fetch_symbol_stream', side_effect=fake_fetch), \
+             patch.object(crawler.bucket, 'acquire') as mock_acquire:
+            stats = crawler.crawl()
+
+        assert stats == {'messages': 2, 'errors': 1}
+        assert mock_acquire.call_count == 3
+
+    def test_crawl_skips_seen_messages(self):
+        """测试已写入过的消息在提取前被丢弃"""
+        crawler = _make_crawler(watch_symbols=['AAPL'])
+        crawler.redis_client.seen_many.side_effect = None
+        crawler.redis_client.seen_many.return_value = [True, False]
+        crawler.redis_client.push_batch.side_effect = lambda batch: len(batch)
+
+        with patch.object(crawler, '_fetch_symbol_stream', return_value=[_message(1), _message(2)]):
+            stats = crawler.crawl()
+
+        assert stats == {'messages': 1, 'errors': 0}
+        crawler.redis_client.seen_many.assert_called_once_with(['1', '2'], namespace='stocktwits')
+        assert crawler.redis_client.push_batch.call_args[0][0][0]['message_id'] == 2
+
+    def test_fetch_uses_shared_session(self):
+        """测试通过共享 Session 请求消息流，并按股票设置 Referer"""
+        crawler = _make_crawler()
+        crawler.session = MagicMock()
+        crawler.session.get.return_value.content = b'{"messages": [{"id": 1}]}'
+        crawler.session.get.return_value.headers = {}
+
+        messages = crawler._fetch_symbol_stream('AAPL')
+
+        assert len(messages) == 1
+        kwargs = crawler.session.get.call_args[1]
+        assert kwargs['headers']['Referer'] == 'https://stocktwits.com/symbol/AAPL'
+        assert kwargs['params'] == {'limit': 30}
+        assert crawler.session.get.call_args[0][0] == 'https://api.stocktwits.com/api/2/streams/symbol/AAPL.json'
+
+    def test_adapt_to_rate_limit_headers(self):
+        """测试剩余额度过低时暂停令牌桶，额度充足或无限速头时不暂停"""
+        crawler = _make_crawler()
+        reset = int(time.time()) + 120
+
+        with patch.object(crawler.bucket, 'pause') as mock_pause:
+            crawler._adapt_to_rate_limit({'X-RateLimit-Remaining': '150', 'X-RateLimit-Reset': str(reset)})
+            crawler._adapt_to_rate_limit({})
+            mock_pause.assert_not_called()
+
+            crawler._adapt_to_rate_limit({'X-RateLimit-Remaining': '2', 'X-RateLimit-Reset': str(reset)})
+            mock_pause.assert_called_once()
+            assert 115 <= mock_pause.call_args[0][0] <= 122
+
+    def test_extract_message_data(self):
+        """测试提取情感、互动与股票列表字段"""
+        crawler = _make_crawler()
+
+        data = crawler._extract_message_data(_message(42), 'AAPL')
+
+        assert data['sentiment'] == 'Bullish'
+        assert data['symbols'] == ['AAPL']
+        assert data['likes'] == 3
+        assert data['url'] == 'https://stocktwits.com/trader/message/42'
+
+    def test_lite_extract_when_full_fields_disabled(self):
+        """测试关闭 full_fields 时只写入核心字段"""
+        crawler = _make_crawler(watch_symbols=['AAPL'], full_fields=False)
+        crawler.redis_client.push_batch.side_effect = lambda batch: len(batch)
+
+        with patch.object(crawler, '_fetch_symbol_stream', return_value=[_message(5)]):
+            crawler.crawl()
+
+        data = crawler.redis_client.push_batch.call_args[0][0][0]
+        assert set(data) == {'text', 'source', 'timestamp', 'symbol', 'sentiment', 'likes', 'message_id'}
+        assert (data['sentiment'], data['likes'], data['timestamp']) == ('Bullish', 3, 1760949000)
+
+    def test_parse_created_at(self):
+        """测试 ISO-8601 快速解析，非标准格式回退 dateutil，无法解析返回 None"""
+        expected = 1760949000  # 2025-10-20 08:30:00 UTC
+        assert _parse_created_at('2025-10-20T08:30:00Z') == expected
+        assert _parse_created_at('Mon, 20 Oct 2025 08:30:00 GMT') == expected
+        assert _parse_created_at('') is None
+        assert _parse_created_at(None) is None
+
+    def test_extract_message_data_with_null_entities(self):
+        """测试嵌套对象为 null 时使用空值，不导致整条消息丢弃"""
+        crawler = _make_crawler()
+
+        data = crawler._extract_message_data(
+            _message(7, entities=None, likes=None, conversation=None), 'AAPL'
+        )
+
+        assert data is not None
+        assert data['sentiment'] is None
+        assert (data['symbols'], data['hashtags'], data['links']) == ([], [], [])
+        assert (data['likes'], data['replies']) == (0, 0)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,109 @@
+"""
+Twitter 爬虫单元测试
+测试关键词并发抓取与 snscrape / twint 回退（不访问真实网络）
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+from crawlers.twitter_crawler import TwitterCrawler, _load_snscrape
+
+
+def _make_crawler(**overrides):
+    """构造一个启用状态、snscrape 与 twint 均可用的爬虫实例"""
+    config = {
+        'enabled': False,
+        'keywords': ['$AAPL', '$TSLA', '$NVDA'],
+        'max_tweets': 10,
+    }
+    config.update(overrides)
+    redis_client = MagicMock()
+    redis_client.seen_many.side_effect = lambda members, namespace: [False] * len(members)
+    crawler = TwitterCrawler(config, redis_client)
+    # 真实依赖未安装，直接标记为可用
+    crawler.enabled = True
+    crawler.has_snscrape = True
+    crawler.has_twint = True
+    return crawler
+
+
+class TestTwitterCrawler:
+    """TwitterCrawler 单元测试"""
+
+    def test_crawl_keywords_concurrently_with_fallback(self):
+        """测试关键词并发抓取，snscrape 失败时回退 twint，两者都失败计 1 个错误"""
+        crawler = _make_crawler()
+
+        def fake_snscrape(keyword):
+            if keyword == '$AAPL':
+                return 5
+            raise RuntimeError('blocked')
+
+        def fake_twint(keyword):
+            if keyword == '$TSLA':
+                return 3
+            raise RuntimeError('blocked')
+
+        with patch.object(crawler, '_crawl_keyword_with_snscrape', side_effect=fake_snscrape), \
+             patch.object(crawler, '_crawl_keyword_with_twint', side_effect=fake_twint) as mock_twint:
+            stats = crawler.crawl()
+
+        assert stats == {'tweets': 8, 'errors': 1}
+        assert mock_twint.call_count == 2
+
+    def test_snscrape_does_not_sleep_per_tweet(self):
+        """测试 snscrape 抓取不再逐条 sleep，且只取 max_tweets 条"""
+        crawler = _make_crawler(max_tweets=3)
+        crawler.sntwitter = MagicMock()
+        crawler.sntwitter.TwitterSearchScraper.return_value.get_items.return_value = iter(range(10))
+        crawler.redis_client.push_batch.side_effect = lambda batch: len(batch)
+
+        with patch.object(crawler, '_extract_tweet_data_snscrape', side_effect=lambda t, k: {'id': t}), \
+             patch('crawlers.twitter_crawler.time.sleep') as mock_sleep:
+            count = crawler._crawl_keyword_with_snscrape('$AAPL')
+
+        assert count == 3
+        mock_sleep.assert_not_called()
+
+    def test_drop_seen_tweets(self):
+        """测试按推文 ID 去重，没有 ID 的推文保留"""
+        from types import SimpleNamespace
+
+        crawler = _make_crawler()
+        crawler.redis_client.seen_many.side_effect = None
+        crawler.redis_client.seen_many.return_value = [True, False]
+        tweets = [SimpleNamespace(id=1), SimpleNamespace(id=2), SimpleNamespace()]
+
+        kept = crawler._drop_seen(tweets)
+
+        assert kept == tweets[1:]
+        crawler.redis_client.seen_many.assert_called_once_with(['1', '2'], namespace='twitter')
+
+    def test_extract_snscrape_tweet_fields(self):
+        """测试 snscrape 推文按字段表提取，缺失属性使用默认值"""
+        from datetime import datetime, timezone
+        from types import SimpleNamespace
+
+        crawler = _make_crawler()
+        tweet = SimpleNamespace(
+            rawContent='$AAPL to the moon', date=datetime(2025, 10, 20, tzinfo=timezone.utc),
+            url='https://x.com/a/status/1', user=SimpleNamespace(username='alice', id=9),
+            likeCount=4, hashtags=['AAPL'], mentionedUsers=None, retweetedTweet=None,
+        )
+
+        data = crawler._extract_tweet_data_snscrape(tweet, '$AAPL')
+
+        assert (data['text'], data['user'], data['user_id']) == ('$AAPL to the moon', 'alice', 9)
+        assert (data['likes'], data['retweets'], data['language']) == (4, 0, 'en')
+        assert (data['hashtags'], data['mentions'], data['is_retweet']) == (['AAPL'], [], False)
+        assert data['timestamp'] == 1760918400
+
+    def test_optional_imports_probed_once(self):
+        """测试多次创建爬虫时可选依赖只导入一次"""
+        _load_snscrape.cache_clear()
+        for _ in range(3):
+            TwitterCrawler({'enabled': True, 'keywords': []}, MagicMock())
+        info = _load_snscrape.cache_info()
+        assert (info.misses, info.hits) == (1, 2)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
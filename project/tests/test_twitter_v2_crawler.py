@@ -0,0 +1,168 @@
+"""
+Twitter API v2 爬虫单元测试
+测试单次限额分配与关键词并发搜索（不访问真实 API）
+"""
+import pytest
+import time
+from datetime import date
+from unittest.mock import MagicMock, patch
+from crawlers.twitter_v2_crawler import TwitterV2Crawler
+
+
+def _make_crawler(**overrides):
+    """构造一个启用状态的爬虫实例（跳过 Bearer Token 在线校验）"""
+    config = {
+        'enabled': True,
+        'bearer_token': 'test-token',
+        'keywords': ['$AAPL', '$TSLA', '$NVDA'],
+        'tweets_per_keyword': 2,
+        'rate_limits': {'max_posts_per_run': 5, 'max_posts_per_month': 100},
+    }
+    config.update(overrides)
+    with patch.object(TwitterV2Crawler, '_test_bearer_token', return_value=True):
+        return TwitterV2Crawler(config, MagicMock())
+
+
+class TestTwitterV2Crawler:
+    """TwitterV2Crawler 单元测试"""
+
+    def test_plan_keywords_splits_run_limit(self):
+        """测试单次限额按关键词顺序分配，用完后不再抓取"""
+        crawler = _make_crawler(keywords=['$AAPL', '$TSLA', '$NVDA', '$MSFT'])
+
+        assert crawler._plan_keywords() == [('$AAPL', 2), ('$TSLA', 2), ('$NVDA', 1)]
+
+    def test_crawl_keywords_concurrently(self):
+        """测试关键词并发搜索并批量写入，单个关键词出错只计 1 个错误"""
+        crawler = _make_crawler(combine_keywords=False)
+        crawler.redis_client.push_batch.side_effect = lambda batch: len(batch)
+
+        def fake_search(keyword, max_results):
+            if keyword == '$TSLA':
+                raise RuntimeError('boom')
+            return [{'id': f'{keyword}{i}', 'text': 't'} for i in range(max_results)]
+
+        with patch.object(crawler, '_check_monthly_quota', return_value=True), \
+             patch.object(crawler, '_update_quota') as mock_update, \
+             patch.object(crawler, '_search_tweets', side_effect=fake_search), \
+             patch.object(crawler.bucket, 'acquire') as mock_acquire, \
+             patch('crawlers.twitter_v2_crawler.time.sleep') as mock_sleep:
+            stats = crawler.crawl()
+
+        assert stats == {'tweets': 3, 'errors': 1}
+        assert mock_acquire.call_count == 3
+        mock_update.assert_called_once_with(3)
+        mock_sleep.assert_not_called()
+        crawler.redis_client.push_data.assert_not_called()
+
+    def test_combined_or_query(self):
+        """测试关键词合并为一次 OR 查询，结果按正文归到匹配的关键词"""
+        crawler = _make_crawler(keywords=['$AAPL', 'Federal Reserve', '$NVDA'])
+        crawler.redis_client.push_batch.side_effect = lambda batch: len(batch)
+        tweets = [{'id': '1', 'text': 'federal reserve holds rates'},
+                  {'id': '2', 'text': '$NVDA earnings'},
+                  {'id': '3', 'text': 'no match'}]
+
+        with patch.object(crawler, '_search_tweets', return_value=tweets) as mock_search, \
+             patch.object(crawler.bucket, 'acquire'):
+            count, failed = crawler._crawl_query(*crawler._group_queries(crawler._plan_keywords())[0])
+
+        assert (count, failed) == (3, False)
+        mock_search.assert_called_once_with('($AAPL OR (Federal Reserve) OR $NVDA)', max_results=5)
+        batch = crawler.redis_client.push_batch.call_args[0][0]
+        assert [d['keyword'] for d in batch] == ['Federal Reserve', '$NVDA', '$AAPL']
+
+    def test_group_queries_respects_limits(self):
+        """测试合并查询不超过单次 10 条与查询长度上限"""
+        crawler = _make_crawler()
+        plan = [('$AAPL', 6), ('$TSLA', 4), ('$NVDA', 2), ('x' * 470, 1)]
+
+        assert crawler._group_queries(plan) == [
+            (['$AAPL', '$TSLA'], 10), (['$NVDA'], 2), (['x' * 470], 1),
+        ]
+
+    def test_session_carries_auth_headers(self):
+        """测试认证请求头设置在共享 Session 上，请求不再单独传 headers"""
+        crawler = _make_crawler()
+        assert crawler.session.headers['Authorization'] == 'Bearer test-token'
+
+        crawler.session = MagicMock()
+        crawler.session.get.return_value = MagicMock(status_code=200, content=b'{"data": []}')
+        crawler._search_tweets('$AAPL', max_results=1)
+        assert 'headers' not in crawler.session.get.call_args[1]
+
+    def test_extract_tweet_data_with_null_objects(self):
+        """测试嵌套对象为 null 时使用空值，不导致整条推文丢弃"""
+        crawler = _make_crawler()
+        tweet = {'id': '42', 'text': 'hi', 'created_at': '2025-10-20T08:30:00.000Z',
+                 'public_metrics': None, 'author': None, 'entities': None}
+
+        data = crawler._extract_tweet_data(tweet, '$AAPL')
+
+        assert data['timestamp'] == 1760949000
+        assert data['url'] == 'https://twitter.com/i/web/status/42'
+        assert (data['author'], data['like_count'], data['entities']) == ('unknown', 0, {})
+
+    def test_rate_limited_search_pauses_shared_bucket(self):
+        """测试 429 时暂停共享令牌桶到窗口重置再重试一次，不在线程内直接 sleep"""
+        crawler = _make_crawler()
+        limited = MagicMock(status_code=429, headers={'x-rate-limit-reset': str(int(time.time()) + 60)})
+        ok = MagicMock(status_code=200, content=b'{"data": [{"id": "1", "text": "hi"}]}')
+        crawler.session = MagicMock()
+        crawler.session.get.side_effect = [limited, ok]
+
+        with patch.object(crawler.bucket, 'pause') as mock_pause, \
+             patch.object(crawler.bucket, 'acquire') as mock_acquire, \
+             patch('crawlers.twitter_v2_crawler.time.sleep') as mock_sleep:
+            tweets = crawler._search_tweets('$AAPL', max_results=1)
+
+        assert [t['id'] for t in tweets] == ['1']
+        assert 60 <= mock_pause.call_args[0][0] <= 66
+        mock_acquire.assert_called_once()
+        mock_sleep.assert_not_called()
+
+    def test_bearer_token_check_cached(self):
+        """测试 Token 校验结果缓存命中时不发请求，未命中时校验并缓存确定结果"""
+        crawler = _make_crawler()
+        crawler.session = MagicMock()
+        client = crawler.redis_client.client
+
+        client.get.return_value = '1'
+        assert crawler._bearer_token_valid() is True
+        client.get.return_value = '0'
+        assert crawler._bearer_token_valid() is False
+        crawler.session.get.assert_not_called()
+
+        client.get.return_value = None
+        crawler.session.get.return_value.status_code = 401
+        assert crawler._bearer_token_valid() is False
+        key, value = client.set.call_args[0]
+        assert key.startswith('twitter:token_valid:') and 'test-token' not in key
+        assert value == '0'
+
+        client.set.reset_mock()
+        crawler.session.get.return_value.status_code = 429
+        assert crawler._bearer_token_valid() is True
+        client.set.assert_not_called()
+
+    def test_monthly_quota_kept_in_redis(self):
+        """测试月度配额按月份键在 Redis 中检查与累加，不再改写 config.yaml"""
+        crawler = _make_crawler()
+        key = f"twitter:quota:{date.today():%Y-%m}"
+        crawler.redis_client.check_quota.return_value = (True, 97)
+        pipe = crawler.redis_client.client.pipeline.return_value
+        pipe.execute.return_value = [6, True]
+
+        with patch('builtins.open') as mock_open:
+            assert crawler._check_monthly_quota() is True
+            crawler._update_quota(3)
+            crawler._update_quota(0)
+
+        crawler.redis_client.check_quota.assert_called_once_with(key, 100)
+        pipe.incrby.assert_called_once_with(key, 3)
+        pipe.expire.assert_called_once()
+        mock_open.assert_not_called()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
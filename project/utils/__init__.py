@@ -2,6 +2,7 @@
 工具模块初始化文件
 """
 from utils.logger import setup_logger
-from utils.redis_client import RedisClient
+from utils.redis_client import RedisClient, create_pool
+from utils.http_client import get_session, close_session
 
-__all__ = ['setup_logger', 'RedisClient']
+__all__ = ['setup_logger', 'RedisClient', 'create_pool', 'get_session', 'close_session']
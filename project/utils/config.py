@@ -0,0 +1,52 @@
+"""
+配置读取模块
+config.yaml 在进程内按文件修改时间缓存解析结果，供控制中心、日志与导出等模块共用
+"""
+import os
+from functools import lru_cache
+from typing import Any, Dict
+
+import yaml
+
+# 优先使用 libyaml 的 C 加载器（解析快数倍），未编译 libyaml 时回退纯 Python 实现
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def load_config(path: str = 'config.yaml') -> Dict[str, Any]:
+    """
+    读取并缓存 YAML 配置
+
+    按 (路径, 修改时间, 大小) 缓存：文件未变化时直接返回上次的解析结果，
+    --loop 模式下修改配置文件后下一次读取即生效。
+    返回的字典为共享对象，调用方只读不改
+
+    Args:
+        path: 配置文件路径
+
+    Returns:
+        dict: 解析后的配置（空文件为空字典）
+
+    Raises:
+        OSError: 文件不存在或无法读取
+        yaml.YAMLError: 解析失败
+    """
+    st = os.stat(path)
+    return _parse_config(path, st.st_mtime_ns, st.st_size)
+
+
+def read_config(path: str = 'config.yaml') -> Dict[str, Any]:
+    """同 load_config，文件不存在或解析失败返回空字典"""
+    try:
+        return load_config(path)
+    except Exception:
+        return {}
+
+
+@lru_cache(maxsize=4)
+def _parse_config(path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    """解析配置文件（mtime_ns/size 只作缓存键；解析失败不缓存）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=_YAML_LOADER) or {}
+
+
+load_config.cache_clear = read_config.cache_clear = _parse_config.cache_clear
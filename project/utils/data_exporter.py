@@ -4,8 +4,11 @@
 """
 import json
 import os
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from utils.config import read_config
+from utils.json_codec import extract_source, loads
 from utils.logger import setup_logger
 from utils.redis_client import RedisClient
 
@@ -14,13 +17,119 @@ try:
 except Exception:
     pd = None
 
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except Exception:
+    pa = pq = None
+
 logger = setup_logger('data_exporter')
 
+PARQUET_ROW_GROUP = 65536  # 每个 row group 的行数（读取时按组并行/跳过）
+WRITE_BUFFER = 1 << 20  # 导出文件写缓冲（逐条写入的小字符串攒满 1MB 才落盘）
+
+
+def _fsync(path: str, directory: bool = False):
+    """将文件（或目录项）刷到磁盘；目录 fsync 在 Windows 上不支持，忽略即可"""
+    try:
+        fd = os.open(path, os.O_RDONLY if directory else os.O_RDWR)
+    except OSError:
+        if directory:
+            return
+        raise
+    try:
+        os.fsync(fd)
+    except OSError:
+        if not directory:
+            raise
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _atomic_file(filepath: str):
+    """
+    先写到 filepath + '.part'，成功后 fsync 一次再原子改名为 filepath
+
+    下游只会看到完整的导出文件；写入失败时删除临时文件
+    """
+    tmp = filepath + '.part'
+    try:
+        yield tmp
+        _fsync(tmp)
+        os.replace(tmp, filepath)
+        _fsync(os.path.dirname(filepath) or '.', directory=True)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_parquet_stream(filepath: str, batches: Iterable[List[str]], compression: str = 'zstd'):
+    """
+    按 row group 流式写出 Parquet（pyarrow ParquetWriter）
+
+    各来源字段不同：第一组记录的字段并集决定列，之后出现的新字段以 JSON 写入 _extra 列；
+    类型与首组不兼容时抛出异常，由调用方回退 JSON。需要 pyarrow
+
+    Args:
+        filepath: 文件路径
+        batches: 原始 JSON 字符串批次（边取边写，内存只占一个 row group）
+        compression: 压缩算法（zstd/snappy/gzip/none）
+    """
+    writer = None
+    rows: List[Dict[str, Any]] = []
+    try:
+        for batch in batches:
+            rows.extend(loads(item) for item in batch)
+            if len(rows) >= PARQUET_ROW_GROUP:
+                writer = _write_row_group(filepath, writer, rows, compression)
+                rows = []
+        if rows or writer is None:
+            writer = _write_row_group(filepath, writer, rows, compression)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_row_group(filepath: str, writer, rows: List[Dict[str, Any]], compression: str):
+    """
+    写出一个 row group，首次调用时按这组记录确定 schema 并打开 ParquetWriter
+
+    组内按 source 稳定排序（同一来源内仍按时间顺序）：source 列字典编码后成为长游程，
+    压缩更好，页级 min/max 统计也更窄，按来源过滤的读取可跳过更多数据页
+    """
+    rows.sort(key=lambda row: str(row.get('source') or ''))
+    if writer is None:
+        names = list(dict.fromkeys(k for row in rows for k in row if k != '_extra'))
+        schema = pa.Table.from_pydict({n: [row.get(n) for row in rows] for n in names}).schema
+        # 首组全为 null 的列按字符串列处理，避免后续有值时无法写入
+        schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in schema]
+                           + [pa.field('_extra', pa.string())])
+        writer = pq.ParquetWriter(
+            filepath, schema,
+            compression=compression,
+            compression_level=3 if compression == 'zstd' else None,
+            use_dictionary=True,  # source/keyword 等低基数字符串列字典编码
+        )
+    names = set(writer.schema.names)
+    columns = {n: [row.get(n) for row in rows] for n in writer.schema.names}
+    columns['_extra'] = [
+        json.dumps({k: v for k, v in row.items() if k not in names}, ensure_ascii=False)
+        if row.keys() - names else None
+        for row in rows
+    ]
+    writer.write_table(pa.Table.from_pydict(columns, schema=writer.schema))
+    return writer
+
 
 class DataExporter:
     """数据导出器"""
     
-    def __init__(self, redis_client: RedisClient, export_dir: str = 'data_exports', format: Optional[str] = None):
+    def __init__(self, redis_client: RedisClient, export_dir: str = 'data_exports', format: Optional[str] = None,
+                 compression: Optional[str] = None):
         """
         初始化数据导出器
         
@@ -28,12 +137,15 @@ class DataExporter:
             redis_client: Redis 客户端实例
             export_dir: 导出目录
             format: 导出格式（'json' 或 'parquet'），默认自动从 config.yaml 读取 data_management.archive.format
+            compression: Parquet 压缩算法（zstd/snappy/gzip/none），默认读取 data_management.archive.compression，未配置为 zstd
         """
         self.redis_client = redis_client
         self.export_dir = export_dir
-        self.format = (format or self._load_export_format()).lower()
+        archive = self._load_archive_config() if format is None or compression is None else {}
+        self.format = str(format or archive.get('format') or 'json').lower()
         if self.format not in ('json', 'parquet'):
             self.format = 'json'
+        self.compression = str(compression or archive.get('compression') or 'zstd').lower()
         
         # 确保导出目录存在
         if not os.path.exists(export_dir):
@@ -74,20 +186,10 @@ class DataExporter:
             to_export = queue_length - max_keep
             logger.info(f"需要导出 {to_export} 条数据")
             
-            # 导出数据
-            export_file = self._export_data(to_export, batch_size=batch_size)
+            # 从队尾读取最旧的数据并导出，文件发布后再删除并扣减来源计数（无需重建计数）
+            export_file, exported = self._export_data(to_export, batch_size=batch_size)
             stats['export_file'] = export_file
-            stats['exported'] = to_export
-            
-            # 修剪队列（从右侧移除旧数据）
-            self._trim_queue(max_keep)
-
-            # 修剪后重建来源计数（与配额配合）
-            try:
-                scanned, counts = self.redis_client.rebuild_source_counts(max_scan=max_keep)
-                logger.info(f"来源计数已重建：扫描{scanned}条，示例={list(counts.items())[:3]}")
-            except Exception:
-                pass
+            stats['exported'] = exported
             
             # 获取修剪后的队列长度
             stats['queue_length_after'] = self.redis_client.get_queue_length()
@@ -100,141 +202,165 @@ class DataExporter:
         
         return stats
     
-    def _export_data(self, count: int, batch_size: int = 1000) -> str:
+    def _export_data(self, count: int, batch_size: int = 1000) -> Tuple[str, int]:
         """
         导出指定数量的数据到 JSON/Parquet 文件（最旧的 count 条）
         
+        从队尾（最旧）分批 LRANGE 读取并写出，文件 fsync 并改名发布后才 LTRIM 删除这部分数据，
+        期间新写入的数据在队头，不会被误删；写文件失败或进程中途退出时数据仍留在队列中
+        
         Args:
             count: 导出数量
         
         Returns:
-            str: 导出文件路径
+            tuple: (导出文件路径, 导出条数)
         """
         # 生成文件名
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        ext = 'parquet' if self.format == 'parquet' and pd is not None else 'json'
+        ext = 'parquet' if self.format == 'parquet' and (pa is not None or pd is not None) else 'json'
         filename = f"data_export_{timestamp}.{ext}"
         filepath = os.path.join(self.export_dir, filename)
 
-        # 从 Redis 读取最旧的 count 条：索引从尾部开始的是旧数据，但更稳妥的方式是从头取最新，导出旧数据需计算切片
-        # 当前队列头（index=0）是最新，尾部（index=-1）是最旧。我们想导出最旧 count 条，即区间 [max_keep, end]
-        client = self.redis_client.client
-        queue_name = self.redis_client.queue_name
-        length = self.redis_client.get_queue_length()
-        start = max(0, length - count)
-        end = length - 1
-
-        data_list = []
-        for i in range(start, end + 1, batch_size):
-            r = min(end, i + batch_size - 1)
-            batch = client.lrange(queue_name, i, r)
-            data_list.extend([json.loads(item) for item in batch])
-
-        # 写入文件（JSON 或 Parquet）
-        if ext == 'json' or pd is None:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'export_time': datetime.now().isoformat(),
-                    'count': len(data_list),
-                    'data': data_list
-                }, f, ensure_ascii=False, indent=2)
+        exported: Dict[str, int] = {}  # 已写出的各来源条数（文件发布后据此删除）
+        if ext == 'json':
+            # 队列中的数据本身就是 JSON：边读取边原样写入，无需解析与重新序列化
+            self._write_json_stream(filepath, self.redis_client.read_oldest(count, exported, batch_size))
         else:
-            # Parquet 依赖 pandas + pyarrow
-            try:
-                df = pd.DataFrame(data_list)
-                df.to_parquet(filepath, index=False)
-            except Exception as e:
-                logger.error(f"Parquet 导出失败，回退 JSON: {e}")
-                # 回退到 JSON
-                json_path = filepath.replace('.parquet', '.json')
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump({
-                        'export_time': datetime.now().isoformat(),
-                        'count': len(data_list),
-                        'data': data_list
-                    }, f, ensure_ascii=False, indent=2)
-                filepath = json_path
-
-        logger.info(f"已导出 {len(data_list)} 条数据到 {filepath}")
-        return filepath
-    
-    def _trim_queue(self, max_keep: int):
+            filepath = self._write_parquet(filepath, count, batch_size, exported)
+
+        # 文件已完整落盘，再从队尾删除已导出的数据
+        exported_count = self.redis_client.trim_oldest(exported)
+
+        logger.info(f"已导出 {exported_count} 条数据到 {filepath}")
+        return filepath, exported_count
+
+    def _write_json_stream(self, filepath: str, batches: Iterable[List[str]]):
         """
-        修剪队列，只保留最新的数据
-        
+        流式写出 JSON 导出文件：原始 JSON 字符串逐条写入 data 数组，内存中不构造完整文档
+
         Args:
-            max_keep: 保留的最大数据条数
+            filepath: 文件路径
+            batches: 原始 JSON 字符串批次
         """
-        client = self.redis_client.client
-        queue_name = self.redis_client.queue_name
-        # LTRIM 保留最新的 max_keep 条数据（头部是最新）
-        client.ltrim(queue_name, 0, max_keep - 1)
-        logger.info(f"队列已修剪，保留最新 {max_keep} 条数据")
-    
-    def export_by_source(self, max_per_source: int = 5000) -> Dict[str, Any]:
+        with _atomic_file(filepath) as tmp, open(tmp, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
+            f.write('{"export_time": %s, "data": [' % json.dumps(datetime.now().isoformat()))
+            sep = '\n'
+            written = 0
+            for batch in batches:
+                for raw in batch:
+                    f.write(sep)
+                    f.write(raw)
+                    sep = ',\n'
+                written += len(batch)
+            # count 在数据之后写出（此时才知道条数），JSON 对象的键顺序不影响读取
+            f.write('\n], "count": %d}\n' % written)
+
+    def _write_parquet(self, filepath: str, count: int, batch_size: int, exported: Dict[str, int]) -> str:
+        """
+        写入 Parquet，失败时回退 JSON，返回实际文件路径
+
+        有 pyarrow 时用 ParquetWriter 每攒满一个 row group 就写出，内存中只有一组解析后的记录；
+        只有 pandas 时整体建表
+
+        Args:
+            filepath: 文件路径
+            count: 导出数量
+            batch_size: 每批读取条数
+            exported: 已写出的各来源条数（就地累加）
+        """
+        try:
+            with _atomic_file(filepath) as tmp:
+                batches = self.redis_client.read_oldest(count, exported, batch_size)
+                if pa is not None:
+                    write_parquet_stream(tmp, batches, self.compression)
+                else:
+                    # pandas 需整体建表
+                    pd.DataFrame([loads(item) for batch in batches for item in batch]).to_parquet(
+                        tmp, index=False, compression=self.compression)
+        except Exception as e:
+            # 写了一半的临时文件已删除；数据尚未从队列删除，从头重新读取写入 JSON
+            logger.error(f"Parquet 导出失败，回退 JSON: {e}")
+            exported.clear()
+            filepath = filepath.replace('.parquet', '.json')
+            self._write_json_stream(filepath, self.redis_client.read_oldest(count, exported, batch_size))
+        return filepath
+
+    def export_by_source(self, max_per_source: int = 5000, max_scan: int = 100000,
+                         page_size: int = 5000) -> Dict[str, Any]:
         """
-        按数据源分别导出
+        按数据源分别导出（只读不删）：每个来源最新的 max_per_source 条之外的旧数据写入各自文件
+        
+        从队列头部分页 LRANGE（多页一次 pipeline），边扫描边按来源写出原始 JSON，
+        内存只占一趟的分页数据，单次 LRANGE 不超过 page_size 条，不会长时间阻塞 Redis
         
         Args:
             max_per_source: 每个数据源保留的最大数据量
+            max_scan: 最多扫描的条数（从队列头部开始）
+            page_size: 每页条数
         
         Returns:
-            dict: 导出统计信息
+            dict: 导出统计信息 {来源: 导出条数}
         """
-        stats = {}
+        stats: Dict[str, int] = {}
+        seen: Dict[str, int] = {}
+        files: Dict[str, Any] = {}
         
         try:
-            # 获取所有数据
-            all_data = self.redis_client.peek_data(100000)  # 读取大量数据
-            
-            # 按来源分组
-            by_source = {}
-            for item in all_data:
-                source = item.get('source', 'unknown')
-                if source not in by_source:
-                    by_source[source] = []
-                by_source[source].append(item)
-            
-            # 分别导出
-            for source, data_list in by_source.items():
-                if len(data_list) > max_per_source:
-                    # 导出旧数据
-                    to_export = data_list[max_per_source:]
-                    self._export_source_data(source, to_export)
-                    stats[source] = len(to_export)
-            
+            for page in self._scan_pages(max_scan, page_size):
+                for raw in page:
+                    if not raw.startswith('{'):
+                        continue
+                    source = extract_source(raw)
+                    seen[source] = seen.get(source, 0) + 1
+                    if seen[source] <= max_per_source:
+                        continue
+                    # 导出旧数据（队列头部最新，越往后越旧）
+                    f = files.get(source)
+                    if f is None:
+                        f = files[source] = self._open_source_file(source)
+                    f.write(',\n' if stats.get(source) else '\n')
+                    f.write(raw)
+                    stats[source] = stats.get(source, 0) + 1
         except Exception as e:
             logger.error(f"按来源导出数据时出错: {e}")
+        finally:
+            for source, f in files.items():
+                f.write('\n], "count": %d}\n' % stats.get(source, 0))
+                f.close()
+                logger.info(f"已导出 {source} 的 {stats.get(source, 0)} 条数据到 {f.name}")
         
         return stats
     
-    def _export_source_data(self, source: str, data_list: List[Dict]):
-        """导出特定来源的数据"""
+    def _scan_pages(self, max_scan: int, page_size: int, pages_per_trip: int = 4) -> Iterator[List[str]]:
+        """从队列头部分页读取前 max_scan 条，每趟 pipeline 发送 pages_per_trip 个 LRANGE"""
+        client = self.redis_client.client
+        queue_name = self.redis_client.queue_name
+        total = min(client.llen(queue_name), max_scan)
+        starts = list(range(0, total, page_size))
+        for i in range(0, len(starts), pages_per_trip):
+            pipe = client.pipeline(transaction=False)
+            for start in starts[i:i + pages_per_trip]:
+                pipe.lrange(queue_name, start, min(start + page_size, total) - 1)
+            for page in pipe.execute():
+                if page:
+                    yield page
+    
+    def _open_source_file(self, source: str):
+        """打开特定来源的导出文件并写入文件头（data 数组由调用方逐条写入）"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"data_{source}_{timestamp}.json"
         filepath = os.path.join(self.export_dir, filename)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump({
-                'export_time': datetime.now().isoformat(),
-                'source': source,
-                'count': len(data_list),
-                'data': data_list
-            }, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"已导出 {source} 的 {len(data_list)} 条数据到 {filepath}")
+        f = open(filepath, 'w', encoding='utf-8', buffering=WRITE_BUFFER)
+        f.write('{"export_time": %s, "source": %s, "data": [' % (
+            json.dumps(datetime.now().isoformat()), json.dumps(source, ensure_ascii=False)))
+        return f
 
     # ============== 内部工具 ==============
-    def _load_export_format(self) -> str:
-        """从 config.yaml 读取 data_management.archive.format，默认 json。"""
-        try:
-            import yaml
-            with open('config.yaml', 'r', encoding='utf-8') as f:
-                cfg = yaml.safe_load(f) or {}
-            fmt = (((cfg.get('data_management') or {}).get('archive') or {}).get('format') or 'json')
-            return str(fmt)
-        except Exception:
-            return 'json'
+    def _load_archive_config(self) -> Dict[str, Any]:
+        """从 config.yaml 读取 data_management.archive（format / compression 等），读取失败返回空字典。"""
+        cfg = read_config()
+        return (cfg.get('data_management') or {}).get('archive') or {}
 
 
 def main():
@@ -0,0 +1,87 @@
+"""
+HTTP 客户端模块
+提供进程内共享的 requests.Session：
+- HTTP keep-alive，跨请求复用 TCP/TLS 连接
+- 连接池按主机复用，供多个爬虫线程并发使用
+- 对 5xx 自动短暂退避重试（429 由各爬虫按自身令牌桶/限速头处理）
+"""
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.logger import setup_logger
+
+logger = setup_logger('http_client')
+
+# 连接池大小：控制中心并发运行多个爬虫，且爬虫内部可能再并发请求
+POOL_CONNECTIONS = 20
+POOL_MAXSIZE = 100
+# 默认重试策略：仅对幂等请求重试
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+# 不含 429：限速由各爬虫处理（令牌桶、限速头暂停、配额计数），自动重试会绕过这些机制并额外消耗配额
+RETRY_STATUS_FORCELIST = (500, 502, 503, 504)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_connections: int = POOL_CONNECTIONS,
+                   pool_maxsize: int = POOL_MAXSIZE,
+                   max_retries: Optional[Retry] = None) -> requests.Session:
+    """
+    创建带连接池的 Session
+
+    Args:
+        pool_connections: 缓存的主机连接池数量
+        pool_maxsize: 每个主机连接池的最大连接数
+        max_retries: 重试策略，默认对 5xx 退避重试 3 次
+
+    Returns:
+        requests.Session
+    """
+    if max_retries is None:
+        max_retries = Retry(
+            total=RETRY_TOTAL,
+            backoff_factor=RETRY_BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUS_FORCELIST,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+            # 不按 Retry-After 等待：服务端可能给出数小时，会长时间占住爬虫工作线程
+            respect_retry_after_header=False,
+        )
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=max_retries,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """获取进程内共享的 Session（首次调用时创建）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+                logger.debug("共享 HTTP Session 已创建")
+    return _session
+
+
+def close_session():
+    """关闭共享 Session，释放连接池"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            try:
+                _session.close()
+            except Exception as e:
+                logger.error(f"关闭 HTTP Session 失败: {e}")
+            _session = None
@@ -0,0 +1,72 @@
+"""
+JSON 编解码模块
+优先使用 orjson（C 扩展，解析/序列化快 2-5 倍），未安装时回退到标准库 json
+
+队列数据保持 JSON 文本：导出脚本与下游分析以 decode_responses=True 读取并按 JSON 解析，
+二进制格式（如 MessagePack）会破坏这些读取方
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+
+
+def dumps(data: Any) -> str:
+    """
+    序列化为 JSON 文本（非 ASCII 字符原样保留）
+
+    orjson 可用时由其序列化后解码为 str，两条路径返回类型一致，调用方可直接拼接或 encode；
+    orjson 不支持的数据（非 str 键、超出 64 位的整数等）回退到标准库，
+    回退时同样输出紧凑格式（无多余空格），与 orjson 的输出大小一致
+
+    Args:
+        data: 待序列化的对象
+
+    Returns:
+        str: JSON 文本
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+SOURCE_KEY = '"source":'
+
+
+def extract_source(raw: str) -> str:
+    """
+    从队列中的 JSON 文本取出 source 的值，不做完整解析
+
+    用两次 str.find（C 层子串查找）定位，兼容标准库默认分隔符带的空格；
+    字符串值中的引号已被转义，不会误匹配。取不到返回 'unknown'
+    """
+    i = raw.find(SOURCE_KEY)
+    if i < 0:
+        return 'unknown'
+    i += len(SOURCE_KEY)
+    if raw.startswith(' ', i):
+        i += 1
+    if not raw.startswith('"', i):
+        return 'unknown'
+    j = raw.find('"', i + 1)
+    return raw[i + 1:j] if j > i + 1 else 'unknown'
+
+
+def loads(raw: Union[str, bytes]) -> Any:
+    """
+    解析 JSON（接受 str 或 bytes，如 response.content）
+
+    Raises:
+        ValueError: 内容不是合法 JSON
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
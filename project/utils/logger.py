@@ -1,19 +1,107 @@
 """
 日志工具模块
 提供统一的日志记录功能（支持文件轮转与配置文件设置）
+
+各模块的 logger 只挂一个 QueueHandler，记录入队即返回；
+文件与控制台写入由进程内唯一的后台监听线程完成，爬虫线程不再争用处理器锁、不等磁盘 I/O
 """
+import atexit
 import logging
 import os
+import queue
+import threading
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from utils.config import read_config
+
+
+class _BatchedRotatingFileHandler(RotatingFileHandler):
+    """
+    写入后不立即 flush 的轮转文件处理器（只在监听线程中使用）
+
+    标准 RotatingFileHandler 每条记录都 seek/tell 判断轮转（会顺带 flush 缓冲）；
+    这里自行累计已写长度，flush 交给 _NameDispatcher 在队列清空时统一执行
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._size = None  # 当前文件已写长度（None 表示需要从文件重新读取）
+
+    def shouldRollover(self, record):
+        if self.maxBytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        if self._size is None:
+            self.stream.seek(0, 2)
+            self._size = self.stream.tell()
+        return self._size + len(self.format(record)) + 1 >= self.maxBytes
+
+    def doRollover(self):
+        super().doRollover()
+        self._size = None
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            msg = self.format(record) + self.terminator
+            self.stream.write(msg)
+            if self._size is not None:
+                self._size += len(msg.encode(self.encoding or 'utf-8', 'replace'))
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class _NameDispatcher(logging.Handler):
+    """按记录的 logger 名称分发到各自的文件/控制台处理器（在监听线程中执行）"""
+
+    def __init__(self, log_queue):
+        super().__init__()
+        self.routes = {}
+        self._queue = log_queue
+        self._dirty = set()
+
+    def handle(self, record):
+        for handler in self.routes.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+                self._dirty.add(handler)
+        # 队列中暂时没有后续记录时才 flush：高峰期多条合并落盘，空闲时立即可见
+        if self._queue.empty():
+            for handler in self._dirty:
+                handler.flush()
+            self._dirty.clear()
+        return True
+
+    def emit(self, record):
+        self.handle(record)
+
+
+_log_queue = queue.SimpleQueue()
+_dispatcher = _NameDispatcher(_log_queue)
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _ensure_listener():
+    """启动后台日志监听线程（进程内只启动一次，退出时写完队列中剩余的记录）"""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = QueueListener(_log_queue, _dispatcher)
+            _listener.start()
+            atexit.register(_listener.stop)
 
 
 def _load_logging_config():
-    """从 config.yaml 读取日志配置（若存在）。"""
+    """从 config.yaml 读取日志配置（若存在，进程内只解析一次）。"""
     try:
-        import yaml
-        with open('config.yaml', 'r', encoding='utf-8') as f:
-            cfg = yaml.safe_load(f) or {}
+        cfg = read_config()
         logging_cfg = (cfg.get('logging') or {})
         return {
             'level': getattr(logging, str(logging_cfg.get('level', 'INFO')).upper(), logging.INFO),
@@ -37,14 +125,14 @@ def setup_logger(name, log_dir=None, level=None):
     
     Args:
         name: 日志记录器名称
-        log_dir: 日志目录（可选，默认从 config.yaml 读取或使用 logs）
+        log_dir: 日志目录（可选，默认取环境变量 CRAWLER_LOG_DIR，其次从 config.yaml 读取或使用 logs）
         level: 日志级别（可选，默认从 config.yaml 读取或 INFO）
     
     Returns:
         logger: 配置好的日志记录器
     """
     cfg = _load_logging_config()
-    log_dir = log_dir or cfg['log_dir']
+    log_dir = log_dir or os.environ.get('CRAWLER_LOG_DIR') or cfg['log_dir']
     level = level if isinstance(level, int) else cfg['level']
 
     # 确保日志目录存在
@@ -62,7 +150,7 @@ def setup_logger(name, log_dir=None, level=None):
     # 创建文件轮转处理器（单文件大小与备份数量从配置读取）
     log_filename = f"{name}_{datetime.now().strftime('%Y%m%d')}.log"
     log_filepath = os.path.join(log_dir, log_filename)
-    file_handler = RotatingFileHandler(
+    file_handler = _BatchedRotatingFileHandler(
         log_filepath,
         maxBytes=cfg['max_log_size_mb'] * 1024 * 1024,
         backupCount=cfg['backup_count'],
@@ -83,8 +171,10 @@ def setup_logger(name, log_dir=None, level=None):
     file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
     
-    # 添加处理器
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # 实际写入交给后台监听线程，logger 上只挂入队处理器
+    _dispatcher.routes[name] = [file_handler, console_handler]
+    logger.addHandler(QueueHandler(_log_queue))
+    logger.propagate = False
+    _ensure_listener()
     
     return logger
@@ -0,0 +1,136 @@
+"""
+限速模块
+提供令牌桶限速器：
+- 有余量的请求立即放行，只有超出部分排队等待
+- 收到限速响应时可扣减令牌（惩罚），迫使后续请求等待补充
+- AsyncTokenBucket 用于 asyncio 协程，TokenBucket 用于线程池
+"""
+import asyncio
+import threading
+import time
+
+
+class AsyncTokenBucket:
+    """异步令牌桶"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 令牌补充速率（个/秒）
+            capacity: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # asyncio.Lock 与事件循环绑定，按当前循环懒创建（crawl() 每次 asyncio.run 都是新循环）
+        self._lock = None
+        self._lock_loop = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def acquire(self, cost: float = 1):
+        """
+        获取令牌，不足时异步等待
+
+        Args:
+            cost: 本次消耗的令牌数
+        """
+        async with self._get_lock():
+            self._refill()
+            if self.tokens < cost:
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= cost
+
+    def penalize(self, tokens: float):
+        """
+        扣减令牌（收到限速响应时调用），允许变为负数以延长等待
+
+        Args:
+            tokens: 扣减的令牌数
+        """
+        self._refill()
+        self.tokens -= tokens
+
+
+class TokenBucket:
+    """线程安全的令牌桶（供线程池中的阻塞请求共用）"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 令牌补充速率（个/秒）
+            capacity: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, cost: float = 1):
+        """
+        获取令牌，不足时阻塞等待（持锁等待，请求按到达顺序放行）
+
+        Args:
+            cost: 本次消耗的令牌数
+        """
+        with self._lock:
+            self._refill()
+            if self.tokens < cost:
+                time.sleep((cost - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= cost
+
+    def penalize(self, tokens: float):
+        """
+        扣减令牌（收到限速响应时调用），允许变为负数以延长等待
+
+        Args:
+            tokens: 扣减的令牌数
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= tokens
+
+    def pause(self, seconds: float):
+        """
+        暂停放行至少 seconds 秒（多个线程重复调用不会叠加等待）
+
+        Args:
+            seconds: 暂停时长（秒）
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def set_rate(self, rate: float):
+        """
+        调整令牌补充速率（按服务端返回的剩余额度动态调整）
+
+        Args:
+            rate: 新的补充速率（个/秒）
+        """
+        with self._lock:
+            self._refill()
+            self.rate = rate
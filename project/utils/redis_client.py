@@ -5,13 +5,89 @@ Redis 客户端模块
 - 队列长度预警
 - 按数据来源配额（软限制）与来源计数
 """
-import json
 import redis
-from typing import Dict, Any, Optional, Tuple
+from datetime import date, timedelta
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from utils.logger import setup_logger
+from utils.json_codec import dumps, extract_source, loads
 
 logger = setup_logger('redis_client')
 
+# 精简模式保留的核心字段（元组保持写出的字段顺序稳定）
+_SLIM_FIELDS = (
+    'title',
+    'url',
+    'published',
+    'source',
+    'feed_category',
+    'language',
+    'summary',
+    'timestamp',  # 爬取时间戳
+)
+
+# 配额检查：读取计数并与上限比较，在 Redis 内原子执行，一次往返
+# 返回 {是否允许(1/0), 剩余次数 或 已用次数}
+QUOTA_CHECK_SCRIPT = """
+local key = KEYS[1]; local cap = tonumber(ARGV[1])
+local n = tonumber(redis.call('GET', key) or '0')
+if n >= cap then return {0, n} else return {1, cap - n} end
+"""
+
+# 队列超过硬上限时截掉队尾最旧的数据，并在同一原子操作中扣减被截掉数据的来源计数
+# （与 json_codec.extract_source 相同：只匹配 "source" 字段，取不到记为 unknown；非 JSON 对象不计数）
+TRIM_TO_CAP_SCRIPT = """
+local key = KEYS[1]; local counts = KEYS[2]; local cap = tonumber(ARGV[1])
+local dropped = redis.call('LRANGE', key, cap, -1)
+if #dropped == 0 then return 0 end
+redis.call('LTRIM', key, 0, cap - 1)
+local n = {}
+for _, item in ipairs(dropped) do
+  if string.sub(item, 1, 1) == '{' then
+    local src = string.match(item, '"source":%s?"([^"]+)"') or 'unknown'
+    n[src] = (n[src] or 0) + 1
+  end
+end
+for src, c in pairs(n) do redis.call('HINCRBY', counts, src, -c) end
+return #dropped
+"""
+
+# 去重集合按 ISO 周轮换（{namespace}:seen:guids:YYYYWW），保留两周以便跨周检查上一周
+SEEN_KEY_TTL = 14 * 86400
+
+
+def create_pool(host: str = 'localhost', port: int = 6379, db: int = 0,
+                password: Optional[str] = None, max_connections: int = 16,
+                **kwargs) -> redis.BlockingConnectionPool:
+    """
+    创建可在多个 RedisClient 之间共享的连接池
+
+    并发的 pipeline 各自占用池中的独立连接，互不阻塞；连接用尽时等待归还
+    （BlockingConnectionPool），而不是像 ConnectionPool 那样直接抛错。
+    可直接传入完整的 redis 配置，与连接无关的键（queue_name 等）会被忽略。
+
+    Args:
+        host: Redis 主机地址
+        port: Redis 端口
+        db: Redis 数据库编号
+        password: Redis 密码
+        max_connections: 连接池最大连接数
+
+    Returns:
+        redis.BlockingConnectionPool
+    """
+    return redis.BlockingConnectionPool(
+        host=host,
+        port=port,
+        db=db,
+        password=password,
+        decode_responses=True,
+        socket_connect_timeout=5,
+        socket_timeout=5,
+        socket_keepalive=True,
+        max_connections=max_connections,
+        timeout=20,
+    )
+
 
 class RedisClient:
     """Redis 客户端类"""
@@ -25,6 +101,7 @@ class RedisClient:
         queue_name: str = 'data_queue',
         storage_config: Optional[Dict[str, Any]] = None,
         source_quotas: Optional[Dict[str, float]] = None,
+        pool: Optional[redis.ConnectionPool] = None,
         **kwargs,
     ):
         """
@@ -38,6 +115,7 @@ class RedisClient:
             queue_name: 队列名称
             storage_config: 存储优化配置字典（来自 redis.storage_optimization）
             source_quotas: 来源配额（来自 redis.source_quotas），0-1 之间
+            pool: 共享连接池（见 create_pool），提供时忽略 host/port/db/password
         """
         self.queue_name = queue_name
 
@@ -48,22 +126,35 @@ class RedisClient:
         self.slim_mode = self.storage_config.get('slim_mode', False)
         self.data_ttl = self.storage_config.get('data_ttl', None)
         self.max_keep = int(self.storage_config.get('max_keep', 10000))
+        # 队列硬上限（可选）：写入时 LTRIM 丢弃最旧数据，防止突发写入撑爆 Redis 内存
+        hard_cap = self.storage_config.get('hard_cap')
+        self.hard_cap = int(hard_cap) if hard_cap else None
 
         # 来源配额（软限制）
         self.source_quotas = source_quotas or kwargs.get('source_quotas') or {}
-        # 以 Redis Key 记录每个来源的计数，避免全量扫描
-        self.source_count_prefix = f"{self.queue_name}:source_count:"
+        # 各来源的计数存在同一个 Hash 中（字段为来源），避免全量扫描
+        self.source_counts_key = f"{self.queue_name}:source_counts"
+        # 本地缓存的来源计数（取自 HINCRBY/HMGET 的返回值），离配额较远时跳过 HGET
+        self._source_count_cache: Dict[str, int] = {}
+        # 上次提醒队列超阈值时的长度（避免每条推送都重复警告）
+        self._warned_length = 0
+        # 配额检查与硬上限修剪脚本（首次使用时注册，之后走 EVALSHA）
+        self._quota_script = None
+        self._trim_script = None
 
         try:
-            self.client = redis.Redis(
-                host=host,
-                port=port,
-                db=db,
-                password=password,
-                decode_responses=True,
-                socket_connect_timeout=5,
-                socket_timeout=5,
-            )
+            if pool is not None:
+                self.client = redis.Redis(connection_pool=pool)
+            else:
+                self.client = redis.Redis(
+                    host=host,
+                    port=port,
+                    db=db,
+                    password=password,
+                    decode_responses=True,
+                    socket_connect_timeout=5,
+                    socket_timeout=5,
+                )
             # 测试连接
             self.client.ping()
             logger.info(f"Redis 连接成功: {host}:{port}/{db}")
@@ -72,8 +163,13 @@ class RedisClient:
             if self.data_ttl:
                 logger.info(f"✓ 数据TTL: {self.data_ttl}秒")
             logger.info(f"✓ 最大保留: {self.max_keep}条")
+            if self.hard_cap:
+                logger.info(f"✓ 队列硬上限: {self.hard_cap}条（超出丢弃最旧数据）")
             if self.source_quotas:
                 logger.info(f"✓ 来源配额启用: {self.source_quotas}")
+                # 计数 Hash 不存在（首次启用或由旧版逐来源计数键升级）时按队列现有数据重建一次
+                if not self.client.exists(self.source_counts_key):
+                    self.rebuild_source_counts()
         except redis.ConnectionError as e:
             logger.error(f"Redis 连接失败: {e}")
             raise
@@ -93,35 +189,51 @@ class RedisClient:
             if self.slim_mode:
                 data = self._slim_data(data)
             
-            # 序列化为 JSON
-            json_data = json.dumps(data, ensure_ascii=False)
-            
-            # 推送到列表
-            # 先检查来源配额（软限制：超额则跳过本条）
+            # 先检查来源配额（软限制：超额则跳过本条，无需序列化）
             source = data.get('source') or 'unknown'
             if self._exceeds_quota(source):
-                logger.warning(f"⚠️  来源 {source} 已超过配额，丢弃新数据以保护总量（soft limit）")
+                logger.warning("⚠️  来源 %s 已超过配额，丢弃新数据以保护总量（soft limit）", source)
                 return False
 
-            self.client.lpush(self.queue_name, json_data)
-            # 更新来源计数
-            try:
-                self.client.incr(self._source_count_key(source))
-            except Exception:
-                # 计数失败不影响主流程
-                pass
+            # 序列化为 JSON，推送与来源计数一次 pipeline 往返
+            json_data = dumps(data)
+            pipe = self.client.pipeline(transaction=False)
+            pipe.lpush(self.queue_name, json_data)
+            if self.hard_cap:
+                self._trim_to_cap(pipe)
+            pipe.hincrby(self.source_counts_key, source, 1)
+            # 计数失败不影响主流程：不抛出，只取 LPUSH 的结果
+            results = pipe.execute(raise_on_error=False)
+            if isinstance(results[0], Exception):
+                raise results[0]
+            if isinstance(results[-1], int):
+                self._source_count_cache[source] = results[-1]
             
-            # 🔥 检查队列长度，超过阈值警告
-            queue_length = self.client.llen(self.queue_name)
+            # 🔥 检查队列长度（LPUSH 直接返回推送后的长度，无需再 LLEN），超过阈值警告
+            queue_length = results[0]
+            if self.hard_cap:
+                queue_length = min(queue_length, self.hard_cap)
             if queue_length > self.max_keep:
-                logger.warning(f"⚠️  队列长度 {queue_length} 超过阈值 {self.max_keep}，建议导出")
+                # 超阈值后每条推送都会触发：同一轮超限只在队列再增长 10% 阈值时重复提醒
+                if queue_length >= self._warned_length + max(1, self.max_keep // 10):
+                    logger.warning("⚠️  队列长度 %d 超过阈值 %d，建议导出", queue_length, self.max_keep)
+                    self._warned_length = queue_length
+            else:
+                self._warned_length = 0
             
-            logger.debug(f"数据已推送到 Redis: source={data.get('source')}")
+            # 参数延迟格式化：未开启 DEBUG 时不拼接字符串
+            logger.debug("数据已推送到 Redis: source=%s", source)
             return True
         except Exception as e:
             logger.error(f"推送数据到 Redis 失败: {e}")
             return False
     
+    def _trim_to_cap(self, pipe):
+        """在 pipeline 中加入硬上限修剪：LRANGE 超出部分、LTRIM 与来源计数扣减在一个 Lua 脚本内原子完成"""
+        if self._trim_script is None:
+            self._trim_script = self.client.register_script(TRIM_TO_CAP_SCRIPT)
+        self._trim_script(keys=[self.queue_name, self.source_counts_key], args=[self.hard_cap], client=pipe)
+    
     def _slim_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
         精简数据字段（只保留核心字段，节省60%空间）
@@ -141,18 +253,8 @@ class RedisClient:
         Returns:
             精简后的数据
         """
-        slim_fields = [
-            'title',
-            'url',
-            'published',
-            'source',
-            'feed_category',
-            'language',
-            'summary',
-            'timestamp'  # 爬取时间戳
-        ]
-        
-        slimmed = {k: v for k, v in data.items() if k in slim_fields}
+        # 按固定的少量核心字段直接取值，不遍历原始数据的全部字段
+        slimmed = {k: data[k] for k in _SLIM_FIELDS if k in data}
         
         # 确保必要字段存在
         if 'timestamp' not in slimmed and 'crawl_timestamp' in data:
@@ -163,45 +265,165 @@ class RedisClient:
         
         return slimmed
     
-    def push_batch(self, data_list: list) -> int:
+    def push_batch(self, data_list: list, chunk_size: int = 500,
+                   seen_ids: Optional[List[Optional[str]]] = None, seen_namespace: str = 'rss') -> int:
         """
-        批量推送数据到 Redis
+        批量推送数据到 Redis（非事务 pipeline，按块 LPUSH 多值）
         
         Args:
             data_list: 数据字典列表
+            chunk_size: 每条 LPUSH 命令携带的最大条数
+            seen_ids: 与 data_list 对齐的去重标识（见 push_batch_by_source）
+            seen_namespace: 去重集合前缀
         
         Returns:
             int: 成功推送的数据条数
         """
-        success_count = 0
+        return sum(self.push_batch_by_source(data_list, chunk_size, seen_ids, seen_namespace).values())
+    
+    def push_batch_by_source(self, data_list: list, chunk_size: int = 500,
+                             seen_ids: Optional[List[Optional[str]]] = None,
+                             seen_namespace: str = 'rss') -> Dict[str, int]:
+        """
+        批量推送数据，并按来源返回成功条数（同一批混有多种来源时使用，如帖子 + 评论）
+        
+        传入 seen_ids 时，实际写入的条目在同一 pipeline 中加入本周去重集合；
+        因配额被丢弃或写入失败的条目不标记，下次抓取仍会重试
+        
+        Args:
+            data_list: 数据字典列表
+            chunk_size: 每条 LPUSH 命令携带的最大条数
+            seen_ids: 与 data_list 对齐的去重标识（None 表示不参与去重）
+            seen_namespace: 去重集合前缀
+        
+        Returns:
+            dict: {来源: 成功推送条数}
+        """
+        pushed: Dict[str, int] = {}
         try:
-            # 逐条校验来源配额，必要时可优化为分组批处理
-            pipe = self.client.pipeline()
-            to_incr = {}
-            for data in data_list:
+            prepared = []
+            for i, data in enumerate(data_list):
+                if not data:
+                    continue
                 if self.slim_mode:
                     data = self._slim_data(data)
-                source = (data or {}).get('source') or 'unknown'
-                if self._exceeds_quota(source):
-                    continue
-                json_data = json.dumps(data, ensure_ascii=False)
-                pipe.lpush(self.queue_name, json_data)
-                to_incr[source] = to_incr.get(source, 0) + 1
-                success_count += 1
-            if success_count:
-                pipe.execute()
-                # 批量增加来源计数
-                for s, c in to_incr.items():
-                    try:
-                        self.client.incrby(self._source_count_key(s), c)
-                    except Exception:
-                        pass
-                logger.info(f"批量推送 {success_count} 条数据到 Redis")
+                prepared.append(((data.get('source') or 'unknown'), data, seen_ids[i] if seen_ids else None))
+            if not prepared:
+                return pushed
+
+            # 按来源一次性读取计数（HMGET），在本地累加校验配额，避免逐条 HGET
+            sources = list({src for src, _, _ in prepared})
+            remaining: Dict[str, Optional[int]] = {}
+            limited = [src for src in sources if self._quota_limit(src)]
+            if limited:
+                try:
+                    current = self.client.hmget(self.source_counts_key, limited)
+                except Exception:
+                    current = [None] * len(limited)
+                for src, cnt in zip(limited, current):
+                    self._source_count_cache[src] = int(cnt or 0)
+                    remaining[src] = self._quota_limit(src) - int(cnt or 0)
+
+            payload = []
+            to_incr: Dict[str, int] = {}
+            seen_members = []
+            for src, data, seen_id in prepared:
+                left = remaining.get(src)
+                if left is not None:
+                    if left <= 0:
+                        continue
+                    remaining[src] = left - 1
+                payload.append(dumps(data))
+                to_incr[src] = to_incr.get(src, 0) + 1
+                if seen_id:
+                    seen_members.append(seen_id)
+
+            if payload:
+                # 非事务 pipeline：数据与来源计数一次往返写入
+                pipe = self.client.pipeline(transaction=False)
+                for i in range(0, len(payload), chunk_size):
+                    pipe.lpush(self.queue_name, *payload[i:i + chunk_size])
+                if self.hard_cap:
+                    # 新数据在队头，截掉队尾最旧的部分，被截掉数据的来源计数同时扣减
+                    self._trim_to_cap(pipe)
+                if seen_members:
+                    self._mark_seen(pipe, seen_members, seen_namespace)
+                for src, c in to_incr.items():
+                    pipe.hincrby(self.source_counts_key, src, c)
+                results = pipe.execute()
+                # HINCRBY 返回各来源的最新计数，顺手刷新本地缓存
+                for src, cnt in zip(to_incr, results[-len(to_incr):]):
+                    if isinstance(cnt, int):
+                        self._source_count_cache[src] = cnt
+                pushed = to_incr
+                logger.info(f"批量推送 {len(payload)} 条数据到 Redis")
+
+            skipped = len(prepared) - len(payload)
+            if skipped:
+                logger.warning(f"⚠️  {skipped} 条数据因来源配额被丢弃（soft limit）")
         except Exception as e:
             logger.error(f"批量推送数据失败: {e}")
 
-        return success_count
+        return pushed
     
+    def read_oldest(self, count: int, exported: Dict[str, int], batch_size: int = 1000,
+                    batches_per_trip: int = 16) -> Iterator[List[str]]:
+        """
+        从队尾按批读取最旧的 count 条原始 JSON（只读不删，LRANGE 负索引）
+
+        每次往返用 pipeline 连发最多 batches_per_trip 个 LRANGE，边读边写，内存只占一趟的数据；
+        新数据 LPUSH 到队头，不改变从队尾数的负索引。只记录各来源条数，不保留原始数据：
+        调用方把文件写完并发布后再调用 trim_oldest(exported) 删除，进程中途退出时数据仍在队列中
+        （至少一次：下次导出可能重复写出这部分数据）
+
+        Args:
+            count: 读取数量
+            exported: 已读取的各来源条数（就地累加；非 JSON 对象记在空字符串下，只计条数）
+            batch_size: 单个 LRANGE 的条数
+            batches_per_trip: 每趟 pipeline 的 LRANGE 个数
+
+        Yields:
+            list: 一批原始 JSON 字符串，按时间从旧到新
+        """
+        offsets = list(range(0, count, batch_size))
+        for i in range(0, len(offsets), batches_per_trip):
+            trip = offsets[i:i + batches_per_trip]
+            pipe = self.client.pipeline(transaction=False)
+            for offset in trip:
+                # 队尾第 offset+1 条起向队头取 size 条：[-(offset+size), -(offset+1)]
+                size = min(batch_size, count - offset)
+                pipe.lrange(self.queue_name, -(offset + size), -(offset + 1))
+            for offset, batch in zip(trip, pipe.execute()):
+                batch.reverse()  # LRANGE 按队头到队尾（新到旧）返回
+                for raw in batch:
+                    source = extract_source(raw) if raw.startswith('{') else ''
+                    exported[source] = exported.get(source, 0) + 1
+                if batch:
+                    yield batch
+                if len(batch) < min(batch_size, count - offset):
+                    return  # 已读到队头
+
+    def trim_oldest(self, exported: Dict[str, int]) -> int:
+        """
+        删除队尾已导出的数据并扣减其来源计数（同一 MULTI 事务）
+
+        Args:
+            exported: read_oldest 累加的各来源条数
+
+        Returns:
+            int: 删除条数
+        """
+        total = sum(exported.values())
+        if total == 0:
+            return 0
+        pipe = self.client.pipeline(transaction=True)
+        pipe.ltrim(self.queue_name, 0, -(total + 1))
+        for source, c in exported.items():
+            if source:
+                pipe.hincrby(self.source_counts_key, source, -c)
+        pipe.execute()
+        return total
+
     def get_queue_length(self) -> int:
         """
         获取队列长度
@@ -226,17 +448,32 @@ class RedisClient:
         Returns:
             list: 数据列表
         """
+        return list(self.iter_data(count))
+
+    def iter_data(self, count: int = 10, page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        从队列头部（最新）起逐页查看数据（不移除）
+
+        每次 LRANGE 最多 page_size 条：Redis 单线程，一次取大范围会阻塞其他客户端（爬虫写入）
+
+        Args:
+            count: 查看的数据条数
+            page_size: 每页条数
+
+        Yields:
+            dict: 数据
+        """
         try:
-            data_list = self.client.lrange(self.queue_name, 0, count - 1)
-            return [json.loads(item) for item in data_list]
+            for start in range(0, count, page_size):
+                page = self.client.lrange(self.queue_name, start, min(count, start + page_size) - 1)
+                for item in page:
+                    yield loads(item)
+                if len(page) < min(page_size, count - start):
+                    break  # 队列已读完
         except Exception as e:
             logger.error(f"查看队列数据失败: {e}")
-            return []
 
     # ============== 配额与计数 ==============
-    def _source_count_key(self, source: str) -> str:
-        return f"{self.source_count_prefix}{source}"
-
     def _quota_limit(self, source: str) -> Optional[int]:
         """返回某来源的配额上限条数（基于 max_keep 与百分比），无则返回 None。"""
         if not self.source_quotas:
@@ -253,16 +490,36 @@ class RedisClient:
         limit = self._quota_limit(source)
         if not limit:
             return False
+        # 本地缓存的计数离上限还远（留 5% 余量覆盖其他进程的写入）时不必访问 Redis
+        cached = self._source_count_cache.get(source)
+        if cached is not None and cached < limit - max(1, limit // 20):
+            return False
         try:
             # 读取当前来源计数
-            cnt = int(self.client.get(self._source_count_key(source)) or 0)
+            cnt = int(self.client.hget(self.source_counts_key, source) or 0)
+            self._source_count_cache[source] = cnt
             return cnt >= limit
         except Exception:
             return False
 
+    def get_source_counts(self) -> Dict[str, int]:
+        """
+        读取来源计数 Hash（写入时 HINCRBY、导出时扣减维护），一次 HGETALL，不扫描队列
+
+        Returns:
+            dict: {来源: 条数}，Hash 不存在或读取失败返回空字典
+        """
+        try:
+            counts = {src: int(c) for src, c in self.client.hgetall(self.source_counts_key).items()}
+        except Exception as e:
+            logger.warning("读取来源计数失败: %s", e)
+            return {}
+        self._source_count_cache.update(counts)
+        return {src: c for src, c in counts.items() if c > 0}
+
     def rebuild_source_counts(self, max_scan: Optional[int] = None) -> Tuple[int, Dict[str, int]]:
         """
-        全量（或部分）扫描队列，重建来源计数键。
+        全量（或部分）扫描队列，重建来源计数 Hash。
         注意：O(n) 操作，请在导出修剪后调用。
 
         Args:
@@ -272,33 +529,144 @@ class RedisClient:
             (scanned, counts) 元组
         """
         try:
-            # 清理现有计数
-            # 简化处理：不删除旧 key，直接覆盖 set 值
             length = self.client.llen(self.queue_name)
             scan_n = length if max_scan is None else min(length, max_scan)
             if scan_n <= 0:
+                self.client.delete(self.source_counts_key)
+                self._source_count_cache.clear()
                 return 0, {}
             # 从头部读取最新的 scan_n 条
             data_list = self.client.lrange(self.queue_name, 0, scan_n - 1)
             counts: Dict[str, int] = {}
             for item in data_list:
-                try:
-                    d = json.loads(item)
-                    s = (d or {}).get('source') or 'unknown'
-                    counts[s] = counts.get(s, 0) + 1
-                except Exception:
-                    continue
-            # 回写计数
+                # 只扫描 source 字段，取不到时才完整解析
+                s = extract_source(item)
+                if s == 'unknown':
+                    try:
+                        s = (loads(item) or {}).get('source') or 'unknown'
+                    except Exception:
+                        continue
+                counts[s] = counts.get(s, 0) + 1
+            # 整体替换计数 Hash（事务内先删后写，已不存在的来源不会残留）
             pipe = self.client.pipeline()
-            for s, c in counts.items():
-                pipe.set(self._source_count_key(s), c)
+            pipe.delete(self.source_counts_key)
+            if counts:
+                pipe.hset(self.source_counts_key, mapping=counts)
             pipe.execute()
+            self._source_count_cache = dict(counts)
             logger.info(f"来源计数重建完成：扫描 {scan_n} 条，来源数 {len(counts)}")
             return scan_n, counts
         except Exception as e:
             logger.error(f"重建来源计数失败: {e}")
             return 0, {}
     
+    def check_quota(self, key: str, cap: int) -> Tuple[bool, int]:
+        """
+        检查按日计数的 API 配额（Lua 脚本原子读取，多进程无竞态）
+
+        Args:
+            key: 配额计数键（如 av:quota:2025-10-20）
+            cap: 每日上限
+
+        Returns:
+            tuple: (是否可继续请求, 剩余次数；不可用时为已用次数)
+        """
+        try:
+            if self._quota_script is None:
+                self._quota_script = self.client.register_script(QUOTA_CHECK_SCRIPT)
+            allowed, value = self._quota_script(keys=[key], args=[cap])
+            return bool(allowed), int(value)
+        except Exception as e:
+            # 读取失败时不阻塞抓取（与计数读取失败按 0 处理一致）
+            logger.error(f"配额检查失败: {e}")
+            return True, cap
+
+    def _seen_keys(self, namespace: str) -> Tuple[str, str]:
+        """本周与上周的去重集合键"""
+        today = date.today()
+        keys = []
+        for day in (today, today - timedelta(days=7)):
+            year, week, _ = day.isocalendar()
+            keys.append(f"{namespace}:seen:guids:{year}{week:02d}")
+        return keys[0], keys[1]
+
+    def seen(self, member: str, namespace: str = 'rss') -> bool:
+        """
+        检查并标记单个条目（SADD 原子完成，并发爬虫不会重复处理）
+
+        Args:
+            member: 条目唯一标识（如 RSS guid）
+            namespace: 去重集合前缀
+
+        Returns:
+            bool: 本周或上周已出现过返回 True
+        """
+        return self.seen_many([member], namespace)[0]
+
+    def check_seen(self, members: Iterable[str], namespace: str = 'rss') -> List[bool]:
+        """
+        批量检查条目是否已写入过（只读不标记，一次 pipeline 往返）
+
+        与 push_batch(seen_ids=...) 配合：先过滤，写入成功后才标记，下载失败或被配额丢弃的条目下次重试
+
+        Args:
+            members: 条目唯一标识列表
+            namespace: 去重集合前缀
+
+        Returns:
+            list: 与 members 顺序一致，本周或上周已出现过为 True；Redis 不可用时全部为 False
+        """
+        members = list(members)
+        if not members:
+            return []
+        current, previous = self._seen_keys(namespace)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for member in members:
+                pipe.sismember(current, member)
+                pipe.sismember(previous, member)
+            results = pipe.execute()
+        except Exception as e:
+            logger.error(f"去重检查失败: {e}")
+            return [False] * len(members)
+        return [bool(a) or bool(b) for a, b in zip(results[::2], results[1::2])]
+
+    def _mark_seen(self, pipe, members: List[str], namespace: str):
+        """在 pipe 中把条目加入本周去重集合并续期"""
+        current, _ = self._seen_keys(namespace)
+        pipe.sadd(current, *members)
+        pipe.expire(current, SEEN_KEY_TTL)
+
+    def seen_many(self, members: Iterable[str], namespace: str = 'rss') -> List[bool]:
+        """
+        批量检查并标记条目，一次 pipeline 往返
+
+        Args:
+            members: 条目唯一标识列表
+            namespace: 去重集合前缀
+
+        Returns:
+            list: 与 members 顺序一致，已出现过为 True；Redis 不可用时全部为 False（宁可重复也不丢数据）
+        """
+        members = list(members)
+        if not members:
+            return []
+        current, previous = self._seen_keys(namespace)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for member in members:
+                pipe.sadd(current, member)
+            pipe.expire(current, SEEN_KEY_TTL)
+            for member in members:
+                pipe.sismember(previous, member)
+            results = pipe.execute()
+        except Exception as e:
+            logger.error(f"去重检查失败: {e}")
+            return [False] * len(members)
+        n = len(members)
+        added, in_previous = results[:n], results[n + 1:]
+        return [not a or bool(p) for a, p in zip(added, in_previous)]
+
     def close(self):
         """关闭 Redis 连接"""
         try:
@@ -307,6 +675,35 @@ class RedisClient:
         except Exception as e:
             logger.error(f"关闭 Redis 连接失败: {e}")
     
+    def get_stats_batch(self) -> Dict[str, Any]:
+        """
+        通过一次 pipeline 往返同时获取队列长度与内存信息
+
+        Returns:
+            dict: {'queue_length': int, 以及 get_memory_usage() 的各字段}
+        """
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.llen(self.queue_name)
+            pipe.info('memory')
+            length, info = pipe.execute()
+            return {
+                'queue_length': length,
+                'used_memory_mb': info['used_memory'] / 1024 / 1024,
+                'used_memory_human': info['used_memory_human'],
+                'used_memory_peak_mb': info['used_memory_peak'] / 1024 / 1024,
+                'used_memory_peak_human': info['used_memory_peak_human']
+            }
+        except Exception as e:
+            logger.error(f"批量获取 Redis 状态失败: {e}")
+            return {
+                'queue_length': -1,
+                'used_memory_mb': 0,
+                'used_memory_human': 'N/A',
+                'used_memory_peak_mb': 0,
+                'used_memory_peak_human': 'N/A'
+            }
+
     def get_memory_usage(self) -> Dict[str, Any]:
         """
         获取 Redis 内存使用情况
@@ -4,23 +4,42 @@
 防止 Redis 内存占用过高
 """
 
+import io
 import os
-import json
 import gzip
+import queue
+import re
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+
+from utils.data_exporter import WRITE_BUFFER, _atomic_file, pa, pq, write_parquet_stream
+from utils.json_codec import loads
 
 logger = logging.getLogger(__name__)
 
-# 尝试导入 pandas (用于 Parquet 格式)
+# 尝试导入 pandas (无 pyarrow 时用于 Parquet 格式)
 try:
     import pandas as pd
     HAS_PANDAS = True
 except ImportError:
     HAS_PANDAS = False
-    logger.warning("pandas 未安装，Parquet 格式不可用。安装: pip install pandas pyarrow")
+
+HAS_PARQUET = pa is not None or HAS_PANDAS
+if not HAS_PARQUET:
+    logger.warning("pyarrow/pandas 未安装，Parquet 格式不可用。安装: pip install pyarrow")
+
+STATUS_TTL = 5.0  # should_export 复用队列长度/内存读数的秒数
+CLEANUP_WORKERS = 8  # 并行删除过期归档的线程数
+CLEANUP_PARALLEL_MIN = 64  # 过期文件达到该数量才启用线程池
+
+# data_* 导出文件名：可选的日期段（data_20241020_120000...）与扩展名，一次匹配同时取出两者
+_EXPORT_RE = re.compile(r'^data_(?:(\d{8})_)?.*?(\.jsonl?(?:\.gz)?|\.parquet)$')
 
 
 class SmartExporter:
@@ -30,7 +49,7 @@ class SmartExporter:
     功能:
     1. 监控 Redis 内存/队列使用情况
     2. 自动触发导出 (基于内存/队列/时间)
-    3. 支持多种格式: JSON, JSON.GZ, Parquet
+    3. 支持多种格式: JSONL, JSONL.GZ, Parquet（JSONL 边取边写）
     4. 自动清理过期归档
     """
     
@@ -64,11 +83,19 @@ class SmartExporter:
         self.archive_config = config.get('archive', {})
         self.compress = self.archive_config.get('compress', True)
         self.retention_days = self.archive_config.get('retention_days', 30)
-        self.export_format = self.archive_config.get('format', 'json')
+        # 未配置格式时，可写 Parquet 则默认 Parquet（列式 + 压缩，体积与读取速度均优于 gzip JSON）
+        self.export_format = self.archive_config.get('format') or ('parquet' if HAS_PARQUET else 'json')
+        self.compression = str(self.archive_config.get('compression') or 'zstd').lower()  # Parquet 压缩算法
+        # gzip 压缩级别：归档一次写入、很少读取，默认 1（比默认 9 快数倍，体积只略大）
+        self.gzip_level = int(self.archive_config.get('gzip_level', 1))
         
         # 上次导出时间
         self.last_export_time = None
         
+        # 队列长度与内存读数缓存（调度器频繁轮询时不必每次访问 Redis）
+        self._status: Optional[Tuple[int, float]] = None
+        self._status_time = 0.0
+        
         logger.info(f"SmartExporter 初始化完成")
         logger.info(f"导出目录: {self.export_dir}")
         logger.info(f"队列阈值: {self.queue_threshold}")
@@ -86,22 +113,18 @@ class SmartExporter:
         if not self.enabled:
             return False, "自动导出未启用"
         
-        # 检查1: 队列长度
         try:
-            queue_length = self.redis_client.get_queue_length()
+            queue_length, used_mb = self._queue_status()
+            
+            # 检查1: 队列长度
             if queue_length > self.queue_threshold:
                 return True, f"队列长度 {queue_length} > 阈值 {self.queue_threshold}"
-        except Exception as e:
-            logger.error(f"检查队列长度失败: {e}")
-        
-        # 检查2: 内存使用
-        try:
-            memory_info = self.redis_client.get_memory_usage()
-            used_mb = memory_info.get('used_memory_mb', 0)
+            
+            # 检查2: 内存使用
             if used_mb > self.memory_threshold_mb:
                 return True, f"内存使用 {used_mb:.1f}MB > 阈值 {self.memory_threshold_mb}MB"
         except Exception as e:
-            logger.error(f"检查内存使用失败: {e}")
+            logger.error(f"检查队列长度/内存使用失败: {e}")
         
         # 检查3: 时间间隔
         if self.last_export_time:
@@ -114,6 +137,24 @@ class SmartExporter:
         
         return False, "无需导出"
     
+    def _queue_status(self) -> Tuple[int, float]:
+        """
+        队列长度与 Redis 已用内存(MB)：LLEN 与 INFO memory 一次 pipeline 往返，STATUS_TTL 秒内复用
+        
+        Returns:
+            (队列长度, 已用内存MB)
+        """
+        now = time.monotonic()
+        if self._status is not None and now - self._status_time < STATUS_TTL:
+            return self._status
+        pipe = self.redis_client.client.pipeline(transaction=False)
+        pipe.llen(self.redis_client.queue_name)
+        pipe.info('memory')
+        queue_length, info = pipe.execute()
+        self._status = (queue_length, info['used_memory'] / 1024 / 1024)
+        self._status_time = now
+        return self._status
+    
     def export(self, batch_size: int = 1000) -> Dict[str, Any]:
         """
         导出数据到本地文件
@@ -124,12 +165,14 @@ class SmartExporter:
         Returns:
             导出统计信息
         """
+        start = datetime.now()
+        t0 = time.monotonic()  # 耗时用单调时钟，不受系统校时影响
         stats = {
             'exported': 0,
             'export_file': None,
             'format': self.export_format,
             'file_size_mb': 0,
-            'start_time': datetime.now(),
+            'start_time': start,
             'end_time': None,
             'error': None
         }
@@ -153,57 +196,49 @@ class SmartExporter:
             
             logger.info(f"开始导出 {to_export} 条数据（保留 {max_keep} 条在 Redis）")
             
-            # 分批获取数据
-            all_data = []
-            batch_count = 0
-            for i in range(0, to_export, batch_size):
-                count = min(batch_size, to_export - i)
-                batch = self.redis_client.get_data(count)
-                all_data.extend(batch)
-                batch_count += 1
-                
-                if batch_count % 10 == 0:
-                    logger.info(f"已获取 {len(all_data)}/{to_export} 条数据...")
+            # 生成文件名
+            timestamp = start.strftime('%Y%m%d_%H%M%S')
+            if self.export_format == 'parquet' and HAS_PARQUET:
+                filepath = self.export_dir / f'data_{timestamp}.parquet'
+            else:
+                # JSONL（每行一条）：边取边写，内存只占一批数据
+                filepath = self.export_dir / (f'data_{timestamp}.jsonl' + ('.gz' if self.compress else ''))
             
-            if not all_data:
+            # 只读取不删除，文件写完后再从队尾删除；写文件失败时数据仍在队列中
+            exported: Dict[str, int] = {}  # 已读取的各来源条数
+            if filepath.suffix == '.parquet':
+                filepath = self._export_parquet(to_export, batch_size, exported, filepath)
+            else:
+                with closing(self._read_batches(to_export, batch_size, exported)) as batches:
+                    self._export_jsonl(batches, filepath)
+            
+            exported_count = sum(exported.values())
+            if not exported_count:
+                filepath.unlink()
                 logger.warning("未获取到任何数据")
                 stats['error'] = "未获取到数据"
                 return stats
             
-            # 生成文件名
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            
-            # 根据格式导出
-            if self.export_format == 'parquet' and HAS_PANDAS:
-                filename = f'data_{timestamp}.parquet'
-                filepath = self.export_dir / filename
-                self._export_parquet(all_data, filepath)
-            elif self.export_format == 'json' and self.compress:
-                filename = f'data_{timestamp}.json.gz'
-                filepath = self.export_dir / filename
-                self._export_json_gz(all_data, filepath)
-            else:
-                filename = f'data_{timestamp}.json'
-                filepath = self.export_dir / filename
-                self._export_json(all_data, filepath)
+            self.redis_client.trim_oldest(exported)
             
             # 计算文件大小
             file_size = filepath.stat().st_size / 1024 / 1024  # MB
             
-            stats['exported'] = len(all_data)
+            stats['exported'] = exported_count
             stats['export_file'] = str(filepath)
             stats['file_size_mb'] = round(file_size, 2)
             stats['end_time'] = datetime.now()
             
-            duration = (stats['end_time'] - stats['start_time']).total_seconds()
+            duration = time.monotonic() - t0
             logger.info(f"✓ 导出完成: {stats['exported']} 条 → {filepath.name} ({file_size:.2f}MB)")
             logger.info(f"  耗时: {duration:.1f}秒")
             
-            # 更新上次导出时间
-            self.last_export_time = datetime.now()
+            # 更新上次导出时间，队列读数已过时
+            self.last_export_time = stats['end_time']
+            self._status = None
             
             # 清理旧归档
-            self._cleanup_old_archives()
+            self._cleanup_old_archives(stats['end_time'])
             
             return stats
             
@@ -213,67 +248,183 @@ class SmartExporter:
             stats['end_time'] = datetime.now()
             return stats
     
-    def _export_json(self, data: List[Dict], filepath: Path):
-        """导出为 JSON 格式"""
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        logger.debug(f"JSON 导出: {filepath}")
+    def _read_batches(self, to_export: int, batch_size: int, exported: Dict[str, int]) -> Iterator[List[str]]:
+        """
+        后台线程分批从队尾读取最旧的 to_export 条原始 JSON（多批一次 pipeline 往返），主线程同时写文件
+        
+        用 closing() 包裹：写入失败时关闭生成器，等取数线程退出后 exported 才不再变化
+        
+        Args:
+            to_export: 导出数量
+            batch_size: 每批条数
+            exported: 已读取的各来源条数（就地累加，写完文件后据此删除）
+        """
+        return self._prefetch(self._fetch_batches(to_export, batch_size, exported))
     
-    def _export_json_gz(self, data: List[Dict], filepath: Path):
-        """导出为压缩 JSON 格式 (节省 70% 空间)"""
-        with gzip.open(filepath, 'wt', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False)
-        logger.debug(f"JSON.GZ 导出: {filepath}")
+    def _fetch_batches(self, to_export: int, batch_size: int, exported: Dict[str, int]) -> Iterator[List[str]]:
+        """分批读取并定期输出进度"""
+        batch_count = 0
+        read = 0
+        for batch in self.redis_client.read_oldest(to_export, exported, batch_size):
+            batch_count += 1
+            read += len(batch)
+            if batch_count % 10 == 0:
+                logger.info(f"已获取 {read}/{to_export} 条数据...")
+            yield batch
     
-    def _export_parquet(self, data: List[Dict], filepath: Path):
-        """导出为 Parquet 格式 (高压缩比, 快速查询)"""
-        if not HAS_PANDAS:
-            logger.error("Parquet 格式需要 pandas。使用 JSON.GZ 替代")
-            filepath = filepath.with_suffix('.json.gz')
-            self._export_json_gz(data, filepath)
-            return
+    @staticmethod
+    def _prefetch(batches: Iterable[List[str]], depth: int = 4) -> Iterator[List[str]]:
+        """
+        在后台线程中迭代 batches，最多预取 depth 批（socket I/O 与 Arrow/压缩均释放 GIL，线程即可）
+        
+        取数异常在消费完已取到的批次后抛出；生成器关闭时通知取数线程停止并等待其退出
+        """
+        buf: queue.Queue = queue.Queue(maxsize=depth)
+        stop = threading.Event()
+        done = object()
+        
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    buf.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            try:
+                for batch in batches:
+                    if not put(batch):
+                        return
+            finally:
+                put(done)
         
-        df = pd.DataFrame(data)
-        df.to_parquet(filepath, compression='gzip', index=False)
-        logger.debug(f"Parquet 导出: {filepath}")
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(produce)
+            try:
+                while True:
+                    batch = buf.get()
+                    if batch is done:
+                        break
+                    yield batch
+            finally:
+                stop.set()
+        future.result()
     
-    def _cleanup_old_archives(self):
-        """清理过期归档文件"""
+    def _open_jsonl(self, path: str, compress: bool):
+        """
+        以二进制方式打开 JSONL 输出文件（compress 时为 gzip 压缩，不经文本包装层）
+        
+        写缓冲 1MB：小批次攒满后才压缩/落盘，关闭时统一刷出
+        """
+        if compress:
+            return io.BufferedWriter(gzip.open(path, 'wb', compresslevel=self.gzip_level),
+                                     buffer_size=WRITE_BUFFER)
+        return open(path, 'wb', buffering=WRITE_BUFFER)
+    
+    def _export_jsonl(self, batches: Iterable[List[str]], filepath: Path):
+        """
+        导出为 JSONL 格式：队列中的原始 JSON 逐行写入，不解析、不在内存中拼接 (.gz 节省 70% 空间)
+        
+        先写 .part 临时文件，完成后 fsync 并改名，中途失败不会留下残缺的归档
+        """
+        with _atomic_file(str(filepath)) as tmp, self._open_jsonl(tmp, filepath.suffix == '.gz') as f:
+            for batch in batches:
+                # 整批拼接后一次编码、一次写入
+                f.write('\n'.join(batch).encode('utf-8'))
+                f.write(b'\n')
+        logger.debug(f"JSONL 导出: {filepath}")
+    
+    def _export_parquet(self, to_export: int, batch_size: int, exported: Dict[str, int], filepath: Path) -> Path:
+        """
+        导出为 Parquet 格式 (高压缩比, 快速查询)
+        
+        有 pyarrow 时每批直接转为 Arrow 写入 ParquetWriter，不经 pandas DataFrame；
+        只有 pandas 时整体建表。写入失败回退为 JSONL.GZ
+        
+        Returns:
+            Path: 实际写出的文件路径
+        """
+        try:
+            with _atomic_file(str(filepath)) as tmp, \
+                    closing(self._read_batches(to_export, batch_size, exported)) as batches:
+                if pa is not None:
+                    write_parquet_stream(tmp, batches, self.compression)
+                else:
+                    # pandas 需整体建表
+                    pd.DataFrame([loads(raw) for batch in batches for raw in batch]).to_parquet(
+                        tmp, compression=self.compression, index=False)
+            logger.debug(f"Parquet 导出: {filepath}")
+            return filepath
+        except Exception as e:
+            # 写了一半的临时文件已删除；数据尚未从队列删除，从头重新读取写入
+            logger.error(f"Parquet 导出失败，使用 JSONL.GZ 替代: {e}")
+            exported.clear()
+            filepath = filepath.with_suffix('.jsonl.gz')
+            with closing(self._read_batches(to_export, batch_size, exported)) as batches:
+                self._export_jsonl(batches, filepath)
+            return filepath
+    
+    def _cleanup_old_archives(self, now: Optional[datetime] = None):
+        """
+        清理过期归档文件
+        
+        Args:
+            now: 当前时间（导出完成时传入已取得的时间，省去再次读取时钟）
+        """
         if not self.archive_config.get('enabled', True):
             return
         
-        cutoff_date = datetime.now() - timedelta(days=self.retention_days)
+        # YYYYMMDD 字符串按字典序即按日期排序，直接与文件名中的日期比较，不必逐个 strptime；
+        # 文件日期按当天 0 点计，截止日当天的文件也早于截止时刻
+        cutoff_str = ((now or datetime.now()) - timedelta(days=self.retention_days)).strftime('%Y%m%d')
         
-        deleted_count = 0
-        deleted_size = 0
+        # 先遍历一次收集过期文件（大小取自遍历时的 stat），再统一删除
+        expired = []
+        for entry, match in self._scan_export_files():
+            try:
+                # 文件名中的日期: data_20241020_120000.jsonl.gz → 20241020
+                date_str = match.group(1)
+                if date_str and date_str <= cutoff_str:
+                    expired.append((entry, entry.stat().st_size))
+            except Exception as e:
+                logger.warning(f"处理文件 {entry.name} 失败: {e}")
         
-        # 查找所有导出文件
-        patterns = ['data_*.json', 'data_*.json.gz', 'data_*.parquet']
-        for pattern in patterns:
-            for file in self.export_dir.glob(pattern):
-                try:
-                    # 从文件名提取日期: data_20241020_120000.json
-                    parts = file.stem.split('_')
-                    if len(parts) < 2:
-                        continue
-                    
-                    date_str = parts[1]  # 20241020
-                    file_date = datetime.strptime(date_str, '%Y%m%d')
-                    
-                    if file_date < cutoff_date:
-                        file_size = file.stat().st_size
-                        file.unlink()
-                        deleted_count += 1
-                        deleted_size += file_size
-                        logger.debug(f"删除过期归档: {file.name}")
-                except Exception as e:
-                    logger.warning(f"处理文件 {file.name} 失败: {e}")
-                    continue
+        if not expired:
+            return
         
+        def remove(item) -> int:
+            entry, file_size = item
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                logger.warning(f"删除文件 {entry.name} 失败: {e}")
+                return -1
+            logger.debug(f"删除过期归档: {entry.name}")
+            return file_size
+        
+        # 文件多时并行删除（unlink 释放 GIL），少量文件直接顺序删除
+        if len(expired) >= CLEANUP_PARALLEL_MIN:
+            with ThreadPoolExecutor(max_workers=CLEANUP_WORKERS) as pool:
+                sizes = list(pool.map(remove, expired))
+        else:
+            sizes = [remove(item) for item in expired]
+        
+        deleted_count = sum(1 for size in sizes if size >= 0)
+        deleted_size = sum(size for size in sizes if size > 0)
         if deleted_count > 0:
             size_mb = deleted_size / 1024 / 1024
             logger.info(f"清理完成: 删除 {deleted_count} 个过期归档，释放 {size_mb:.2f}MB 空间")
     
+    def _scan_export_files(self) -> Iterator[Tuple[os.DirEntry, re.Match]]:
+        """一次遍历导出目录，返回 data_* 导出文件及文件名匹配结果（DirEntry 自带缓存的 stat 信息）"""
+        with os.scandir(self.export_dir) as entries:
+            for entry in entries:
+                match = _EXPORT_RE.match(entry.name)
+                if match and entry.is_file():
+                    yield entry, match
+    
     def get_export_stats(self) -> Dict[str, Any]:
         """获取导出统计信息"""
         stats = {
@@ -281,30 +432,27 @@ class SmartExporter:
             'total_size_mb': 0,
             'oldest_file': None,
             'newest_file': None,
-            'files_by_format': {}
+            'files_by_format': {},
+            'parquet_rows': 0  # Parquet 文件总行数（只读 footer 元数据）
         }
         
-        # 统计所有导出文件
-        all_files = []
-        for pattern in ['data_*.json', 'data_*.json.gz', 'data_*.parquet']:
-            all_files.extend(self.export_dir.glob(pattern))
-        
-        if not all_files:
-            return stats
-        
-        stats['total_files'] = len(all_files)
-        
-        # 计算总大小和时间范围
-        for file in all_files:
-            size = file.stat().st_size
-            stats['total_size_mb'] += size
+        # 统计所有导出文件，计算总大小和时间范围（每个文件只 stat 一次）
+        for entry, match in self._scan_export_files():
+            st = entry.stat()
+            stats['total_files'] += 1
+            stats['total_size_mb'] += st.st_size
             
             # 按格式分类
-            ext = ''.join(file.suffixes)  # .json.gz 或 .parquet
+            ext = match.group(2)  # .jsonl.gz 或 .parquet
             stats['files_by_format'][ext] = stats['files_by_format'].get(ext, 0) + 1
+            if ext == '.parquet' and pq is not None:
+                try:
+                    stats['parquet_rows'] += pq.ParquetFile(entry.path).metadata.num_rows
+                except Exception as e:
+                    logger.warning(f"读取 {entry.name} 元数据失败: {e}")
             
             # 找最新和最旧
-            mtime = datetime.fromtimestamp(file.stat().st_mtime)
+            mtime = datetime.fromtimestamp(st.st_mtime)
             if stats['oldest_file'] is None or mtime < stats['oldest_file']:
                 stats['oldest_file'] = mtime
             if stats['newest_file'] is None or mtime > stats['newest_file']:
@@ -360,6 +508,7 @@ def main():
     print(f"  最旧文件: {export_stats['oldest_file']}")
     print(f"  最新文件: {export_stats['newest_file']}")
     print(f"  格式分布: {export_stats['files_by_format']}")
+    print(f"  Parquet 行数: {export_stats['parquet_rows']}")
 
 
 if __name__ == "__main__":
@@ -112,7 +112,8 @@ class ConfigValidator:
         print_info(f"Redis 地址: {host}:{port}")
         print_info(f"数据库: {db}")
         
-        # 测试连接
+        # 测试连接（PING 与 INFO 一次往返）
+        client = None
         try:
             client = redis.Redis(
                 host=host,
@@ -122,16 +123,16 @@ class ConfigValidator:
                 socket_timeout=5,
                 decode_responses=True
             )
-            client.ping()
+            pipe = client.pipeline(transaction=False)
+            pipe.ping()
+            pipe.info('memory')
+            _, info = pipe.execute()
             print_success("Redis 连接成功")
             self.passed_checks.append("Redis 连接")
             
             # 检查内存
-            info = client.info('memory')
             used_memory_mb = info['used_memory'] / 1024 / 1024
             print_info(f"Redis 内存使用: {used_memory_mb:.2f} MB")
-            
-            client.close()
         except redis.ConnectionError:
             self.errors.append("Redis 连接失败")
             print_error("Redis 连接失败 - 请确保 Redis 服务已启动")
@@ -139,6 +140,9 @@ class ConfigValidator:
         except Exception as e:
             self.warnings.append(f"Redis 检查异常: {e}")
             print_warning(f"Redis 检查异常: {e}")
+        finally:
+            if client is not None:
+                client.close()
     
     def _validate_reddit(self):
         """验证 Reddit 配置"""
@@ -77,16 +77,18 @@ def show_data(redis_client, count):
     
     data_list = redis_client.peek_data(count)
     
+    # 拼成一个字符串一次输出，不逐行 print
+    lines = []
     for i, data in enumerate(data_list, 1):
-        print(f"\n[{i}] 来源: {data.get('source')}")
-        print(f"    时间: {data.get('timestamp')}")
-        print(f"    URL: {data.get('url')}")
         text = data.get('text', '')
         if len(text) > 100:
             text = text[:100] + "..."
-        print(f"    内容: {text}")
-    
-    print(f"\n总共显示 {len(data_list)} 条数据")
+        lines.append(f"\n[{i}] 来源: {data.get('source')}\n"
+                     f"    时间: {data.get('timestamp')}\n"
+                     f"    URL: {data.get('url')}\n"
+                     f"    内容: {text}")
+    lines.append(f"\n总共显示 {len(data_list)} 条数据")
+    print("\n".join(lines))
 
 
 def show_statistics(redis_client):
@@ -96,22 +98,29 @@ def show_statistics(redis_client):
     
     length = redis_client.get_queue_length()
     
-    # 获取所有数据进行统计（如果数据量大，可以只取样）
-    sample_size = min(1000, length)
-    data_list = redis_client.peek_data(sample_size)
-    
-    # 统计各来源数量
-    source_count = {}
-    for data in data_list:
-        source = data.get('source', 'unknown')
-        source_count[source] = source_count.get(source, 0) + 1
+    # 优先使用写入时维护的来源计数 Hash（一次 HGETALL，覆盖全部数据）
+    source_count = redis_client.get_source_counts()
+    from_counter = bool(source_count)
+    if from_counter:
+        total = sum(source_count.values())
+    else:
+        # 计数 Hash 不存在时取样统计（逐页读取，不一次性取出全部样本）
+        sample_size = min(1000, length)
+        total = 0
+        for data in redis_client.iter_data(sample_size):
+            source = data.get('source', 'unknown')
+            source_count[source] = source_count.get(source, 0) + 1
+            total += 1
     
     # 显示统计结果
     for source, count in sorted(source_count.items()):
-        percentage = (count / len(data_list)) * 100 if data_list else 0
+        percentage = (count / total) * 100 if total else 0
         print(f"{source:20s}: {count:6d} ({percentage:5.2f}%)")
     
-    print(f"\n统计样本: {len(data_list)} / {length}")
+    if from_counter:
+        print(f"\n来源计数合计: {total} / 队列长度 {length}")
+    else:
+        print(f"\n统计样本: {total} / {length}")
 
 
 def export_data(redis_client):
@@ -134,8 +143,9 @@ def export_data(redis_client):
     data_list = redis_client.peek_data(count)
     
     try:
+        # 先整体序列化再一次写入（json.dump 会按片段多次写文件）
         with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data_list, f, ensure_ascii=False, indent=2)
+            f.write(json.dumps(data_list, ensure_ascii=False, indent=2))
         print(f"成功导出 {len(data_list)} 条数据到 {filename}")
     except Exception as e:
         print(f"导出失败: {e}")